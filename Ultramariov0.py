@@ -1,12 +1,25 @@
 # Super Mario Bros. Clone in Python (Pygame)
 import pygame
 import random
+import argparse
+import threading
+import queue
+import time
+import zlib
 import json
+import gc
+import sys
+import tracemalloc
+import warnings
+import os
+import shutil
+import tempfile
+import weakref
 from array import array
+from bisect import bisect_left
+from operator import attrgetter
 
-# Initialize pygame and mixer for sound
-pygame.mixer.pre_init(44100, -16, 1, 512)  # 44.1kHz, 16-bit, mono, small buffer for low latency
-pygame.init()
+import physics
 
 # Screen setup
 SCALE = 3  # scale factor for window (3x NES resolution)
@@ -15,20 +28,28 @@ SCREEN_WIDTH_TILES = 16  # 256 px width / 16 = 16 tiles
 SCREEN_HEIGHT_TILES = 15  # 240 px height / 16 = 15 tiles
 SCREEN_WIDTH = SCREEN_WIDTH_TILES * TILE_SIZE
 SCREEN_HEIGHT = SCREEN_HEIGHT_TILES * TILE_SIZE
-window = pygame.display.set_mode((SCREEN_WIDTH * SCALE, SCREEN_HEIGHT * SCALE))
-pygame.display.set_caption("Super Mario Bros. Python Clone")
 
 # Create a surface for the game world at NES resolution, to be scaled
 game_surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
 
-# Load or initialize save data
+# Importing this module has no side effects: the window and font (init_display()), the mixer
+# and the synthesized sounds (init_audio()) and the save slots (load_saves()) are set up by
+# main() and run_replay(). Level generation, physics, the Game class and the renderer can be
+# used headless, and benchmarked, without any of them.
+window = None
+font = None
+
+# Save data: the world each slot has reached
 save_file = "saves.json"
-try:
-    with open(save_file, "r") as f:
-        saves = json.load(f)
-except FileNotFoundError:
-    # default: all slots start at world 1
-    saves = {"1": 1, "2": 1, "3": 1}
+saves = {"1": 1, "2": 1, "3": 1}  # default: all slots start at world 1
+
+def load_saves():
+    global saves
+    try:
+        with open(save_file, "r") as f:
+            saves = json.load(f)
+    except FileNotFoundError:
+        pass
 
 # Define colors
 COLOR_SKY = (107, 140, 255)   # light blue sky
@@ -44,13 +65,51 @@ COLOR_PLAYER2 = (0, 192, 0)    # Luigi (green)
 COLOR_FLAG = (0, 224, 0)       # flagpole color (green)
 COLOR_TEXT = (255, 255, 255)   # white text
 
-# Prepare font for text (using a default font)
-font = pygame.font.SysFont(None, 24)
+# Logical colour slots used for drawing. In the optional 8-bit paletted render mode each
+# slot is a palette index, so a theme change or a colour effect is a palette write rather
+# than a redraw; in the default 32-bit mode the slots resolve to RGB through draw_colors.
+(PAL_BG, PAL_GROUND, PAL_COIN, PAL_LAVA, PAL_FLAG, PAL_FLAG_TOP, PAL_GOOMBA, PAL_GOOMBA_FEET,
+ PAL_PLAYER1, PAL_PLAYER2, PAL_TEXT) = range(11)
+BASE_COLORS = [COLOR_SKY, COLOR_GROUND, COLOR_COIN, COLOR_LAVA, COLOR_FLAG, (255, 0, 0),
+               (165, 42, 42), (0, 0, 0), COLOR_PLAYER1, COLOR_PLAYER2, COLOR_TEXT]
+# NES 2C02 master palette, loaded after the logical slots so menus and text have NES colours to map to
+NES_PALETTE_OFFSET = 16
+NES_PALETTE = [
+    (84, 84, 84), (0, 30, 116), (8, 16, 144), (48, 0, 136), (68, 0, 100), (92, 0, 48), (84, 4, 0), (60, 24, 0),
+    (32, 42, 0), (8, 58, 0), (0, 64, 0), (0, 60, 0), (0, 50, 60), (0, 0, 0), (0, 0, 0), (0, 0, 0),
+    (152, 150, 152), (8, 76, 196), (48, 50, 236), (92, 30, 228), (136, 20, 176), (160, 20, 100), (152, 34, 32), (120, 60, 0),
+    (84, 90, 0), (40, 114, 0), (8, 124, 0), (0, 118, 40), (0, 102, 120), (0, 0, 0), (0, 0, 0), (0, 0, 0),
+    (236, 238, 236), (76, 154, 236), (120, 124, 236), (176, 98, 236), (228, 84, 236), (236, 88, 180), (236, 106, 100), (212, 136, 32),
+    (160, 170, 0), (116, 196, 0), (76, 208, 32), (56, 204, 108), (56, 180, 204), (60, 60, 60), (0, 0, 0), (0, 0, 0),
+    (236, 238, 236), (168, 204, 236), (188, 188, 236), (212, 178, 236), (236, 174, 236), (236, 174, 212), (236, 180, 176), (228, 196, 144),
+    (204, 210, 120), (180, 222, 120), (168, 226, 144), (152, 226, 180), (160, 214, 228), (160, 162, 160), (0, 0, 0), (0, 0, 0),
+]
+# Colour cycles for animated tiles (one step every PALETTE_CYCLE_FRAMES frames)
+PALETTE_CYCLE_FRAMES = 8
+COIN_SHIMMER = [COLOR_COIN, (252, 152, 56), (200, 76, 12), (252, 152, 56)]
+LAVA_GLOW = [COLOR_LAVA, (228, 92, 16), (248, 120, 88), (228, 92, 16)]
+
+# What each slot is drawn with: RGB tuples in 32-bit mode, the slot index itself in paletted mode
+draw_colors = list(BASE_COLORS)
+
+def init_display():
+    """Open the game window and prepare the font for text (using a default font); safe to call twice."""
+    global window, font, game_surface
+    if window is not None:
+        return
+    pygame.display.init()
+    pygame.font.init()
+    window = pygame.display.set_mode((SCREEN_WIDTH * SCALE, SCREEN_HEIGHT * SCALE))
+    game_surface = game_surface.convert()  # display format, like the tile sheets made for it
+    pygame.display.set_caption("Super Mario Bros. Python Clone")
+    font = pygame.font.SysFont(None, 24)
 
 # Sound generation functions
-def generate_wave(frequency, duration, waveform="square"):
-    """Generate a Sound object of a given waveform (square, triangle, noise)"""
-    sample_rate = 44100
+SAMPLE_RATE = 44100
+
+def synth_wave(frequency, duration, waveform="square"):
+    """Samples (signed 16-bit mono) of a given waveform (square, triangle, noise)"""
+    sample_rate = SAMPLE_RATE
     n_samples = int(sample_rate * duration)
     amp = 32767 // 4  # lower volume to avoid clipping (1/4 max)
     buf = array('h')  # signed 16-bit output array
@@ -92,58 +151,187 @@ def generate_wave(frequency, duration, waveform="square"):
     else:
         # default fallback: silence
         buf.extend([0] * n_samples)
+    return buf
 
-    sound = pygame.mixer.Sound(buffer=buf)
-    return sound
+def generate_wave(frequency, duration, waveform="square"):
+    """Generate a Sound object of a given waveform (square, triangle, noise); needs init_audio()"""
+    return pygame.mixer.Sound(buffer=synth_wave(frequency, duration, waveform))
 
-# Create game sounds
 # Background music: simple loop of a few notes (square wave)
-notes = [440, 554, 659, 880]  # A, C#, E, A (just a chord arpeggio as example)
-music_wave = array('h')
-for freq in notes:
-    # append 0.125 sec of each note to form one sequence
-    samples = generate_wave(freq, 0.125, "square")
-    # pygame.mixer.Sound(buffer=buf) doesn't let us extract samples easily,
-    # instead, generate_wave returns Sound. We can get raw samples via Sound.get_raw()
-    raw = samples.get_raw()  # bytes
-    # convert bytes to array of 16-bit
-    arr = array('h', raw)
-    music_wave.extend(arr)
-# Make it loop by duplicating the sequence (to avoid gap in looping)
-music_wave_all = music_wave * 4  # extend four times for a longer loop
-background_music = pygame.mixer.Sound(buffer=music_wave_all)
-background_music.set_volume(0.1)
-
-# Sound effects
-coin_sound = generate_wave(1320, 0.1, "square")
-coin_sound.set_volume(0.3)
-jump_sound = generate_wave(880, 0.2, "square")
-jump_sound.set_volume(0.3)
-stomp_sound = generate_wave(440, 0.1, "square")
-stomp_sound.set_volume(0.3)
-death_sound = generate_wave(0, 0.5, "noise")  # noise burst for death
-death_sound.set_volume(0.4)
-
-# Data structures for game state
-current_slot = None
-current_world = 1
-current_level = 1
-
-# Player attributes
-players = [
-    {"name": "MARIO", "color": COLOR_PLAYER1, "lives": 3},
-    {"name": "LUIGI", "color": COLOR_PLAYER2, "lives": 3}
-]
-active_player_index = 0  # 0 for Mario, 1 for Luigi
+MUSIC_NOTES = [440, 554, 659, 880]  # A, C#, E, A (just a chord arpeggio as example)
+
+def synth_music():
+    music_wave = array('h')
+    for freq in MUSIC_NOTES:
+        # append 0.125 sec of each note to form one sequence
+        music_wave.extend(synth_wave(freq, 0.125, "square"))
+    # Make it loop by duplicating the sequence (to avoid gap in looping)
+    return music_wave * 4  # extend four times for a longer loop
+
+# Game sounds, created by init_audio()
+background_music = coin_sound = jump_sound = stomp_sound = death_sound = None
+voices = None  # the VoicePool effects play on
+
+# Sound-effect voices. Channel 0 plays the music; effects play on a fixed pool of reserved
+# channels after it, so pygame never hands an effect the music channel and never opens more
+# voices under load. Each effect has a priority and a cap on simultaneous instances. With no
+# voice free, a new effect steals the oldest voice of a lower priority effect, or is dropped;
+# at its instance cap it restarts its own oldest voice. Repeats of one effect within a frame
+# are merged. Triggering works on preallocated lists only.
+MUSIC_CHANNEL = 0
+SFX_VOICES = 6
+
+class SoundEffect:
+    __slots__ = ("sound", "priority", "max_instances", "last_frame")
+
+    def __init__(self, sound, priority, max_instances):
+        self.sound = sound
+        self.priority = priority  # higher wins when voices run out
+        self.max_instances = max_instances
+        self.last_frame = -1  # frame this effect was last triggered in
+
+class VoicePool:
+    """Plays named sound effects on SFX_VOICES reserved mixer channels (see above)."""
+
+    def __init__(self, voices=SFX_VOICES, first_channel=MUSIC_CHANNEL + 1):
+        channels = first_channel + voices
+        if pygame.mixer.get_num_channels() < channels:
+            pygame.mixer.set_num_channels(channels)
+        pygame.mixer.set_reserved(channels)  # keep Sound.play() off the music and effect voices
+        self.channels = [pygame.mixer.Channel(first_channel + i) for i in range(voices)]
+        self.effects = {}
+        self.voice_effect = [None] * voices  # effect each voice was last started with
+        self.voice_start = [0] * voices  # trigger serial number, to find the oldest voice
+        self.voice_range = range(voices)
+        self.serial = 0
+        self.frame = 0
+        # Counters: effects started, dropped for lack of a voice, voices stolen, merged repeats
+        self.played = 0
+        self.dropped = 0
+        self.stolen = 0
+        self.limited = 0
+
+    def add(self, name, sound, priority=0, max_instances=1):
+        self.effects[name] = SoundEffect(sound, priority, max_instances)
+
+    def begin_frame(self):
+        self.frame += 1
+
+    def play(self, name):
+        """Trigger effect `name`; returns False if it was dropped or merged with one this frame."""
+        effect = self.effects[name]
+        if effect.last_frame == self.frame:
+            self.limited += 1
+            return False
+        effect.last_frame = self.frame
+        channels = self.channels
+        voice_effect = self.voice_effect
+        voice_start = self.voice_start
+        free = own = victim = -1
+        instances = 0
+        for i in self.voice_range:
+            current = voice_effect[i]
+            if current is not None and not channels[i].get_busy():
+                voice_effect[i] = current = None
+            if current is None:
+                if free < 0:
+                    free = i
+            elif current is effect:
+                instances += 1
+                if own < 0 or voice_start[i] < voice_start[own]:
+                    own = i
+            elif victim < 0 or current.priority < voice_effect[victim].priority or (
+                    current.priority == voice_effect[victim].priority and voice_start[i] < voice_start[victim]):
+                victim = i
+        if instances >= effect.max_instances:
+            voice = own  # restart this effect's oldest voice instead of stacking another
+            self.stolen += 1
+        elif free >= 0:
+            voice = free
+        elif victim >= 0 and voice_effect[victim].priority < effect.priority:
+            voice = victim
+            self.stolen += 1
+        else:
+            self.dropped += 1
+            return False
+        channels[voice].play(effect.sound)
+        voice_effect[voice] = effect
+        self.serial += 1
+        voice_start[voice] = self.serial
+        self.played += 1
+        return True
+
+def init_audio():
+    """Initialize the mixer, create the game sounds and the voice pool; safe to call twice."""
+    global background_music, coin_sound, jump_sound, stomp_sound, death_sound, voices
+    if voices is not None:
+        return
+    pygame.mixer.pre_init(SAMPLE_RATE, -16, 1, 512)  # 44.1kHz, 16-bit, mono, small buffer for low latency
+    pygame.mixer.init()
+    background_music = pygame.mixer.Sound(buffer=synth_music())
+    background_music.set_volume(0.1)
+
+    # Sound effects
+    coin_sound = generate_wave(1320, 0.1, "square")
+    coin_sound.set_volume(0.3)
+    jump_sound = generate_wave(880, 0.2, "square")
+    jump_sound.set_volume(0.3)
+    stomp_sound = generate_wave(440, 0.1, "square")
+    stomp_sound.set_volume(0.3)
+    death_sound = generate_wave(0, 0.5, "noise")  # noise burst for death
+    death_sound.set_volume(0.4)
+
+    # Game.events names -> effects: the level clear and death jingles outrank stomps and jumps
+    voices = VoicePool()
+    voices.add("death", death_sound, priority=3)
+    voices.add("coin", coin_sound, priority=2, max_instances=2)
+    voices.add("stomp", stomp_sound, priority=1, max_instances=3)
+    voices.add("jump", jump_sound, priority=0)
 
 # Player physics constants
-PLAYER_SPEED = 3  # horizontal speed in pixels per frame
+PLAYER_SPEED = 3  # horizontal speed in pixels per step
 JUMP_VELOCITY = -9  # initial upward velocity for jump (negative because up is -y)
-GRAVITY = 0.5       # gravity acceleration (pixels per frame^2)
+GRAVITY = 0.5       # gravity acceleration (pixels per step^2)
 MAX_FALL_SPEED = 10 # terminal velocity
 
+# Fixed simulation timestep: the per-step constants above are tuned for 60 steps per second,
+# independent of how often frames are rendered
+SIM_HZ = 60
+SIM_DT = 1.0 / SIM_HZ
+MAX_CATCHUP_STEPS = 5  # most steps run for one rendered frame; beyond that the game slows down
+
+# Optional fixed-point physics: positions and velocities as integers in 1/16 pixel units, as on
+# the NES. Every constant above is a multiple of 1/16 and bump_goombas() splits overlaps in
+# 1/16 units in both modes, so both follow the same trajectory; the integer mode is
+# bit-reproducible on every platform. Enabled with Game(fixed_point=True).
+SUBPIXEL_SHIFT = 4
+SUBPIXELS = 1 << SUBPIXEL_SHIFT
+TILE_SHIFT = 4  # TILE_SIZE == 1 << TILE_SHIFT
+SUBPIXEL_TILE_SHIFT = SUBPIXEL_SHIFT + TILE_SHIFT  # subpixel coordinate -> tile index
+PLAYER_SPEED_SUB = PLAYER_SPEED * SUBPIXELS
+JUMP_VELOCITY_SUB = JUMP_VELOCITY * SUBPIXELS
+GRAVITY_SUB = int(GRAVITY * SUBPIXELS)
+MAX_FALL_SPEED_SUB = MAX_FALL_SPEED * SUBPIXELS
+STOMP_BOUNCE = -5  # upward velocity after stomping a goomba
+GOOMBA_SPEED = 1
+
+# Collision rules for the shared physics core: 'X' blocks are solid, lava ('L') stops a fall
+# but kills. The player probes walls one pixel in from its top and bottom and floors two pixels
+# in from its sides; goombas probe walls two pixels in, floors under their whole box, and
+# turn around at walls.
+TILES = physics.TileGrid(TILE_SIZE, solid="X", hazard="L")
+PLAYER_MOTION = physics.Motion(GRAVITY, MAX_FALL_SPEED, wall_insets=(1, 1), foot_insets=(2, 2))
+GOOMBA_MOTION = physics.Motion(GRAVITY, MAX_FALL_SPEED, wall_insets=(2, 2), foot_insets=(0, 1), bounce=True)
+PLAYER_MOTION_SUB = PLAYER_MOTION.fixed(SUBPIXEL_SHIFT)
+GOOMBA_MOTION_SUB = GOOMBA_MOTION.fixed(SUBPIXEL_SHIFT)
+
 # Define player and enemy objects
+# Entities use __slots__ and keep one persistent Rect each: rect() updates it in place
+# instead of building a new pygame.Rect on every call inside the collision loops.
 class Player:
+    __slots__ = ("x", "y", "vx", "vy", "width", "height", "on_ground", "prev_x", "prev_y",
+                 "sx", "sy", "svx", "svy", "_rect")
+
     def __init__(self):
         self.x = 0
         self.y = 0
@@ -152,50 +340,328 @@ class Player:
         self.width = 16
         self.height = 16
         self.on_ground = False
+        self.prev_x = 0  # position before the last simulation step, for render interpolation
+        self.prev_y = 0
+        self.sx = self.sy = self.svx = self.svy = 0  # subpixel state for fixed-point physics
+        self._rect = pygame.Rect(0, 0, self.width, self.height)
+
+    def respawn(self):
+        # Stand on the ground at the left edge of the level (one tile above bottom, ground_y-1)
+        self.x = self.prev_x = 16
+        self.y = self.prev_y = (SCREEN_HEIGHT_TILES - 2) * TILE_SIZE
+        self.vx = 0
+        self.vy = 0
+        self.sx = self.x << SUBPIXEL_SHIFT
+        self.sy = self.y << SUBPIXEL_SHIFT
+        self.svx = self.svy = 0
+        self.on_ground = False
 
     def rect(self):
-        return pygame.Rect(int(self.x), int(self.y), self.width, self.height)
+        r = self._rect
+        r.x = int(self.x)
+        r.y = int(self.y)
+        return r
 
 class Goomba:
+    __slots__ = ("x", "y", "vx", "vy", "width", "height", "on_ground", "alive", "prev_x", "prev_y",
+                 "sx", "sy", "svx", "svy", "_rect")
+
     def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.vx = -1  # start moving left by default
-        self.vy = 0
         self.width = 16
         self.height = 16
+        self._rect = pygame.Rect(0, 0, self.width, self.height)
+        self.reset(x, y)
+
+    def reset(self, x, y):
+        # (Re)initialize state so pooled goombas can be reused for a new spawn
+        self.x = self.prev_x = x
+        self.y = self.prev_y = y
+        self.vx = -GOOMBA_SPEED  # start moving left by default
+        self.vy = 0
+        self.sx = x << SUBPIXEL_SHIFT
+        self.sy = y << SUBPIXEL_SHIFT
+        self.svx = self.vx * SUBPIXELS
+        self.svy = 0
         self.on_ground = False
         self.alive = True
 
     def rect(self):
-        return pygame.Rect(int(self.x), int(self.y), self.width, self.height)
+        r = self._rect
+        r.x = int(self.x)
+        r.y = int(self.y)
+        return r
+
+class GoombaPool:
+    """Free list of Goomba objects so level loads and deaths recycle instead of allocating."""
+    __slots__ = ("free",)
+
+    def __init__(self):
+        self.free = []
+
+    def acquire(self, x, y):
+        if self.free:
+            g = self.free.pop()
+            g.reset(x, y)
+            return g
+        return Goomba(x, y)
+
+    def release(self, goomba):
+        self.free.append(goomba)
+
+    def release_all(self, goombas):
+        # Return every goomba (dead or alive) to the free list and empty the list in place
+        self.free.extend(goombas)
+        goombas.clear()
+
+goomba_pool = GoombaPool()
+
+_entity_x = attrgetter("x")
+
+class SweepAndPrune:
+    """Sort-and-sweep broadphase along x for live goombas.
+
+    The list is kept sorted between frames with an insertion sort, which is close to O(n)
+    because entities only move a pixel or two per frame.
+    """
+    __slots__ = ("order", "max_width")
+
+    def __init__(self):
+        self.order = []
+        self.max_width = TILE_SIZE  # widest entity, bounds how far back a query has to look
+
+    def reset(self, goombas):
+        self.order[:] = [g for g in goombas if g.alive]
+        self.order.sort(key=_entity_x)
+
+    def update(self):
+        """Drop dead goombas and restore x order after this frame's movement."""
+        order = self.order
+        n = len(order)
+        i = 0
+        while i < n:
+            g = order[i]
+            if not g.alive:
+                del order[i]
+                n -= 1
+                continue
+            x = g.x
+            j = i - 1
+            while j >= 0 and order[j].x > x:
+                order[j + 1] = order[j]
+                j -= 1
+            order[j + 1] = g
+            i += 1
+
+    def pairs(self):
+        """Yield each pair of goombas whose boxes overlap."""
+        order = self.order
+        n = len(order)
+        for i in range(n):
+            a = order[i]
+            a_right = a.x + a.width
+            a_bottom = a.y + a.height
+            j = i + 1
+            # only entities starting before a's right edge can overlap it
+            while j < n and order[j].x < a_right:
+                b = order[j]
+                if b.y < a_bottom and a.y < b.y + b.height:
+                    yield a, b
+                j += 1
+
+    def query(self, x0, x1):
+        """Yield goombas whose x extent overlaps [x0, x1)."""
+        order = self.order
+        n = len(order)
+        i = bisect_left(order, x0 - self.max_width, key=_entity_x)
+        while i < n and order[i].x < x1:
+            g = order[i]
+            if g.x + g.width > x0:
+                yield g
+            i += 1
+
+def bump_goombas(broadphase, fixed_point=False):
+    """Turn goombas around when they walk into each other, as in the original game."""
+    bumped = False
+    for a, b in broadphase.pairs():
+        bumped = True
+        # a is left of b: send them apart and split the overlap between them
+        if fixed_point:
+            overlap = a.sx + (a.width << SUBPIXEL_SHIFT) - b.sx
+            a.sx -= overlap >> 1
+            b.sx += overlap - (overlap >> 1)
+            a.svx = -abs(a.svx)
+            b.svx = abs(b.svx)
+            sync_pixels(a)
+            sync_pixels(b)
+        else:
+            # Split in 1/16 pixel units, odd one to b, exactly as the integer path does
+            overlap = round((a.x + a.width - b.x) * SUBPIXELS)
+            a.x -= (overlap >> 1) / SUBPIXELS
+            b.x += (overlap - (overlap >> 1)) / SUBPIXELS
+            a.vx = -abs(a.vx)
+            b.vx = abs(b.vx)
+    if bumped:
+        # Pushing goombas apart can move one past a neighbour in a pile-up; re-sort so the
+        # player's query this step doesn't bisect a stale order
+        broadphase.update()
+
+# Enemy activation window around the camera (in pixels). Goombas spawn when their column
+# comes within ACTIVATE_MARGIN of the screen and leave the simulation once they are more
+# than DEACTIVATE_MARGIN off screen, like the original game. The wider deactivation margin
+# keeps an enemy near the edge from flickering in and out.
+ACTIVATE_MARGIN = 2 * TILE_SIZE
+DEACTIVATE_MARGIN = 6 * TILE_SIZE
+
+class EnemySpawner:
+    """Level spawn list sorted by column; spawns are consumed left to right as the camera advances."""
+    __slots__ = ("spawns", "next")
+
+    def __init__(self):
+        self.spawns = []  # (x, y) pixel positions, sorted by x
+        self.next = 0
+
+    def load(self, level_map):
+        """Collect the 'G' markers from level_map and remove them from the map."""
+        spawns = self.spawns
+        spawns.clear()
+        self.next = 0
+        if isinstance(level_map, StreamingLevel):
+            # Spawns arrive chunk by chunk (see feed) as the level streams in
+            level_map.spawner = self
+            level_map.follow(0)
+            return
+        for iy, row in enumerate(level_map):
+            if 'G' not in row:
+                continue
+            for ix, ch in enumerate(row):
+                if ch == 'G':
+                    spawns.append((ix * TILE_SIZE, iy * TILE_SIZE))
+            # Remove the 'G's from the map representation (so they're treated as empty space for collisions)
+            level_map[iy] = row.replace('G', '.')
+        spawns.sort()
+
+    def feed(self, spawns):
+        """Append the spawns of a newly streamed chunk, dropping the ones already consumed."""
+        if self.next:
+            del self.spawns[:self.next]
+            self.next = 0
+        self.spawns.extend(spawns)
+
+def activate_goombas(goombas, cam_x, spawner, broadphase):
+    """Spawn goombas entering the activation window and retire dead or far off-screen ones."""
+    left = cam_x - DEACTIVATE_MARGIN
+    right = cam_x + SCREEN_WIDTH + DEACTIVATE_MARGIN
+    # Compact the active list in place, returning retired goombas to the pool
+    keep = 0
+    for g in goombas:
+        if g.alive and left < g.x < right:
+            goombas[keep] = g
+            keep += 1
+        else:
+            g.alive = False
+            goomba_pool.release(g)
+    if keep < len(goombas):
+        del goombas[keep:]
+        # Drop retired goombas from the broadphase before the pool hands them out again
+        broadphase.update()
+    # Spawn from the level's spawn list as columns come into view
+    spawns = spawner.spawns
+    i = spawner.next
+    spawn_edge = cam_x + SCREEN_WIDTH + ACTIVATE_MARGIN
+    order = broadphase.order
+    while i < len(spawns) and spawns[i][0] < spawn_edge:
+        x, y = spawns[i]
+        i += 1
+        if x <= left:
+            continue  # scrolled past before it ever came into view
+        g = goomba_pool.acquire(x, y)
+        goombas.append(g)
+        order.append(g)  # the broadphase insertion sort moves it into place
+    spawner.next = i
+
+def spawn_goombas(level_map, goombas, spawner, broadphase, cam_x=0):
+    """Load the level's goomba spawn list and activate the ones near the camera, reusing pooled objects."""
+    goomba_pool.release_all(goombas)
+    spawner.load(level_map)
+    broadphase.reset(goombas)
+    activate_goombas(goombas, cam_x, spawner, broadphase)
+    broadphase.update()
+    return goombas
+
+def camera_x(player_x, level_width):
+    """Camera left edge in pixels: centered on the player, clamped to the level (width in tiles)."""
+    cam_x = int(player_x) - (SCREEN_WIDTH // 2)  # simple camera: center on player
+    # Clamp camera within level bounds
+    if cam_x < 0:
+        cam_x = 0
+    max_cam_x = level_width * TILE_SIZE - SCREEN_WIDTH
+    if cam_x > max_cam_x:
+        cam_x = max_cam_x
+    return cam_x
 
-# Helper to get tile at a given position
-def get_tile(level_map, tx, ty):
-    # returns the tile character at tile coordinates (tx, ty) or None if out of bounds
-    if tx < 0 or tx >= len(level_map[0]) or ty < 0 or ty >= len(level_map):
-        return None
-    return level_map[ty][tx]
+# Helper to get tile at a given position: the tile character at tile coordinates (tx, ty),
+# or None if out of bounds
+get_tile = physics.tile_at
+
+# Special tiles (coins, the flag and lava), indexed once per level by kind and by column
+# bucket. Each step the player only looks at the entries in the one or two buckets its box
+# spans, instead of probing the tile grid or scanning the level.
+SPECIAL_TILES = "CFL"
+TILE_BUCKET_SHIFT = 2  # 4 columns per bucket
+
+class TileIndex:
+    """Positions of the special tiles of a level, by kind and by column bucket."""
+
+    def __init__(self):
+        self.buckets = {}  # column >> TILE_BUCKET_SHIFT -> list of (tx, ty, kind)
+        self.kinds = {kind: set() for kind in SPECIAL_TILES}  # kind -> {(tx, ty)}
+
+    def add_rows(self, rows, first_column=0):
+        """Index the special tiles of rows (strings) whose first column is first_column."""
+        buckets = self.buckets
+        for ty, row in enumerate(rows):
+            for kind in SPECIAL_TILES:
+                positions = self.kinds[kind]
+                tx = row.find(kind)
+                while tx >= 0:
+                    buckets.setdefault((first_column + tx) >> TILE_BUCKET_SHIFT, []).append((first_column + tx, ty, kind))
+                    positions.add((first_column + tx, ty))
+                    tx = row.find(kind, tx + 1)
+
+    def drop_columns(self, first, last):
+        """Forget the entries of columns first..last-1 (whole buckets)."""
+        for bucket in range(first >> TILE_BUCKET_SHIFT, ((last - 1) >> TILE_BUCKET_SHIFT) + 1):
+            for tx, ty, kind in self.buckets.pop(bucket, ()):
+                self.kinds[kind].discard((tx, ty))
+
+    def take_coins(self, c0, c1, r0, r1, taken):
+        """Remove the coins in columns c0..c1 and rows r0..r1 from the index, appending them to taken."""
+        for bucket in range(c0 >> TILE_BUCKET_SHIFT, (c1 >> TILE_BUCKET_SHIFT) + 1):
+            entries = self.buckets.get(bucket)
+            if not entries:
+                continue
+            for i in range(len(entries) - 1, -1, -1):
+                tx, ty, kind = entries[i]
+                if kind == 'C' and c0 <= tx <= c1 and r0 <= ty <= r1:
+                    del entries[i]
+                    self.kinds['C'].discard((tx, ty))
+                    taken.append((tx, ty))
 
 # Level generation function
-def generate_level(world, level):
-    """Generate a level map (list of strings) for the given world and level number."""
+def level_theme(level):
+    """(background color, ground color, underground, castle) for a level number."""
     # Determine theme based on level number
     if level == 2:   # underground levels
-        theme_bg = COLOR_UNDERGROUND_BG
-        theme_ground_color = COLOR_UNDERGROUND_GROUND
-        underground = True
-        castle = False
+        return COLOR_UNDERGROUND_BG, COLOR_UNDERGROUND_GROUND, True, False
     elif level == 4:  # castle levels
-        theme_bg = COLOR_CASTLE_BG
-        theme_ground_color = COLOR_CASTLE_GROUND
-        underground = False
-        castle = True
+        return COLOR_CASTLE_BG, COLOR_CASTLE_GROUND, False, True
     else:  # overworld (day or night) levels
         theme_bg = COLOR_SKY if level % 2 == 1 else COLOR_SKY  # (could vary for night levels)
-        theme_ground_color = COLOR_GROUND
-        underground = False
-        castle = False
+        return theme_bg, COLOR_GROUND, False, False
+
+def generate_level(world, level):
+    """Generate a level map (list of strings) for the given world and level number."""
+    theme_bg, theme_ground_color, underground, castle = level_theme(level)
 
     # Base dimensions and structure
     # Increase level width with world number for difficulty
@@ -337,226 +803,976 @@ def generate_level(world, level):
     level_map = ["".join(row) for row in lvl]
     return level_map, theme_bg, theme_ground_color
 
-# Game state variables
-level_map = []
-theme_bg_color = COLOR_SKY
-theme_ground_color = COLOR_GROUND
-player = Player()
-goombas = []
-running = True
-playing = False  # becomes True when in a level
-game_over = False
-win = False
-
-# Start background music (loop indefinitely)
-pygame.mixer.Channel(0).play(background_music, loops=-1)
-
-clock = pygame.time.Clock()
-
-# Main game loop
-state = "menu"
-while running:
-    if state == "menu":
-        # Draw menu
-        game_surface.fill((0, 0, 0))
-        title_text = font.render("SELECT FILE (1-3):", True, COLOR_TEXT)
-        game_surface.blit(title_text, (40, 50))
-        # Display each slot status
-        for i in range(1, 4):
-            w = saves.get(str(i), 1)
-            status = f"World {w}-1" if w <= 8 else "Completed!"
-            slot_text = font.render(f"{i}. {status}", True, COLOR_TEXT)
-            game_surface.blit(slot_text, (60, 50 + 20 * i))
-        # Blit menu to window
-        scaled = pygame.transform.scale(game_surface, window.get_size())
-        window.blit(scaled, (0, 0))
-        pygame.display.flip()
-
-        # Handle menu events
-        menu_chosen = False
-        while not menu_chosen:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                    menu_chosen = True
-                    break
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_1 or event.key == pygame.K_KP1:
-                        current_slot = 1
-                        menu_chosen = True
-                    elif event.key == pygame.K_2 or event.key == pygame.K_KP2:
-                        current_slot = 2
-                        menu_chosen = True
-                    elif event.key == pygame.K_3 or event.key == pygame.K_KP3:
-                        current_slot = 3
-                        menu_chosen = True
-            clock.tick(30)
-        if not running:
-            break
-        # Setup game start based on selected slot
-        current_world = saves.get(str(current_slot), 1)
-        if current_world < 1 or current_world > 8:
-            current_world = 1
-        current_level = 1
-        # Reset players lives
-        players[0]["lives"] = 3
-        players[1]["lives"] = 3
-        active_player_index = 0  # Mario starts
-        state = "game"
-        playing = True
-        game_over = False
-        win = False
-        # Generate first level
-        level_map, theme_bg_color, theme_ground_color = generate_level(current_world, current_level)
+# Streaming levels. A StreamingLevel is generated chunk by chunk (CHUNK_COLUMNS columns at a
+# time) from a seed, and only the chunks around the camera stay in memory. An evicted chunk is
+# regenerated when it comes back into view, or read back from a spill file if its tiles were
+# changed, so very long and endless levels cost the same memory as a short one. It is indexed
+# like the list-of-strings level maps (level_map[ty][tx], len(level_map[0]) for the width), so
+# get_tile() and the physics work on either kind.
+CHUNK_COLUMNS = 16
+ENDLESS_COLUMNS = 1 << 30  # width reported by an endless level
+STREAM_MARGIN = DEACTIVATE_MARGIN + TILE_SIZE  # chunks kept in memory beyond each screen edge
+STREAM_END_ZONE = 12  # columns before the flag left free for the staircase
+
+def generate_chunk(world, level, seed, index, width):
+    """Tile rows of chunk `index` (columns index*CHUNK_COLUMNS onward) of a streamed level.
+
+    Every chunk is laid out from its own RNG, so any chunk can be regenerated on its own.
+    Pits, platforms, coins and goombas ('G') are placed per chunk instead of at fractions
+    of the level width; the flag and staircase close off a level of finite width.
+    """
+    _, _, underground, castle = level_theme(level)
+    x0 = index * CHUNK_COLUMNS
+    cols = min(CHUNK_COLUMNS, width - x0)
+    height = SCREEN_HEIGHT_TILES
+    ground_y = height - 1
+    lvl = [['.'] * cols for _ in range(height)]
+    for x in range(cols):
+        lvl[ground_y][x] = 'X'
+        if underground:
+            lvl[0][x] = 'X'  # ceiling
+
+    # Random features stay inside the chunk, clear of the spawn point and of the flag area
+    rng = random.Random(f"{seed}:{world}:{level}:{index}")
+    lo = max(0, 5 - x0)
+    hi = min(cols, width - STREAM_END_ZONE - x0)
+    if hi - lo >= 8:
+        # A pit (lava in castles) with a line of coins above it, more often in later worlds
+        pit_chance = 0.3 if underground else (0.5 if castle or world >= 5 else 0.4)
+        pit = range(0)
+        if rng.random() < pit_chance:
+            pit_len = min(2 + (world % 3), 5)
+            start = rng.randrange(lo + 1, hi - pit_len)
+            pit = range(start, start + pit_len)
+            for x in pit:
+                lvl[ground_y][x] = 'L' if castle else '.'
+                lvl[ground_y - 4][x] = 'C'
+        # An elevated platform underground, or a block cluster with a coin on top overworld,
+        # left out if it would hang over the pit's run-up or landing
+        if not castle and rng.random() < 0.5:
+            length = 8 if underground else 5
+            start = rng.randrange(lo, hi - length + 1)
+            if not pit or start + length + 3 < pit.start or start > pit.stop + 2:
+                for x in range(start, start + length):
+                    lvl[ground_y - (4 if underground else 5)][x] = 'X'
+                if not underground:
+                    lvl[ground_y - 6][start + 2] = 'C'
+        # Goombas standing on solid ground, more of them in later worlds
+        for _ in range(1 + (world - 1) // 3):
+            if rng.random() < 0.5:
+                ex = rng.randrange(lo, hi)
+                if lvl[ground_y][ex] == 'X' and lvl[ground_y - 1][ex] == '.':
+                    lvl[ground_y - 1][ex] = 'G'
+
+    # Staircase (overworld) and flagpole at the end of the level, as generate_level places them
+    if not underground and not castle:
+        stair_height = 3 + (world // 3)
+        base_x = width - 1 - stair_height - 1
+        for i in range(stair_height):
+            if 0 <= base_x + i - x0 < cols:
+                lvl[ground_y - i - 1][base_x + i - x0] = 'X'
+    if x0 <= width - 1 < x0 + cols:
+        for h in range(4):
+            lvl[ground_y - h][width - 1 - x0] = 'F'
+    return ["".join(row) for row in lvl]
+
+class StreamingRow:
+    """One tile row of a StreamingLevel, indexed by column like a row string."""
+    __slots__ = ("level", "ty")
+
+    def __init__(self, level, ty):
+        self.level = level
+        self.ty = ty
+
+    def __len__(self):
+        return self.level.width
+
+    def __getitem__(self, tx):
+        level = self.level
+        index = tx // CHUNK_COLUMNS
+        chunk = level.chunks.get(index)
+        if chunk is None:
+            chunk = level.load(index)
+        return chunk[self.ty][tx - index * CHUNK_COLUMNS]
+
+class StreamingLevel:
+    """A level generated chunk by chunk from a seed, with only a window of chunks in memory.
+
+    width is in tiles, at least one chunk (CHUNK_COLUMNS); None makes the level endless. Goomba
+    markers are stripped from each chunk and handed to the attached EnemySpawner the first time
+    the chunk is generated.
+    """
+
+    def __init__(self, world, level, seed, width=None, generated=-1):
+        if width is not None and width < CHUNK_COLUMNS:
+            raise ValueError(f"streamed level width must be at least {CHUNK_COLUMNS} tiles, not {width}")
+        self.world = world
+        self.level = level
+        self.seed = seed
+        self.endless = width is None
+        self.width = ENDLESS_COLUMNS if width is None else width
+        self.chunks = {}  # chunk index -> list of row strings, for the chunks in memory
+        self.dirty = set()  # chunks in memory whose tiles changed since they were generated
+        self.spilled = set()  # evicted dirty chunks, kept as files in spill_dir
+        self.spill_dir = None
+        self.generated = generated  # highest chunk index generated so far
+        self.spawner = None
+        self.specials = TileIndex()  # special tiles of the chunks in memory
+        self.window = (0, -1)
+        self._rows = tuple(StreamingRow(self, ty) for ty in range(SCREEN_HEIGHT_TILES))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, ty):
+        return self._rows[ty]
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def state(self):
+        """What a snapshot needs to rebuild this level: (world, level, seed, width, generated, edited).
+
+        edited holds (index, rows) for every chunk whose tiles changed since it was generated,
+        in memory or spilled; the rest of the level comes back from the seed.
+        """
+        edited = [(index, tuple(self.chunks[index])) for index in self.dirty]
+        for index in self.spilled:
+            with open(self._spill_path(index), "r") as f:
+                edited.append((index, tuple(f.read().split("\n"))))
+        edited.sort()
+        return (self.world, self.level, self.seed, None if self.endless else self.width, self.generated,
+                tuple(edited))
+
+    @classmethod
+    def from_state(cls, state):
+        level = cls(*state[:5])
+        # Edited chunks start out spilled, so they are read back instead of regenerated.
+        # Quicksaves from before chunk edits were stored have no edited part
+        for index, rows in (state[5] if len(state) > 5 else ()):
+            level._spill(index, rows)
+        return level
+
+    def _generate(self, index):
+        rows = generate_chunk(self.world, self.level, self.seed, index, self.width)
+        spawns = []
+        for iy, row in enumerate(rows):
+            if 'G' in row:
+                for ix, ch in enumerate(row):
+                    if ch == 'G':
+                        spawns.append(((index * CHUNK_COLUMNS + ix) * TILE_SIZE, iy * TILE_SIZE))
+                rows[iy] = row.replace('G', '.')
+        # Goombas are handed out once, when their chunk is generated for the first time
+        if index > self.generated:
+            self.generated = index
+            if self.spawner is not None:
+                spawns.sort()
+                self.spawner.feed(spawns)
+        return rows
+
+    def load(self, index):
+        """Bring chunk `index` into memory: read it back if it was spilled, else generate it."""
+        if index in self.spilled:
+            with open(self._spill_path(index), "r") as f:
+                chunk = f.read().split("\n")
+            self.spilled.discard(index)
+            self.dirty.add(index)
+        else:
+            # Chunks are first generated strictly left to right, so spawns arrive in x order
+            while self.generated < index - 1:
+                self._generate(self.generated + 1)
+            chunk = self._generate(index)
+        self.chunks[index] = chunk
+        self.specials.add_rows(chunk, index * CHUNK_COLUMNS)
+        return chunk
+
+    def evict(self, index):
+        chunk = self.chunks.pop(index)
+        self.specials.drop_columns(index * CHUNK_COLUMNS, (index + 1) * CHUNK_COLUMNS)
+        if index in self.dirty:
+            # Changed tiles can't be regenerated: spill the chunk to disk
+            self.dirty.discard(index)
+            self._spill(index, chunk)
+
+    def _spill(self, index, chunk):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix="level-chunks-")
+            weakref.finalize(self, shutil.rmtree, self.spill_dir, True)
+        with open(self._spill_path(index), "w") as f:
+            f.write("\n".join(chunk))
+        self.spilled.add(index)
+
+    def _spill_path(self, index):
+        return os.path.join(self.spill_dir, f"{index}.txt")
+
+    def follow(self, cam_x):
+        """Keep the chunks around the camera in memory and evict the others."""
+        chunk_px = CHUNK_COLUMNS * TILE_SIZE
+        first = max(0, (cam_x - STREAM_MARGIN) // chunk_px)
+        last = min((cam_x + SCREEN_WIDTH + STREAM_MARGIN) // chunk_px, (self.width - 1) // CHUNK_COLUMNS)
+        chunks = self.chunks
+        if (first, last) == self.window and len(chunks) == last - first + 1:
+            return  # nothing moved in or out since the last call
+        self.window = (first, last)
+        for index in [i for i in chunks if i < first or i > last]:
+            self.evict(index)
+        for index in range(first, last + 1):
+            if index not in chunks:
+                self.load(index)
+
+    def set_tile(self, tx, ty, tile):
+        index = tx // CHUNK_COLUMNS
+        chunk = self.chunks.get(index)
+        if chunk is None:
+            chunk = self.load(index)
+        row = chunk[ty]
+        c = tx - index * CHUNK_COLUMNS
+        chunk[ty] = row[:c] + tile + row[c + 1:]
+        self.dirty.add(index)
+
+    def rows(self, first, last):
+        """Row strings of columns first..last-1, for drawing."""
+        pieces = [[] for _ in self._rows]
+        for index in range(first // CHUNK_COLUMNS, (last - 1) // CHUNK_COLUMNS + 1):
+            chunk = self.chunks.get(index)
+            if chunk is None:
+                chunk = self.load(index)
+            lo = max(first - index * CHUNK_COLUMNS, 0)
+            hi = min(last - index * CHUNK_COLUMNS, CHUNK_COLUMNS)
+            for piece, row in zip(pieces, chunk):
+                piece.append(row[lo:hi])
+        return tuple("".join(piece) for piece in pieces)
+
+def make_paletted_surface():
+    """Create an 8-bit game surface whose palette holds the colour slots followed by the NES palette."""
+    surface = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), 0, 8)
+    palette = BASE_COLORS + [(0, 0, 0)] * (NES_PALETTE_OFFSET - len(BASE_COLORS)) + NES_PALETTE
+    surface.set_palette(palette + [(0, 0, 0)] * (256 - len(palette)))
+    return surface
+
+def use_surface_colors(surface):
+    """Point draw_colors at palette indices for an 8-bit surface, or at RGB values otherwise."""
+    if surface.get_bitsize() == 8:
+        draw_colors[:] = range(len(BASE_COLORS))
+    else:
+        draw_colors[:] = BASE_COLORS
+
+def set_slot_color(surface, slot, color):
+    if surface.get_bitsize() == 8:
+        surface.set_palette_at(slot, color)
+    else:
+        draw_colors[slot] = color
+
+def apply_theme(surface, bg_color, ground_color):
+    """Switch the level theme: a palette swap in paletted mode."""
+    set_slot_color(surface, PAL_BG, bg_color)
+    set_slot_color(surface, PAL_GROUND, ground_color)
+
+def cycle_palette(surface, frame):
+    """Animate coin shimmer and lava glow by cycling their colour slots.
+
+    The slots are set for every frame, not only when they change, so each of the surfaces that
+    frames alternate between follows the cycle.
+    """
+    step = frame // PALETTE_CYCLE_FRAMES
+    set_slot_color(surface, PAL_COIN, COIN_SHIMMER[step % len(COIN_SHIMMER)])
+    set_slot_color(surface, PAL_LAVA, LAVA_GLOW[step % len(LAVA_GLOW)])
+
+def draw_tile(surface, tile, px, py, flag_top=False, colors=None):
+    """Draw one non-empty tile at (px, py); flag_top: an 'F' tile with no pole above it.
+
+    colors: what each slot is drawn with, draw_colors by default.
+    """
+    if colors is None:
+        colors = draw_colors
+    if tile == 'X':
+        # draw solid block
+        pygame.draw.rect(surface, colors[PAL_GROUND], (px, py, TILE_SIZE, TILE_SIZE))
+    elif tile == 'C':
+        # draw coin as a small circle
+        pygame.draw.circle(surface, colors[PAL_COIN], (px + TILE_SIZE//2, py + TILE_SIZE//2), TILE_SIZE//2 - 2)
+    elif tile == 'L':
+        # draw lava tile as filled rect
+        pygame.draw.rect(surface, colors[PAL_LAVA], (px, py, TILE_SIZE, TILE_SIZE))
+    elif tile == 'F':
+        # draw flagpole: a green rectangle (pole) on every 'F' tile
+        pygame.draw.rect(surface, colors[PAL_FLAG], (px + TILE_SIZE//2 - 2, py, 4, TILE_SIZE))
+        # If this is the top of the pole (tile above is empty or out of bounds), draw a flag triangle
+        if flag_top:
+            # draw a simple triangle flag
+            pygame.draw.polygon(surface, colors[PAL_FLAG_TOP], [(px + TILE_SIZE//2, py), (px + TILE_SIZE//2, py + 6), (px + TILE_SIZE//2 + 8, py + 3)])
+
+# Pre-drawn tiles. Each tile kind is drawn once per set of slot colours onto a TileSheet, in
+# the format of the surface the tiles are blitted to, so the tile loops below only look the
+# tile up and hand the whole screen to one blits() call. Sheets are cached by colours: levels
+# that share a theme, and each step of the coin and lava colour cycles, reuse the same sheet.
+SHEET_KINDS = ".XCLFf"  # 'f' is the top tile of a flagpole, the one with the flag
+THEME_LEVELS = (1, 2, 4)  # a level of each theme: overworld, underground, castle
+tile_sheets = {}  # colour key (see tile_sheet) -> TileSheet
+
+class TileSheet:
+    """A strip with one cell per SHEET_KINDS tile, background included; areas maps a tile to its cell."""
+
+    def __init__(self, target, colors):
+        self.surface = pygame.Surface((len(SHEET_KINDS) * TILE_SIZE, TILE_SIZE), 0, target)
+        self.areas = {}
+        self.palette = None  # slot colours of the palette last copied from the target (8-bit only)
+        for i, kind in enumerate(SHEET_KINDS):
+            px = i * TILE_SIZE
+            self.surface.fill(colors[PAL_BG], (px, 0, TILE_SIZE, TILE_SIZE))
+            if kind != '.':
+                draw_tile(self.surface, kind.upper(), px, 0, kind == 'f', colors)
+            self.areas[kind] = pygame.Rect(px, 0, TILE_SIZE, TILE_SIZE)
+
+    def sync_palette(self, target):
+        # A paletted sheet holds slot indices; blits only copy them unchanged between surfaces
+        # with the same palette, so follow the target's palette as themes and cycles change it
+        colors = (target.get_palette_at(PAL_BG), target.get_palette_at(PAL_GROUND),
+                  target.get_palette_at(PAL_COIN), target.get_palette_at(PAL_LAVA))
+        if colors != self.palette:
+            self.surface.set_palette(target.get_palette())
+            self.palette = colors
+
+def sheet_key(target, colors):
+    if target.get_bitsize() == 8:
+        return 8  # slot indices: one sheet for every theme, the palette does the rest
+    return target.get_bitsize(), target.get_masks(), tuple(colors[PAL_BG:PAL_FLAG_TOP + 1])
+
+def tile_sheet(target):
+    """The cached TileSheet for drawing on target with the current draw_colors."""
+    key = sheet_key(target, draw_colors)
+    sheet = tile_sheets.get(key)
+    if sheet is None:
+        sheet = tile_sheets[key] = TileSheet(target, draw_colors)
+    if key == 8:
+        sheet.sync_palette(target)
+    return sheet
+
+def prebake_tile_sheets(target):
+    """Build the sheets of every theme and colour-cycle step for target up front."""
+    if target.get_bitsize() == 8:
+        tile_sheet(target)
+        return
+    for level in THEME_LEVELS:
+        bg, ground = level_theme(level)[:2]
+        for coin, lava in zip(COIN_SHIMMER, LAVA_GLOW):
+            colors = list(BASE_COLORS)
+            colors[PAL_BG], colors[PAL_GROUND], colors[PAL_COIN], colors[PAL_LAVA] = bg, ground, coin, lava
+            key = sheet_key(target, colors)
+            if key not in tile_sheets:
+                tile_sheets[key] = TileSheet(target, colors)
+
+class TileLayer:
+    """The tiles on screen, kept on an off-screen surface from one frame to the next.
+
+    Each frame only tiles that differ from what the layer already shows are redrawn: columns
+    scrolling into view, collected coins, and in 32-bit mode the coin and lava tiles when their
+    colours cycle. The layer is then blitted under the entities in one go.
+    """
+    COLUMNS = SCREEN_WIDTH_TILES + 1  # one extra column for the partly scrolled tile
+
+    def __init__(self, target):
+        self.target = target
+        self.paletted = target.get_bitsize() == 8
+        self.surface = pygame.Surface((self.COLUMNS * TILE_SIZE, SCREEN_HEIGHT), 0, target)
+        self.column = None  # level column at the layer's left edge
+        self.shown = None  # tile rows the layer shows, '?' where a tile must be (re)drawn
+        self.colors = None
+        self.tiles_drawn = 0  # running count of tiles redrawn
+
+    def invalidate(self):
+        self.shown = ["?" * self.COLUMNS] * SCREEN_HEIGHT_TILES
+
+    def update(self, level_map, cam_x, first_column=0):
+        """Bring the layer up to date for camera cam_x; level_map starts at level column first_column."""
+        columns = self.COLUMNS
+        layer = self.surface
+        if self.shown is None:
+            self.invalidate()
+        shown = self.shown
+        # Colours: paletted layers follow the target's palette; 32-bit ones redraw what changed
+        if self.paletted:
+            target = self.target
+            colors = (target.get_palette_at(PAL_BG), target.get_palette_at(PAL_GROUND),
+                      target.get_palette_at(PAL_COIN), target.get_palette_at(PAL_LAVA))
+            if colors != self.colors:
+                layer.set_palette(target.get_palette())
+        else:
+            colors = (draw_colors[PAL_BG], draw_colors[PAL_GROUND], draw_colors[PAL_COIN], draw_colors[PAL_LAVA])
+            old = self.colors
+            if old is None or colors[:2] != old[:2]:
+                self.invalidate()
+                shown = self.shown
+            elif colors != old:
+                for ty, row in enumerate(shown):
+                    shown[ty] = row.replace('C', '?').replace('L', '?')
+        self.colors = colors
+        # Scrolling: move what is already drawn and mark the columns that came into view
+        column = cam_x // TILE_SIZE
+        if self.column is not None and column != self.column:
+            shift = column - self.column
+            if abs(shift) >= columns:
+                self.invalidate()
+                shown = self.shown
+            else:
+                layer.scroll(-shift * TILE_SIZE, 0)
+                for ty, row in enumerate(shown):
+                    shown[ty] = row[shift:] + "?" * shift if shift > 0 else "?" * -shift + row[:shift]
+        self.column = column
+        # Redraw the tiles that differ from what is shown, from the tile sheet in one blits()
+        sheet = tile_sheet(self.target)
+        image = sheet.surface
+        areas = sheet.areas
+        blank = areas['.']
+        blits = []
+        start = column - first_column
+        for ty in range(SCREEN_HEIGHT_TILES):
+            want = level_map[ty][start:start + columns]
+            if len(want) < columns:
+                want = want.ljust(columns, '.')  # past the right end of the level
+            have = shown[ty]
+            if want == have:
+                continue
+            py = ty * TILE_SIZE
+            for i in range(columns):
+                tile = want[i]
+                if tile != have[i]:
+                    if tile == 'F' and get_tile(level_map, start + i, ty - 1) != 'F':
+                        tile = 'f'
+                    blits.append((image, (i * TILE_SIZE, py), areas.get(tile, blank)))
+            shown[ty] = want
+        if blits:
+            layer.blits(blits, False)
+            self.tiles_drawn += len(blits)
+
+def draw_world(surface, level_map, cam_x, goomba_positions, player_x, player_y, player_slot, first_column=0,
+               layer=None):
+    """Draw background, visible tiles, goombas (x, y pairs) and the player at camera position cam_x.
+
+    level_map may hold just a window of the level's columns, starting at first_column.
+    With a TileLayer the tiles are updated incrementally on it and blitted, instead of drawn.
+    """
+    colors = draw_colors
+    if layer is not None:
+        layer.update(level_map, cam_x, first_column)
+        surface.blit(layer.surface, (layer.column * TILE_SIZE - cam_x, 0))
+    else:
+        # Fill background
+        surface.fill(colors[PAL_BG])
+        # Determine visible tile range
+        first_tile = cam_x // TILE_SIZE
+        last_tile = (cam_x + SCREEN_WIDTH) // TILE_SIZE + 1
+        if last_tile > first_column + len(level_map[0]):
+            last_tile = first_column + len(level_map[0])
+        sheet = tile_sheet(surface)
+        image = sheet.surface
+        areas = sheet.areas
+        blits = []
+        start = first_tile - first_column
+        left = first_tile * TILE_SIZE - cam_x
+        for ty, row in enumerate(level_map):
+            py = ty * TILE_SIZE
+            for i, tile in enumerate(row[start:last_tile - first_column]):
+                if tile == '.':
+                    continue
+                if tile == 'F' and get_tile(level_map, start + i, ty-1) != 'F':
+                    tile = 'f'
+                area = areas.get(tile)
+                if area is not None:
+                    blits.append((image, (left + i * TILE_SIZE, py), area))
+        surface.blits(blits, False)
+    # Draw enemies (goombas and the player are one tile in size)
+    for x, y in goomba_positions:
+        gx = x - cam_x
+        # draw goomba as a brown/orange rectangle
+        pygame.draw.rect(surface, colors[PAL_GOOMBA], (gx, y + 8, TILE_SIZE, TILE_SIZE - 8))  # body
+        pygame.draw.rect(surface, colors[PAL_GOOMBA_FEET], (gx+4, y+12, 8, 2))  # feet (small detail)
+
+    # Draw player
+    px = player_x - cam_x
+    pygame.draw.rect(surface, colors[player_slot], (px, player_y, TILE_SIZE, TILE_SIZE))
+    # (We could draw eyes or features, but a solid color block suffices for this clone)
+
+present_buffer = None  # display-format copy of a paletted game surface
+
+def present(surface):
+    """Scale the NES-resolution surface straight into the window and flip the display."""
+    global present_buffer
+    if surface.get_bitsize() != window.get_bitsize() or surface.get_masks() != window.get_masks():
+        # Expand palette indices (or any other format) once at NES resolution, then scale
+        if present_buffer is None or present_buffer.get_size() != surface.get_size():
+            present_buffer = pygame.Surface(surface.get_size()).convert(window)
+        present_buffer.blit(surface, (0, 0))
+        surface = present_buffer
+    pygame.transform.scale(surface, window.get_size(), window)
+    pygame.display.flip()
+
+class FrameSnapshot:
+    """Everything needed to draw one game frame, captured so it can be rendered on another thread.
+
+    Level rows are immutable strings, so a tuple of them is an immutable copy of the tile grid
+    that shares the rows with the live level; a tile change only replaces the affected row.
+    """
+    __slots__ = ("tiles", "first_column", "cam_x", "goombas", "player_x", "player_y", "player_slot",
+                 "hud_text", "bg_color", "ground_color", "frame", "target", "layer")
+
+    def __init__(self):
+        self.tiles = ()
+        self.first_column = 0  # level column of tiles[..][0]
+        self.cam_x = 0
+        self.goombas = []  # (x, y) of live goombas
+        self.player_x = 0
+        self.player_y = 0
+        self.player_slot = PAL_PLAYER1
+        self.hud_text = ""
+        self.bg_color = COLOR_SKY
+        self.ground_color = COLOR_GROUND
+        self.frame = 0
+        self.target = None  # surface the frame is drawn on, and its TileLayer (set by FrameRenderer)
+        self.layer = None
+
+    def capture(self, level_map, goombas, player, alpha, player_slot, hud_text, bg_color, ground_color, frame):
+        """Copy the drawable state, with entities placed `alpha` of the way from their previous to current step."""
+        positions = self.goombas
+        positions.clear()
+        for g in goombas:
+            if g.alive:
+                positions.append((int(g.prev_x + (g.x - g.prev_x) * alpha),
+                                  int(g.prev_y + (g.y - g.prev_y) * alpha)))
+        player_x = player.prev_x + (player.x - player.prev_x) * alpha
+        self.cam_x = camera_x(player_x, len(level_map[0]))
+        if isinstance(level_map, StreamingLevel):
+            # Copy just the columns on screen out of the chunk window
+            first = self.cam_x // TILE_SIZE
+            self.first_column = first
+            self.tiles = level_map.rows(first, min(first + SCREEN_WIDTH_TILES + 1, level_map.width))
+        else:
+            self.first_column = 0
+            self.tiles = tuple(level_map)
+        self.player_x = int(player_x)
+        self.player_y = int(player.prev_y + (player.y - player.prev_y) * alpha)
+        self.player_slot = player_slot
+        self.hud_text = hud_text
+        self.bg_color = bg_color
+        self.ground_color = ground_color
+        self.frame = frame
+
+def draw_snapshot(surface, snap, layer=None):
+    """Draw a captured frame (world and HUD) on surface, through a TileLayer if given."""
+    apply_theme(surface, snap.bg_color, snap.ground_color)
+    cycle_palette(surface, snap.frame)
+    draw_world(surface, snap.tiles, snap.cam_x, snap.goombas, snap.player_x, snap.player_y, snap.player_slot,
+               snap.first_column, layer)
+    for i, line in enumerate(snap.hud_text.split("\n")):
+        hud_surface = font.render(line, True, COLOR_TEXT)
+        surface.blit(hud_surface, (5, 5 + 18 * i))
+
+def render_snapshot(surface, snap, layer=None):
+    """Draw a captured frame and present it."""
+    draw_snapshot(surface, snap, layer)
+    present(surface)
+
+class FrameRenderer:
+    """Hands frame snapshots to the renderer, either inline or pipelined on a worker thread.
+
+    In pipelined mode there are two snapshot buffers, each with its own target surface (and
+    TileLayer), so the worker draws frame N into one while the simulation runs and captures
+    frame N+1 into the other; begin_frame() only waits when both are still in flight. Drawn
+    frames are presented (scaled into the window and flipped) in order by the calling thread
+    when it asks for a buffer: SDL only supports presenting from the thread that created the
+    window on several platforms. pygame releases the GIL in its fill, scale and blit paths, so
+    drawing and simulation overlap. An exception raised while drawing is re-raised on the
+    calling thread. With threaded=False frames are drawn and presented on the calling thread,
+    into `surface` itself.
+    """
+
+    def __init__(self, surface, threaded=True):
+        self.surface = surface
+        self.threaded = threaded
+        self.free = queue.Queue()
+        self.filled = queue.Queue()
+        self.drawn = queue.Queue()
+        for i in range(2 if threaded else 1):
+            snap = FrameSnapshot()
+            # Only the thread that draws touches a buffer's target and layer until it is presented
+            snap.target = surface if i == 0 else surface.copy()
+            snap.layer = TileLayer(snap.target)
+            self.free.put(snap)
+        self.in_flight = 0  # submitted frames not presented yet
+        self.error = None  # exception raised by the worker, until the calling thread re-raises it
+        self.worker = None
+        if threaded:
+            self.worker = threading.Thread(target=self._run, name="render", daemon=True)
+            self.worker.start()
+
+    def _run(self):
+        while True:
+            snap = self.filled.get()
+            if snap is None:
+                break
+            try:
+                draw_snapshot(snap.target, snap, snap.layer)
+            except BaseException as e:
+                # Dying here would leave the calling thread waiting for the frame forever
+                self.error = e
+            self.drawn.put(snap)
+
+    def _present_drawn(self, wait):
+        """Present the next frame the worker has drawn and free its buffer; False if there is none
+        (without wait: none finished yet)."""
+        if not self.in_flight:
+            return False
+        try:
+            snap = self.drawn.get(wait)
+        except queue.Empty:
+            return False
+        self.in_flight -= 1
+        self.free.put(snap)
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise RuntimeError("rendering a frame failed") from error
+        present(snap.target)
+        return True
+
+    def begin_frame(self):
+        """Return a snapshot buffer to fill, after presenting the frames the worker has finished."""
+        while self._present_drawn(wait=self.free.empty()):
+            pass
+        return self.free.get()
+
+    def submit(self, snap):
+        if self.threaded:
+            self.filled.put(snap)
+            self.in_flight += 1
+        else:
+            render_snapshot(snap.target, snap, snap.layer)
+            self.free.put(snap)
+
+    def wait_idle(self):
+        """Block until every submitted frame has been presented (before drawing on the surface directly)."""
+        while self._present_drawn(wait=True):
+            pass
+
+    def stop(self):
+        if self.worker is not None:
+            try:
+                self.wait_idle()
+            finally:
+                self.filled.put(None)
+                self.worker.join()
+                self.worker = None
+
+def step_player(player, level_map, move):
+    """One float physics step for the player; returns True if it touched lava or fell out of the level."""
+    # Continuous horizontal movement (-1 left, 1 right, 0 none)
+    player.vx = move * PLAYER_SPEED
+    return physics.step_body(player, level_map, TILES, PLAYER_MOTION) & (physics.HIT_HAZARD | physics.FELL_OUT) != 0
+
+def step_goomba(goomba, level_map):
+    """One float physics step for a live goomba: walk, turn at walls, fall, die in lava or pits."""
+    if physics.step_body(goomba, level_map, TILES, GOOMBA_MOTION) & (physics.HIT_HAZARD | physics.FELL_OUT):
+        goomba.alive = False
+
+def sync_pixels(entity):
+    # Mirror the authoritative subpixel state into the pixel fields read by collisions and drawing
+    # (exact: a multiple of 1/16 is representable as a float)
+    entity.x = entity.sx / SUBPIXELS
+    entity.y = entity.sy / SUBPIXELS
+    entity.vx = entity.svx / SUBPIXELS
+    entity.vy = entity.svy / SUBPIXELS
+
+def step_player_fixed(player, level_map, move):
+    """step_player in integer 1/16 pixel units; tile lookups are shifts, so results are bit-exact everywhere."""
+    player.svx = move * PLAYER_SPEED_SUB
+    flags = physics.step_body_fixed(player, level_map, TILES, PLAYER_MOTION_SUB)
+    sync_pixels(player)
+    return flags & (physics.HIT_HAZARD | physics.FELL_OUT) != 0
+
+def step_goomba_fixed(goomba, level_map):
+    """step_goomba in integer 1/16 pixel units."""
+    if physics.step_body_fixed(goomba, level_map, TILES, GOOMBA_MOTION_SUB) & (physics.HIT_HAZARD | physics.FELL_OUT):
+        goomba.alive = False
+    sync_pixels(goomba)
+
+# Game-state snapshots, for instant respawn, periodic checkpoints and quick-save/quick-load.
+# Level rows are immutable strings, so a snapshot shares its rows with the live level and with
+# other snapshots instead of copying the grid. A row that changes later is replaced, never
+# edited, so the tile grid is copy-on-write. Entities are stored as small tuples.
+QUICKSAVE_FILE = "quicksave.json"
+CHECKPOINT_STEPS = 5 * SIM_HZ  # simulation steps between automatic checkpoints
+
+class GameSnapshot:
+    __slots__ = ("slot", "world", "level", "active_player", "lives", "coins", "tiles", "stream", "theme",
+                 "spawns", "next_spawn", "player", "goombas", "streaming", "stream_width", "seed")
+
+def entity_state(e):
+    return (e.x, e.y, e.vx, e.vy, e.sx, e.sy, e.svx, e.svy, e.on_ground)
+
+def set_entity_state(e, state):
+    e.x, e.y, e.vx, e.vy, e.sx, e.sy, e.svx, e.svy, e.on_ground = state
+    e.prev_x = e.x
+    e.prev_y = e.y
+
+def save_snapshot(snap, path):
+    with open(path, "w") as f:
+        json.dump({name: getattr(snap, name) for name in GameSnapshot.__slots__}, f, separators=(",", ":"))
+
+def load_snapshot(path):
+    with open(path, "r") as f:
+        data = json.load(f)
+    snap = GameSnapshot()
+    for name in GameSnapshot.__slots__:
+        setattr(snap, name, data.get(name))
+    # JSON turns tuples into lists; colors, spawn points and entity states need to be tuples again
+    snap.lives = tuple(snap.lives)
+    snap.coins = tuple(snap.coins) if snap.coins is not None else (0,) * len(snap.lives)
+    snap.tiles = tuple(snap.tiles)
+    if snap.stream is not None:
+        snap.stream = tuple(snap.stream)
+        if len(snap.stream) > 5:
+            snap.stream = snap.stream[:5] + (tuple((index, tuple(rows)) for index, rows in snap.stream[5]),)
+    snap.theme = tuple(tuple(color) for color in snap.theme)
+    snap.spawns = tuple(tuple(spawn) for spawn in snap.spawns)
+    snap.player = tuple(snap.player)
+    snap.goombas = tuple(tuple(g) for g in snap.goombas)
+    if snap.streaming is None:
+        # Saved before snapshots recorded the level mode: tell it from the level data
+        snap.streaming = snap.stream is not None
+        snap.stream_width = snap.stream[3] if snap.stream is not None else None
+        snap.seed = snap.stream[2] if snap.stream is not None else 0
+    return snap
+
+class Game:
+    """The state of one game (level, players, enemies) and its fixed-step simulation.
+
+    Nothing here touches the window or the mixer, so any number of games can be stepped
+    headless side by side. Sound effects triggered by the last step() are listed by name in
+    `events` ("jump", "stomp", "coin", "death") for the caller to play or ignore.
+    """
+
+    def __init__(self, fixed_point=False, write_saves=False, streaming=False, stream_width=None):
+        self.fixed_point = fixed_point  # integer subpixel physics instead of floats
+        self.write_saves = write_saves  # record finished worlds in the save slots
+        self.streaming = streaming  # stream levels by chunk (StreamingLevel) instead of generate_level
+        self.stream_width = stream_width  # streamed level width in tiles, None for endless
+        self.seed = 0
+        self.slot = None
+        self.world = 1
+        self.level = 1
+        self.players = [
+            {"name": "MARIO", "color": COLOR_PLAYER1, "lives": 3, "coins": 0},
+            {"name": "LUIGI", "color": COLOR_PLAYER2, "lives": 3, "coins": 0}
+        ]
+        self.active_player_index = 0  # 0 for Mario, 1 for Luigi
+        self.level_map = []
+        self.specials = TileIndex()  # coins, flag and lava of the level
+        self.theme_bg_color = COLOR_SKY
+        self.theme_ground_color = COLOR_GROUND
+        self.player = Player()
+        self.goombas = []
+        self.spawner = EnemySpawner()
+        self.broadphase = SweepAndPrune()
+        self.level_start_snapshot = None
+        self.playing = False  # becomes True when in a level
+        self.game_over = False
+        self.win = False
+        self.events = []
+        self._coins_taken = []
+
+    def new_game(self, slot, world, level=1, seed=None):
+        """Start a fresh game for save slot `slot` at world-level; returns the RNG seed used."""
+        if seed is None:
+            seed = random.randrange(1 << 32)
+        random.seed(seed)
+        self.seed = seed
+        self.slot = slot
+        self.world = world
+        self.level = level
+        # Reset players lives and coins
+        for p in self.players:
+            p["lives"] = 3
+            p["coins"] = 0
+        self.active_player_index = 0  # Mario starts
+        self.playing = True
+        self.game_over = False
+        self.win = False
+        self.start_level(world, level)
+        return seed
+
+    def start_level(self, world, level):
+        """Generate a level, place the player and enemies, and remember it as the respawn snapshot."""
+        if self.streaming:
+            self.level_map = StreamingLevel(world, level, self.seed, self.stream_width)
+            self.theme_bg_color, self.theme_ground_color = level_theme(level)[:2]
+        else:
+            self.level_map, self.theme_bg_color, self.theme_ground_color = generate_level(world, level)
         # Set player start position (at leftmost ground)
-        player.x = 16
-        player.y = (SCREEN_HEIGHT_TILES - 2) * TILE_SIZE  # one tile above bottom (ground_y-1)
-        player.vx = 0
-        player.vy = 0
-        player.on_ground = False
+        self.player.respawn()
         # Spawn enemies for this level
-        goombas = []
-        for iy, row in enumerate(level_map):
-            for ix, ch in enumerate(row):
-                if ch == 'G':
-                    # Create goomba at this tile position
-                    g = Goomba(ix * TILE_SIZE, iy * TILE_SIZE)
-                    goombas.append(g)
-                    # Remove the 'G' from the map representation (so it's treated as empty space for collisions)
-                    level_map[iy] = level_map[iy][:ix] + '.' + level_map[iy][ix+1:]
-    elif state == "game":
-        # Game playing state
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                if event.key == pygame.K_SPACE or event.key == pygame.K_UP:
-                    # Jump if on ground
-                    if player.on_ground:
-                        player.vy = JUMP_VELOCITY
-                        player.on_ground = False
-                        jump_sound.play()
-            # No explicit event for left/right; handled by keys pressed state below
-
-        # Key state for continuous movement
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_LEFT]:
-            player.vx = -PLAYER_SPEED
-        elif keys[pygame.K_RIGHT]:
-            player.vx = PLAYER_SPEED
+        spawn_goombas(self.level_map, self.goombas, self.spawner, self.broadphase)
+        self.index_specials()
+        self.level_start_snapshot = self.take_snapshot()
+
+    def take_snapshot(self):
+        """Capture the current game state."""
+        snap = GameSnapshot()
+        snap.slot = self.slot
+        snap.world = self.world
+        snap.level = self.level
+        snap.active_player = self.active_player_index
+        snap.lives = tuple(p["lives"] for p in self.players)
+        snap.coins = tuple(p["coins"] for p in self.players)
+        if self.streaming:
+            # A streamed level is rebuilt from its seed plus the chunks changed in play, not
+            # stored tile by tile
+            snap.tiles = ()
+            snap.stream = self.level_map.state()
+        else:
+            snap.tiles = tuple(self.level_map)
+            snap.stream = None
+        snap.theme = (self.theme_bg_color, self.theme_ground_color)
+        snap.spawns = tuple(self.spawner.spawns)
+        snap.next_spawn = self.spawner.next
+        snap.player = entity_state(self.player)
+        snap.goombas = tuple(entity_state(g) for g in self.goombas if g.alive)
+        snap.streaming = self.streaming
+        snap.stream_width = self.stream_width
+        snap.seed = self.seed
+        return snap
+
+    def restore_level(self, snap):
+        """Put the level (tiles, theme, enemies) and the player back as they were in snap."""
+        if snap.stream is not None:
+            self.level_map = StreamingLevel.from_state(snap.stream)
+            self.level_map.spawner = self.spawner
         else:
-            player.vx = 0
-
-        # Apply gravity to player
-        player.vy += GRAVITY
-        if player.vy > MAX_FALL_SPEED:
-            player.vy = MAX_FALL_SPEED
-
-        # Horizontal movement and collision for player
-        player.x += player.vx
-        # Check horizontal collisions with tiles
-        if player.vx != 0:
-            # Determine direction
-            direction = 1 if player.vx > 0 else -1
-            # Check the tile(s) at player's front in that direction (top and bottom corners)
-            front_x = int((player.x + (player.width if direction == 1 else 0)) // TILE_SIZE)
-            # Check two vertical points: player's top and bottom (slightly adjusted to avoid missing corners)
-            for check_y in [player.y + 1, player.y + player.height - 1]:
-                tile_y = int(check_y // TILE_SIZE)
-                tile = get_tile(level_map, front_x, tile_y)
-                if tile == 'X':  # solid block
-                    # Place player adjacent to the solid block and stop horizontal movement
-                    if direction == 1:
-                        player.x = front_x * TILE_SIZE - player.width
-                    else:
-                        player.x = (front_x + 1) * TILE_SIZE
-                    player.vx = 0
-                    break  # no need to check further once collision handled
-        # Vertical movement and collision for player
-        player.y += player.vy
-        player.on_ground = False
-        if player.vy >= 0:
-            # falling downwards: check bottom side
-            bottom_y = int((player.y + player.height) // TILE_SIZE)
-            # Check bottom left and bottom right corners
-            for check_x in [player.x + 2, player.x + player.width - 2]:
-                tile_x = int(check_x // TILE_SIZE)
-                tile = get_tile(level_map, tile_x, bottom_y)
-                if tile == 'X' or tile == 'L':  # solid or lava counts as "ground" for stopping, but lava will kill
-                    player.y = bottom_y * TILE_SIZE - player.height
-                    player.vy = 0
-                    if tile == 'X':
-                        player.on_ground = True
-                    # If lava, trigger death
-                    if tile == 'L':
-                        player.on_ground = True  # treat as on ground to avoid falling through
-                        # kill player by simulating no lives (handled below)
-                        players[active_player_index]["lives"] = 0
-            # If out of level bottom (fell into a pit)
-            if player.y > SCREEN_HEIGHT:
-                players[active_player_index]["lives"] = 0  # player dies
+            self.level_map = list(snap.tiles)
+        self.index_specials()
+        self.theme_bg_color, self.theme_ground_color = snap.theme
+        self.spawner.spawns[:] = snap.spawns
+        self.spawner.next = snap.next_spawn
+        goombas = self.goombas
+        goomba_pool.release_all(goombas)
+        for state in snap.goombas:
+            g = goomba_pool.acquire(0, 0)
+            set_entity_state(g, state)
+            goombas.append(g)
+        self.broadphase.reset(goombas)
+        set_entity_state(self.player, snap.player)
+
+    def restore_snapshot(self, snap):
+        """Restore everything in snap, including world/level, lives and whose turn it is."""
+        self.slot = snap.slot
+        self.world = snap.world
+        self.level = snap.level
+        self.active_player_index = snap.active_player
+        for p, lives, coins in zip(self.players, snap.lives, snap.coins):
+            p["lives"] = lives
+            p["coins"] = coins
+        # The level mode and seed come with the snapshot: a quicksave from an endless game
+        # loaded into a normal one (or the other way round, or from another seed) has to
+        # rebuild, index and respawn into the same kind of level it was saved from
+        self.streaming = snap.streaming
+        self.stream_width = snap.stream_width
+        self.seed = snap.seed
+        start = self.level_start_snapshot
+        if start is None or (start.world, start.level, start.streaming, start.stream_width, start.seed) != \
+                (snap.world, snap.level, snap.streaming, snap.stream_width, snap.seed):
+            # Different level: rebuild its start snapshot so a later death respawns in the right place
+            self.start_level(snap.world, snap.level)
+        self.restore_level(snap)
+
+    def index_specials(self):
+        if self.streaming:
+            # A streamed level indexes each chunk as it comes into memory
+            self.specials = self.level_map.specials
+        else:
+            self.specials = TileIndex()
+            self.specials.add_rows(self.level_map)
+
+    def collect_coins(self):
+        """Collect the coins the player's box overlaps: the index, tile grid and counter are updated."""
+        player = self.player
+        x = int(player.x)
+        y = int(player.y)
+        taken = self._coins_taken
+        self.specials.take_coins(x // TILE_SIZE, (x + player.width - 1) // TILE_SIZE,
+                                 y // TILE_SIZE, (y + player.height - 1) // TILE_SIZE, taken)
+        if not taken:
+            return
+        level_map = self.level_map
+        for tx, ty in taken:
+            if self.streaming:
+                level_map.set_tile(tx, ty, '.')
+            else:
+                # Replace the row rather than editing it, so snapshots sharing it are unaffected
+                row = level_map[ty]
+                level_map[ty] = row[:tx] + '.' + row[tx + 1:]
+            self.players[self.active_player_index]["coins"] += 1
+            self.events.append("coin")
+        taken.clear()
+
+    def checksum(self):
+        """CRC of the simulated state: world/level, turn, lives, coins, player and live goombas."""
+        state = (self.world, self.level, self.active_player_index, tuple(p["lives"] for p in self.players),
+                 tuple(p["coins"] for p in self.players), entity_state(self.player), tuple(entity_state(g) for g in self.goombas if g.alive))
+        return zlib.crc32(repr(state).encode())
+
+    def step(self, move, jump):
+        """Advance the game by one fixed SIM_DT step.
+
+        move: -1, 0 or 1 for left, none or right; jump: a jump was requested this step.
+        Level clears, deaths and game end update the game state (see `playing`).
+        """
+        player = self.player
+        goombas = self.goombas
+        players = self.players
+        events = self.events
+        events.clear()
+
+        # Remember where everything was so the renderer can interpolate between steps
+        player.prev_x = player.x
+        player.prev_y = player.y
+        for goomba in goombas:
+            goomba.prev_x = goomba.x
+            goomba.prev_y = goomba.y
+
+        # Jump if on ground
+        if jump and player.on_ground:
+            player.vy = JUMP_VELOCITY
+            player.svy = JUMP_VELOCITY_SUB
+            player.on_ground = False
+            events.append("jump")
+
+        # Player and goomba physics (float or fixed-point subpixel)
+        if self.fixed_point:
+            died = step_player_fixed(player, self.level_map, move)
         else:
-            # moving upwards: check top side for head bump
-            top_y = int(player.y // TILE_SIZE)
-            for check_x in [player.x + 2, player.x + player.width - 2]:
-                tile_x = int(check_x // TILE_SIZE)
-                tile = get_tile(level_map, tile_x, top_y)
-                if tile == 'X':
-                    # hit head on block
-                    player.y = (top_y + 1) * TILE_SIZE
-                    player.vy = 0
-                    # (Could add breaking brick or hitting question mark logic here)
+            died = step_player(player, self.level_map, move)
+        if died:
+            players[self.active_player_index]["lives"] = 0  # kill player by simulating no lives (handled below)
+
+        # Wake goombas near the camera and retire far off-screen ones, so the cost
+        # below scales with what's on screen rather than with the level length
+        cam_x = camera_x(player.x, len(self.level_map[0]))
+        if self.streaming:
+            # Stream in the chunks around the camera (handing out their goombas), drop far ones
+            self.level_map.follow(cam_x)
+        activate_goombas(goombas, cam_x, self.spawner, self.broadphase)
 
         # Update enemies (Goombas)
+        step = step_goomba_fixed if self.fixed_point else step_goomba
         for goomba in goombas:
-            if not goomba.alive:
-                continue
-            # Gravity
-            goomba.vy += GRAVITY
-            if goomba.vy > MAX_FALL_SPEED:
-                goomba.vy = MAX_FALL_SPEED
-            # Horizontal movement (goomba always moves with its vx)
-            goomba.x += goomba.vx
-            # Check horizontal collision for goomba (turn around on walls)
-            front_x = int((goomba.x + (goomba.width if goomba.vx > 0 else 0)) // TILE_SIZE)
-            # bottom center for checking floor
-            foot_y = int((goomba.y + goomba.height - 1) // TILE_SIZE)
-            hit_wall = False
-            for check_y in [goomba.y + 2, goomba.y + goomba.height - 2]:
-                tile_y = int(check_y // TILE_SIZE)
-                tile = get_tile(level_map, front_x, tile_y)
-                if tile == 'X':
-                    hit_wall = True
-                    break
-            if hit_wall:
-                # Reverse direction
-                goomba.x = (front_x * TILE_SIZE - goomba.width) if goomba.vx > 0 else ((front_x + 1) * TILE_SIZE)
-                goomba.vx *= -1
-
-            # Vertical movement for goomba
-            goomba.y += goomba.vy
-            goomba.on_ground = False
-            if goomba.vy >= 0:
-                bottom_y = int((goomba.y + goomba.height) // TILE_SIZE)
-                tile_bL = get_tile(level_map, int(goomba.x // TILE_SIZE), bottom_y)
-                tile_bR = get_tile(level_map, int((goomba.x + goomba.width - 1) // TILE_SIZE), bottom_y)
-                # If standing on ground
-                if tile_bL == 'X' or tile_bR == 'X' or tile_bL == 'L' or tile_bR == 'L':
-                    goomba.y = bottom_y * TILE_SIZE - goomba.height
-                    goomba.vy = 0
-                    goomba.on_ground = True
-                    # If landed on lava, kill the goomba
-                    if (tile_bL == 'L' or tile_bR == 'L'):
-                        goomba.alive = False
-                # If fell off bottom of screen
-                if goomba.y > SCREEN_HEIGHT:
-                    goomba.alive = False
+            if goomba.alive:
+                step(goomba, self.level_map)
+
+        # Re-sort the broadphase after movement, then let goombas bump into each other
+        self.broadphase.update()
+        bump_goombas(self.broadphase, self.fixed_point)
 
-        # Check collisions between player and enemies
+        # Check collisions between player and nearby enemies only
         player_rect = player.rect()
-        for goomba in goombas:
+        for goomba in self.broadphase.query(player.x, player.x + player.width):
             if not goomba.alive:
                 continue
             if player_rect.colliderect(goomba.rect()):
@@ -564,205 +1780,525 @@ while running:
                 if player.vy > 0 and player.y < goomba.y:
                     # Stomp enemy
                     goomba.alive = False
-                    stomp_sound.play()
+                    events.append("stomp")
                     # bounce player up a bit
-                    player.vy = -5
+                    player.vy = STOMP_BOUNCE
+                    player.svy = STOMP_BOUNCE * SUBPIXELS
                     player.on_ground = False
                 else:
                     # Player hit from side or below -> lose a life
-                    players[active_player_index]["lives"] = 0  # set lives to 0 to trigger death
-        # Check if player reached flag ('F' tile)
+                    players[self.active_player_index]["lives"] = 0  # set lives to 0 to trigger death
+        # Pick up coins, from the special-tile index buckets the player overlaps
+        self.collect_coins()
+        # Check if player reached flag ('F' tile under the player's centre)
         px_idx = int((player.x + player.width/2) // TILE_SIZE)
         py_idx = int((player.y + player.height/2) // TILE_SIZE)
-        tile = get_tile(level_map, px_idx, py_idx)
-        if tile == 'F':
+        if (px_idx, py_idx) in self.specials.kinds['F']:
             # Level complete
             # Advance to next level or world
-            coin_sound.play()  # use coin sound as a placeholder for level clear sound
-            active_player = players[active_player_index]
+            events.append("coin")  # use coin sound as a placeholder for level clear sound
             # The active player continues to next level, but as per alternating mode, we switch player at level completion
             # Switch to other player for next level (if they have lives left)
-            next_player_index = 1 - active_player_index
+            next_player_index = 1 - self.active_player_index
             if players[next_player_index]["lives"] <= 0:
                 # If other player is out of lives, current player stays (no switch)
-                next_player_index = active_player_index
+                next_player_index = self.active_player_index
             # Update world/level
-            if current_level == 4:
+            if self.level == 4:
                 # finished a world
-                current_world += 1
-                current_level = 1
+                self.world += 1
+                self.level = 1
                 # Save progress (if not beyond world 8)
-                if current_world <= 8:
-                    saves[str(current_slot)] = current_world
+                if self.world <= 8 and self.write_saves:
+                    saves[str(self.slot)] = self.world
                     with open(save_file, "w") as f:
                         json.dump(saves, f)
             else:
-                current_level += 1
+                self.level += 1
             # Check win condition
-            if current_world > 8:
+            if self.world > 8:
                 # Game completed
-                win = True
-                playing = False
+                self.win = True
+                self.playing = False
             else:
                 # Load next level
-                level_map, theme_bg_color, theme_ground_color = generate_level(current_world, current_level)
-                # Respawn player at start
-                player.x = 16
-                player.y = (SCREEN_HEIGHT_TILES - 2) * TILE_SIZE
-                player.vx = 0
-                player.vy = 0
-                player.on_ground = False
-                # Spawn new enemies
-                goombas = []
-                for iy, row in enumerate(level_map):
-                    for ix, ch in enumerate(row):
-                        if ch == 'G':
-                            g = Goomba(ix * TILE_SIZE, iy * TILE_SIZE)
-                            goombas.append(g)
-                            level_map[iy] = level_map[iy][:ix] + '.' + level_map[iy][ix+1:]
+                self.start_level(self.world, self.level)
                 # Switch player turn
-                active_player_index = next_player_index
-            # Skip the rest of this frame to avoid processing death simultaneously
-            if not playing:
-                state = "game_over"  # triggers win message
-            continue
+                self.active_player_index = next_player_index
+            # Skip the rest of this step to avoid processing death simultaneously
+            return
 
         # Check for player death (lives <= 0)
-        if players[active_player_index]["lives"] <= 0:
+        if players[self.active_player_index]["lives"] <= 0:
             # Play death sound
-            death_sound.play()
+            events.append("death")
             # Switch to next player if available
-            next_player_index = 1 - active_player_index
+            next_player_index = 1 - self.active_player_index
             # Mark if game over (both players dead)
             if players[next_player_index]["lives"] <= 0:
                 # Both players have 0 lives
-                game_over = True
-                playing = False
+                self.game_over = True
+                self.playing = False
             else:
                 # Other player will continue on same level
-                active_player_index = next_player_index
-                # Reset current player (who died) lives maybe to 3 if you want continue feature? 
+                self.active_player_index = next_player_index
+                # Reset current player (who died) lives maybe to 3 if you want continue feature?
                 # In original, once lives are 0 you game over for that player. We'll leave them at 0 (no continue for that player).
-                # Reset position for new player
-                player.x = 16
-                player.y = (SCREEN_HEIGHT_TILES - 2) * TILE_SIZE
-                player.vx = 0
-                player.vy = 0
-                player.on_ground = False
-                # Also reset enemies to initial for retry
-                level_map, theme_bg_color, theme_ground_color = generate_level(current_world, current_level)
-                goombas = []
-                for iy, row in enumerate(level_map):
-                    for ix, ch in enumerate(row):
-                        if ch == 'G':
-                            g = Goomba(ix * TILE_SIZE, iy * TILE_SIZE)
-                            goombas.append(g)
-                            level_map[iy] = level_map[iy][:ix] + '.' + level_map[iy][ix+1:]
-            if not playing:
-                state = "game_over"
-                # Ensure to break out of game loop to show game over
-                continue
+                # Put the new player, the enemies and the level back as they were at level start
+                self.restore_level(self.level_start_snapshot)
 
-        # Drawing the game frame
-        # Fill background
-        game_surface.fill(theme_bg_color)
-        # Draw tiles
-        cam_x = int(player.x) - (SCREEN_WIDTH // 2)  # simple camera: center on player
-        # Clamp camera within level bounds
-        if cam_x < 0:
-            cam_x = 0
-        max_cam_x = len(level_map[0]) * TILE_SIZE - SCREEN_WIDTH
-        if cam_x > max_cam_x:
-            cam_x = max_cam_x
-        # Determine visible tile range
-        first_tile = cam_x // TILE_SIZE
-        last_tile = (cam_x + SCREEN_WIDTH) // TILE_SIZE + 1
-        if last_tile > len(level_map[0]):
-            last_tile = len(level_map[0])
-        for ty, row in enumerate(level_map):
-            for tx in range(first_tile, last_tile):
-                tile = row[tx]
-                if tile == '.':
-                    continue
-                px = tx * TILE_SIZE - cam_x
-                py = ty * TILE_SIZE
-                if tile == 'X':
-                    # draw solid block
-                    pygame.draw.rect(game_surface, theme_ground_color, (px, py, TILE_SIZE, TILE_SIZE))
-                elif tile == 'C':
-                    # draw coin as a small circle
-                    pygame.draw.circle(game_surface, COLOR_COIN, (px + TILE_SIZE//2, py + TILE_SIZE//2), TILE_SIZE//2 - 2)
-                elif tile == 'L':
-                    # draw lava tile as filled rect
-                    pygame.draw.rect(game_surface, COLOR_LAVA, (px, py, TILE_SIZE, TILE_SIZE))
-                elif tile == 'F':
-                    # draw flagpole (if bottom of pole)
-                    # We'll draw the pole and flag: for simplicity, draw a green rectangle (pole) and a small flag
-                    # Determine if this is the bottom of pole
-                    # If the tile below is also 'F', this is part of the pole, draw pole here
-                    pygame.draw.rect(game_surface, COLOR_FLAG, (px + TILE_SIZE//2 - 2, py, 4, TILE_SIZE))
-                    # If this is the top of the pole (tile above is empty or out of bounds), draw a flag triangle
-                    above_tile = get_tile(level_map, tx, ty-1)
-                    if above_tile != 'F':
-                        # draw a simple triangle flag
-                        pygame.draw.polygon(game_surface, (255, 0, 0), [(px + TILE_SIZE//2, py), (px + TILE_SIZE//2, py + 6), (px + TILE_SIZE//2 + 8, py + 3)])
-        # Draw enemies
-        for goomba in goombas:
-            if not goomba.alive:
-                continue
-            gx = int(goomba.x) - cam_x
-            gy = int(goomba.y)
-            # draw goomba as a brown/orange rectangle
-            pygame.draw.rect(game_surface, (165, 42, 42), (gx, gy + 8, goomba.width, goomba.height - 8))  # body
-            pygame.draw.rect(game_surface, (0, 0, 0), (gx+4, gy+12, 8, 2))  # feet (small detail)
-
-        # Draw player
-        px = int(player.x) - cam_x
-        py = int(player.y)
-        player_color = players[active_player_index]["color"]
-        pygame.draw.rect(game_surface, player_color, (px, py, player.width, player.height))
-        # (We could draw eyes or features, but a solid color block suffices for this clone)
-
-        # HUD text (world, lives, player)
-        hud_text = f"World {current_world}-{current_level}   {players[0]['name']}:{players[0]['lives']}  {players[1]['name']}:{players[1]['lives']}"
-        hud_surface = font.render(hud_text, True, COLOR_TEXT)
-        game_surface.blit(hud_surface, (5, 5))
-
-        # Scale game surface to window and update display
-        scaled_surface = pygame.transform.scale(game_surface, window.get_size())
-        window.blit(scaled_surface, (0, 0))
-        pygame.display.flip()
-
-        # Cap frame rate
-        clock.tick(60)
-    elif state == "game_over":
-        # Display Game Over or Victory message
-        game_surface.fill((0, 0, 0))
-        if win:
-            msg = "YOU WIN! CONGRATULATIONS!"
+# Input recording and deterministic replay. Each simulation step's input is a bitmask; runs of
+# identical masks are stored as [mask, count] pairs, so held buttons cost almost nothing.
+# Every REPLAY_CHECKSUM_STEPS steps a checksum of the game state is stored too, so playback
+# can report the first step at which it diverged from the recording.
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+REPLAY_CHECKSUM_STEPS = 60
+
+def input_mask(move, jump):
+    return (INPUT_LEFT if move < 0 else INPUT_RIGHT if move > 0 else 0) | (INPUT_JUMP if jump else 0)
+
+def decode_input(mask):
+    """Inverse of input_mask: (move, jump)."""
+    move = -1 if mask & INPUT_LEFT else (1 if mask & INPUT_RIGHT else 0)
+    return move, bool(mask & INPUT_JUMP)
+
+class InputRecorder:
+    """Records the inputs of each game, from Game.new_game() until it ends, into a replay file.
+
+    The first game goes to path, later ones next to it with a game number: run.replay,
+    run-2.replay, run-3.replay and so on.
+    """
+
+    def __init__(self, path, checksum_every=REPLAY_CHECKSUM_STEPS):
+        self.path = path
+        self.checksum_every = checksum_every
+        self.games = 0  # games begun so far
+        self.file = path  # replay file of the current game
+        self.header = None
+        self.game = None
+        self.runs = []  # flat [mask, count, mask, count, ...]
+        self.checksums = []
+        self.steps = 0
+
+    def begin(self, game, seed):
+        """Start recording `game`, just after game.new_game() returned `seed`."""
+        self.games += 1
+        if self.games == 1:
+            self.file = self.path
+        else:
+            root, ext = os.path.splitext(self.path)
+            self.file = f"{root}-{self.games}{ext}"
+        self.game = game
+        self.header = {"version": 1, "slot": game.slot, "world": game.world, "level": game.level, "seed": seed,
+                       "fixed_point": game.fixed_point, "streaming": game.streaming,
+                       "stream_width": game.stream_width, "checksum_every": self.checksum_every}
+        self.runs = []
+        self.checksums = []
+        self.steps = 0
+
+    def record(self, mask):
+        """Log the input for the step about to run."""
+        runs = self.runs
+        if runs and runs[-2] == mask:
+            runs[-1] += 1
         else:
-            msg = "GAME OVER"
-        over_text = font.render(msg, True, COLOR_TEXT)
-        prompt_text = font.render("Press any key to return to menu", True, COLOR_TEXT)
-        game_surface.blit(over_text, (60, 100))
-        game_surface.blit(prompt_text, (20, 130))
-        scaled = pygame.transform.scale(game_surface, window.get_size())
-        window.blit(scaled, (0, 0))
-        pygame.display.flip()
-        # Wait for key press or quit
-        waiting = True
-        while waiting:
+            runs.extend((mask, 1))
+
+    def after_step(self):
+        self.steps += 1
+        if self.steps % self.checksum_every == 0:
+            self.checksums.append(self.game.checksum())
+
+    def save(self):
+        if self.header is None:
+            return
+        data = dict(self.header, steps=self.steps, checksums=self.checksums, inputs=self.runs)
+        with open(self.file, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+
+def load_replay(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def replay_inputs(replay):
+    """Expand the run-length encoded inputs into one (move, jump) per step."""
+    runs = replay["inputs"]
+    for i in range(0, len(runs), 2):
+        step_input = decode_input(runs[i])
+        for _ in range(runs[i + 1]):
+            yield step_input
+
+def run_replay(path, render=False, fps=0):
+    """Play a replay file back, headless at full speed or rendered (capped at fps, 0 for uncapped).
+
+    Returns (steps run, first step whose checksum differs from the recording or None, seconds).
+    """
+    replay = load_replay(path)
+    # A replay must not touch the save slots
+    game = Game(fixed_point=replay["fixed_point"], streaming=replay.get("streaming", False),
+                stream_width=replay.get("stream_width"))
+    if render:
+        init_display()
+        use_surface_colors(game_surface)
+        prebake_tile_sheets(game_surface)
+    renderer = FrameRenderer(game_surface, threaded=False) if render else None
+    clock = pygame.time.Clock()
+    every = replay["checksum_every"]
+    checksums = replay["checksums"]
+    diverged = None
+    steps = 0
+    start = time.perf_counter()
+    game.new_game(replay["slot"], replay["world"], replay["level"], replay["seed"])
+    for move, jump in replay_inputs(replay):
+        if not game.playing:
+            break
+        game.step(move, jump)
+        steps += 1
+        if steps % every == 0 and diverged is None:
+            index = steps // every - 1
+            if index < len(checksums) and checksums[index] != game.checksum():
+                diverged = steps
+        if render:
+            pygame.event.pump()
+            hud_text = f"REPLAY {steps}/{replay['steps']}  World {game.world}-{game.level}"
+            snap = renderer.begin_frame()
+            snap.capture(game.level_map, game.goombas, game.player, 1.0, PAL_PLAYER1 + game.active_player_index,
+                         hud_text, game.theme_bg_color, game.theme_ground_color, steps)
+            renderer.submit(snap)
+            clock.tick(fps)
+    return steps, diverged, time.perf_counter() - start
+
+# Frame pacing. Python's cyclic garbage collector runs whenever enough container objects have
+# piled up, wherever that happens to be in a frame, and an older-generation pass can take
+# longer than a frame. With frame pacing on, automatic collection is off during gameplay,
+# everything alive once a level has loaded is moved out of the collector's way with
+# gc.freeze(), and the young generation is collected by hand when a frame finishes early.
+# Blocks left allocated by each frame are counted (sys.getallocatedblocks(), process wide, so
+# the render thread counts too) and a RuntimeWarning is issued through the warnings module
+# when frames go over the budget, so it can be filtered or turned into an error.
+GC_MIN_SLACK = 0.002  # seconds that must be left in a frame to start a collection
+GC_FORCE_FACTOR = 4  # collect without slack once this many gen-0 thresholds have piled up
+DEFAULT_ALLOC_BUDGET = 500  # blocks a frame may leave allocated
+ALLOC_WARN_INTERVAL = 1.0  # seconds between over-budget warnings
+
+class FramePacer:
+    """Garbage-collector control and an allocation budget for the gameplay frames of main().
+
+    fps: the render frame rate cap, which sets the frame's time budget (0: no slack, so young
+    collections only run once GC_FORCE_FACTOR thresholds have piled up).
+    alloc_budget: blocks a frame may leave allocated before it counts as over budget.
+    trace: also trace allocations with tracemalloc and report each warned frame's peak, which
+    counts short-lived allocations too (tracing slows everything down).
+    """
+
+    def __init__(self, fps, alloc_budget=DEFAULT_ALLOC_BUDGET, trace=False):
+        self.frame_time = 1.0 / fps if fps else 0.0
+        self.alloc_budget = alloc_budget
+        self.trace = trace
+        self.level = None  # start snapshot of the level that was last frozen
+        self.frame = 0
+        self.frame_start = 0.0
+        self.blocks = 0
+        self.traced = 0
+        self.collections = 0  # young (and middle) generation collections run by hand
+        self.forced = 0  # ... of which had no slack left
+        self.frozen = 0  # level loads followed by a full collection and a freeze
+        self.over_budget = 0  # frames over the allocation budget
+        self.unreported = 0  # ... since the last warning
+        self.worst = 0  # most blocks left allocated by one frame
+        self.last_warning = 0.0
+
+    def start(self):
+        """Enter gameplay: hand collection over to end_frame()."""
+        gc.disable()
+        if self.trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        """Leave gameplay (menus, game over, quit): automatic collection takes over again."""
+        if self.trace:
+            tracemalloc.stop()
+        gc.unfreeze()
+        gc.enable()
+        self.level = None
+
+    def begin_frame(self):
+        self.frame += 1
+        self.blocks = sys.getallocatedblocks()
+        if self.trace:
+            tracemalloc.reset_peak()
+            self.traced = tracemalloc.get_traced_memory()[0]
+        self.frame_start = time.perf_counter()
+
+    def end_frame(self, game):
+        """Check the frame's allocations, then collect in the time left until the next one."""
+        blocks = sys.getallocatedblocks() - self.blocks
+        if game.level_start_snapshot is not self.level:
+            # A level (or a different level's snapshot) was loaded this frame, which is allowed
+            # to allocate: one full pass, then freeze what survived so later collections never
+            # look at it again
+            self.level = game.level_start_snapshot
+            gc.unfreeze()  # the previous level's tiles and snapshots can go now
+            gc.collect()
+            gc.freeze()
+            self.frozen += 1
+            return
+        if blocks > self.alloc_budget:
+            self.over_budget += 1
+            self.unreported += 1
+            self.worst = max(self.worst, blocks)
+            now = time.perf_counter()
+            if now - self.last_warning >= ALLOC_WARN_INTERVAL:
+                peak = ""
+                if self.trace:
+                    peak = f", peak {(tracemalloc.get_traced_memory()[1] - self.traced) / 1024:.1f} KiB"
+                warnings.warn(f"frame {self.frame} left {blocks} blocks allocated (budget {self.alloc_budget}{peak});"
+                              f" {self.unreported} frames over budget since the last warning", RuntimeWarning)
+                self.unreported = 0
+                self.last_warning = now
+        young, middle, _ = gc.get_count()
+        threshold0, threshold1, _ = gc.get_threshold()
+        if young < threshold0:
+            return
+        slack = self.frame_time - (time.perf_counter() - self.frame_start)
+        if slack >= GC_MIN_SLACK or young >= GC_FORCE_FACTOR * threshold0:
+            if slack < GC_MIN_SLACK:
+                self.forced += 1
+            # Objects that outlive the young generation pile up in the middle one; the oldest
+            # is left for the full pass at the next level load
+            gc.collect(1 if middle >= threshold1 else 0)
+            self.collections += 1
+
+    def report(self):
+        return (f"frame pacing: {self.frame} frames, {self.collections} collections ({self.forced} without slack),"
+                f" {self.frozen} level freezes, {self.over_budget} frames over {self.alloc_budget} blocks"
+                f" (worst {self.worst})")
+
+def main(paletted=False, threaded=True, fps=60, fixed_point=False, record=None, endless=False, level_width=None,
+         frame_pacing=False, alloc_budget=DEFAULT_ALLOC_BUDGET, trace_allocs=False):
+    """Run the game: menu, levels and game-over screens until the window is closed.
+
+    paletted: render into an 8-bit surface with an NES-style palette instead of 32-bit colour.
+    threaded: pipeline rendering on a worker thread; False draws each frame on the main thread.
+    fps: cap on rendered frames per second (0 for uncapped); the simulation always runs at SIM_HZ.
+    fixed_point: run entity physics on integer subpixels instead of floats.
+    record: path of the replay file for the first game's inputs; later games get numbered
+    files next to it (see InputRecorder).
+    endless: stream endless levels chunk by chunk; level_width: stream levels this many tiles wide.
+    frame_pacing: control the garbage collector during gameplay and warn about frames that leave
+    more than alloc_budget blocks allocated (see FramePacer); trace_allocs adds tracemalloc peaks.
+    """
+    global game_surface
+
+    init_display()
+    init_audio()
+    load_saves()
+    game = Game(fixed_point, write_saves=True, streaming=endless or level_width is not None,
+                stream_width=level_width)
+    if paletted:
+        game_surface = make_paletted_surface()
+    use_surface_colors(game_surface)
+    prebake_tile_sheets(game_surface)
+    step_count = 0  # simulation steps run, drives palette cycling
+    recorder = InputRecorder(record) if record else None
+    renderer = FrameRenderer(game_surface, threaded)
+    pacer = FramePacer(fps, alloc_budget, trace_allocs) if frame_pacing else None
+
+    # Start background music (loop indefinitely)
+    pygame.mixer.Channel(MUSIC_CHANNEL).play(background_music, loops=-1)
+
+    clock = pygame.time.Clock()
+
+    # Main game loop
+    running = True
+    state = "menu"
+    while running:
+        if state == "menu":
+            # Draw menu
+            renderer.wait_idle()
+            game_surface.fill((0, 0, 0))
+            title_text = font.render("SELECT FILE (1-3):", True, COLOR_TEXT)
+            game_surface.blit(title_text, (40, 50))
+            # Display each slot status
+            for i in range(1, 4):
+                w = saves.get(str(i), 1)
+                status = f"World {w}-1" if w <= 8 else "Completed!"
+                slot_text = font.render(f"{i}. {status}", True, COLOR_TEXT)
+                game_surface.blit(slot_text, (60, 50 + 20 * i))
+            # Blit menu to window
+            present(game_surface)
+
+            # Handle menu events
+            menu_chosen = False
+            while not menu_chosen:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                        menu_chosen = True
+                        break
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_1 or event.key == pygame.K_KP1:
+                            slot = 1
+                            menu_chosen = True
+                        elif event.key == pygame.K_2 or event.key == pygame.K_KP2:
+                            slot = 2
+                            menu_chosen = True
+                        elif event.key == pygame.K_3 or event.key == pygame.K_KP3:
+                            slot = 3
+                            menu_chosen = True
+                clock.tick(30)
+            if not running:
+                break
+            # Setup game start based on selected slot
+            world = saves.get(str(slot), 1)
+            if world < 1 or world > 8:
+                world = 1
+            seed = game.new_game(slot, world)
+            if recorder is not None:
+                recorder.begin(game, seed)
+            state = "game"
+            accumulator = 0.0  # real time not yet simulated, in seconds
+            jump_requested = False
+            checkpoint = game.level_start_snapshot
+            if pacer is not None:
+                pacer.start()
+        elif state == "game":
+            # Game playing state
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     running = False
-                    waiting = False
                 if event.type == pygame.KEYDOWN:
-                    waiting = False
-        # After any key, go back to menu
-        state = "menu"
-        win = False
-        game_over = False
-        playing = False
-
-# Cleanup
-pygame.quit()
+                    if event.key == pygame.K_ESCAPE:
+                        running = False
+                    if event.key == pygame.K_SPACE or event.key == pygame.K_UP:
+                        # Latch the jump until the next simulation step consumes it
+                        jump_requested = True
+                    if recorder is not None:
+                        pass  # quick-save/load and checkpoints would desync a recording
+                    elif event.key == pygame.K_F5:
+                        # Quick-save to disk
+                        save_snapshot(game.take_snapshot(), QUICKSAVE_FILE)
+                    elif event.key == pygame.K_F9:
+                        # Quick-load from disk, if there is a quick-save
+                        try:
+                            game.restore_snapshot(load_snapshot(QUICKSAVE_FILE))
+                        except FileNotFoundError:
+                            pass
+                    elif event.key == pygame.K_F7:
+                        # Go back to the last automatic checkpoint
+                        game.restore_snapshot(checkpoint)
+                # No explicit event for left/right; handled by keys pressed state below
+
+            # Key state for continuous movement
+            keys = pygame.key.get_pressed()
+            move = -1 if keys[pygame.K_LEFT] else (1 if keys[pygame.K_RIGHT] else 0)
+
+            # Fixed-timestep simulation: run as many SIM_DT steps as real time has accumulated,
+            # capped at MAX_CATCHUP_STEPS so a long hitch slows the game instead of snowballing
+            accumulator += min(clock.tick(fps) / 1000.0, MAX_CATCHUP_STEPS * SIM_DT)
+            if pacer is not None:
+                pacer.begin_frame()
+            voices.begin_frame()
+            while accumulator >= SIM_DT and game.playing:
+                if recorder is not None:
+                    recorder.record(input_mask(move, jump_requested))
+                game.step(move, jump_requested)
+                for name in game.events:
+                    voices.play(name)
+                if recorder is not None:
+                    recorder.after_step()
+                jump_requested = False
+                accumulator -= SIM_DT
+                step_count += 1
+                if step_count % CHECKPOINT_STEPS == 0 and game.playing:
+                    checkpoint = game.take_snapshot()
+            if not game.playing:
+                state = "game_over"  # triggers game over or win message
+                if recorder is not None:
+                    recorder.save()
+                if pacer is not None:
+                    pacer.stop()
+                continue
+
+            # Drawing the game frame: capture a snapshot and hand it to the renderer
+            players = game.players
+            hud_text = (f"World {game.world}-{game.level}   {players[0]['name']}:{players[0]['lives']}  {players[1]['name']}:{players[1]['lives']}"
+                        f"\nCOINS x{players[game.active_player_index]['coins']:02d}")
+            snap = renderer.begin_frame()
+            # Draw between the last two steps, by how far real time is into the next one
+            alpha = accumulator / SIM_DT
+            snap.capture(game.level_map, game.goombas, game.player, alpha, PAL_PLAYER1 + game.active_player_index,
+                         hud_text, game.theme_bg_color, game.theme_ground_color, step_count)
+            renderer.submit(snap)
+            if pacer is not None:
+                pacer.end_frame(game)
+        elif state == "game_over":
+            # Display Game Over or Victory message
+            renderer.wait_idle()
+            game_surface.fill((0, 0, 0))
+            if game.win:
+                msg = "YOU WIN! CONGRATULATIONS!"
+            else:
+                msg = "GAME OVER"
+            over_text = font.render(msg, True, COLOR_TEXT)
+            prompt_text = font.render("Press any key to return to menu", True, COLOR_TEXT)
+            game_surface.blit(over_text, (60, 100))
+            game_surface.blit(prompt_text, (20, 130))
+            present(game_surface)
+            # Wait for key press or quit
+            waiting = True
+            while waiting:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                        waiting = False
+                    if event.type == pygame.KEYDOWN:
+                        waiting = False
+            # After any key, go back to menu
+            state = "menu"
+            game.win = False
+            game.game_over = False
+            game.playing = False
+
+    # Cleanup
+    if recorder is not None:
+        recorder.save()  # keep the inputs of a game quit midway
+    renderer.stop()
+    if pacer is not None:
+        pacer.stop()
+        print(pacer.report())
+    pygame.quit()
+
+def level_width(text):
+    """--level-width: a streamed level has to be at least one chunk wide."""
+    width = int(text)
+    if width < CHUNK_COLUMNS:
+        raise argparse.ArgumentTypeError(f"must be at least {CHUNK_COLUMNS} tiles")
+    return width
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Super Mario Bros. Python Clone")
+    parser.add_argument("--paletted", action="store_true", help="render through an 8-bit NES-style palette")
+    parser.add_argument("--single-threaded", action="store_true", help="draw frames on the main thread instead of a render worker")
+    parser.add_argument("--fps", type=int, default=60, help="render frame rate cap, 0 for uncapped (simulation stays at 60 Hz)")
+    parser.add_argument("--fixed-point", action="store_true", help="integer 1/16-pixel physics (bit-reproducible)")
+    parser.add_argument("--endless", action="store_true", help="endless levels, streamed chunk by chunk")
+    parser.add_argument("--level-width", type=level_width, metavar="TILES", help=f"streamed levels of this width in tiles (at least {CHUNK_COLUMNS})")
+    parser.add_argument("--frame-pacing", action="store_true", help="collect garbage between frames instead of mid-frame, and warn about frames over the allocation budget")
+    parser.add_argument("--alloc-budget", type=int, default=DEFAULT_ALLOC_BUDGET, metavar="BLOCKS", help="with --frame-pacing: blocks a frame may leave allocated")
+    parser.add_argument("--trace-allocs", action="store_true", help="with --frame-pacing: also report tracemalloc peaks (slow)")
+    parser.add_argument("--record", metavar="FILE", help="record the inputs of each game into a replay file (FILE, then FILE-2, FILE-3, ... with the extension kept)")
+    parser.add_argument("--replay", metavar="FILE", help="play a replay file back instead of the menu")
+    parser.add_argument("--headless", action="store_true", help="with --replay: simulate at full speed without drawing")
+    args = parser.parse_args()
+    if args.replay:
+        steps, diverged, seconds = run_replay(args.replay, render=not args.headless, fps=0 if args.headless else args.fps)
+        print(f"replayed {steps} steps in {seconds:.2f}s ({steps / max(seconds, 1e-9):.0f} steps/s)")
+        print("state matches the recording" if diverged is None else f"DIVERGED at step {diverged}")
+        pygame.quit()
+    else:
+        main(paletted=args.paletted, threaded=not args.single_threaded, fps=args.fps,
+             fixed_point=args.fixed_point, record=args.record, endless=args.endless, level_width=args.level_width,
+             frame_pacing=args.frame_pacing, alloc_budget=args.alloc_budget, trace_allocs=args.trace_allocs)
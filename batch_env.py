@@ -0,0 +1,245 @@
+# Batched, display-free Ultramariov0 environments for automated playthroughs
+# N independent Game instances are split across worker processes. Actions, observations,
+# rewards and done flags live in shared memory, so a batch step only sends one short command
+# per worker over a pipe; the per-instance data never gets pickled.
+#
+#   with BatchEnv(num_envs=256) as env:
+#       obs = env.reset()
+#       for _ in range(1000):
+#           obs, rewards, dones = env.step([INPUT_RIGHT | INPUT_JUMP] * env.num_envs)
+#       print(env.steps_per_second())
+#
+# Observations are a flat float32 buffer of num_envs * OBS_SIZE values (see OBS_FIELDS);
+# numpy users can wrap it with numpy.frombuffer(env.obs, numpy.float32).reshape(-1, OBS_SIZE).
+import os
+import time
+import weakref
+import multiprocessing
+from multiprocessing import shared_memory
+
+# Same bits as Ultramariov0.input_mask(); repeated here so this module never imports the game
+INPUT_LEFT = 1
+INPUT_RIGHT = 2
+INPUT_JUMP = 4
+
+OBS_FIELDS = ("x", "y", "vx", "vy", "on_ground", "world", "level", "lives",
+              "goomba_dx", "goomba_dy", "episode_steps")
+OBS_SIZE = len(OBS_FIELDS)
+NO_GOOMBA = 256.0  # goomba_dx/dy when no live goomba is active
+
+# Reward shaping: progress to the right in tiles, plus a bonus or penalty when the episode ends
+CLEAR_REWARD = 10.0
+DEATH_REWARD = -10.0
+DEFAULT_MAX_STEPS = 60 * 60  # one minute of game time per attempt
+ALL_LEVELS = [(world, level) for world in range(1, 9) for level in range(1, 5)]
+
+def _worker(conn, names, first, count, num_envs, levels, max_steps, fixed_point):
+    """Own games first..first+count-1 and step them whenever the parent asks."""
+    # No window or sound device in workers; must be set before pygame is imported
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    import Ultramariov0 as game
+
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    obs = blocks[0].buf.cast("f")
+    rewards = blocks[1].buf.cast("f")
+    dones = blocks[2].buf
+    actions = blocks[3].buf
+    games = [game.Game(fixed_point) for _ in range(count)]
+    episode_steps = [0] * count
+    next_level = list(range(first, first + count))  # spread instances over the level list
+    tile = float(game.TILE_SIZE)
+
+    def reset(i):
+        world, level = levels[next_level[i] % len(levels)]
+        next_level[i] += num_envs
+        games[i].new_game(None, world, level, seed=0)
+        episode_steps[i] = 0
+
+    def observe(i):
+        g = games[i]
+        p = g.player
+        dx = dy = NO_GOOMBA
+        for e in g.goombas:
+            if e.alive and abs(e.x - p.x) < abs(dx):
+                dx = e.x - p.x
+                dy = e.y - p.y
+        base = (first + i) * OBS_SIZE
+        obs[base] = p.x
+        obs[base + 1] = p.y
+        obs[base + 2] = p.vx
+        obs[base + 3] = p.vy
+        obs[base + 4] = p.on_ground
+        obs[base + 5] = g.world
+        obs[base + 6] = g.level
+        obs[base + 7] = g.players[g.active_player_index]["lives"]
+        obs[base + 8] = dx
+        obs[base + 9] = dy
+        obs[base + 10] = episode_steps[i]
+
+    try:
+        while True:
+            command = conn.recv()
+            if command == "step":
+                for i, g in enumerate(games):
+                    index = first + i
+                    move, jump = game.decode_input(actions[index])
+                    stage = (g.world, g.level)
+                    active = g.players[g.active_player_index]
+                    x = g.player.x
+                    g.step(move, jump)
+                    episode_steps[i] += 1
+                    # An episode is one attempt at one level: it ends on a clear, a death or a timeout
+                    if (g.world, g.level) != stage or g.win:
+                        reward, done = CLEAR_REWARD, True
+                    elif active["lives"] <= 0:
+                        reward, done = DEATH_REWARD, True
+                    else:
+                        reward, done = (g.player.x - x) / tile, episode_steps[i] >= max_steps
+                    rewards[index] = reward
+                    dones[index] = 1 if done else 0
+                    if done:
+                        reset(i)
+                    observe(i)
+                conn.send(count)
+            elif command == "reset":
+                for i in range(count):
+                    reset(i)
+                    rewards[first + i] = 0.0
+                    dones[first + i] = 0
+                    observe(i)
+                conn.send(count)
+            else:  # "close"
+                break
+    finally:
+        # Views into shared memory must go before the blocks can be closed
+        obs.release()
+        rewards.release()
+        for block in blocks:
+            block.close()
+        conn.close()
+
+WORKER_EXIT_TIMEOUT = 5.0  # seconds a worker gets to exit after "close" before it is terminated
+
+def _release(conns, workers, views, blocks):
+    """Stop the workers and free the shared memory; what BatchEnv.close() and its finalizer run."""
+    for conn in conns:
+        try:
+            conn.send("close")
+        except OSError:
+            pass  # worker already gone
+        conn.close()
+    for process in workers:
+        process.join(WORKER_EXIT_TIMEOUT)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+    # Unlink first: that frees the segments even if a caller still holds a numpy array over
+    # env.obs, which makes releasing the views and closing the blocks raise BufferError. The
+    # mapping itself then lives on until the last such array goes
+    for block in blocks:
+        block.unlink()
+    for view in views:
+        try:
+            view.release()
+        except BufferError:
+            pass
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:
+            pass
+
+class BatchEnv:
+    """num_envs independent games stepped in lockstep by num_workers processes.
+
+    Every game starts on its own entry of `levels` (world, level) and moves on through the list
+    each time an episode ends; finished games reset automatically inside step().
+    Use it as a context manager, or call close(): that stops the workers and frees the shared
+    memory. An environment that is garbage collected (or still open when the interpreter
+    exits) is closed then, so a forgotten close() leaves no /dev/shm segments or processes.
+    """
+
+    def __init__(self, num_envs, num_workers=None, levels=ALL_LEVELS, max_steps=DEFAULT_MAX_STEPS,
+                 fixed_point=True):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(1, min(num_workers, num_envs))
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.total_steps = 0  # environment steps, summed over instances
+        self.step_seconds = 0.0  # wall time spent in step()
+        sizes = (num_envs * OBS_SIZE * 4, num_envs * 4, num_envs, num_envs)
+        self._blocks = []
+        self._conns = []
+        self._workers = []
+        views = []
+        # The finalizer holds the lists, never self, and runs once: from close(), on garbage
+        # collection or at interpreter exit
+        self._finalizer = weakref.finalize(self, _release, self._conns, self._workers, views, self._blocks)
+        try:
+            for size in sizes:
+                self._blocks.append(shared_memory.SharedMemory(create=True, size=size))
+            self.obs = self._blocks[0].buf.cast("f")
+            self.rewards = self._blocks[1].buf.cast("f")
+            views += (self.obs, self.rewards)
+            self.dones = self._blocks[2].buf
+            self.actions = self._blocks[3].buf
+            # Spawned (not forked) workers start from a clean interpreter without any pygame state
+            context = multiprocessing.get_context("spawn")
+            names = [block.name for block in self._blocks]
+            first = 0
+            for w in range(num_workers):
+                count = num_envs // num_workers + (w < num_envs % num_workers)
+                parent, child = context.Pipe()
+                process = context.Process(target=_worker, name=f"env-{w}", daemon=True,
+                                          args=(child, names, first, count, num_envs, list(levels),
+                                                max_steps, fixed_point))
+                self._conns.append(parent)
+                process.start()
+                child.close()
+                self._workers.append(process)
+                first += count
+        except BaseException:
+            self.close()
+            raise
+
+    def _broadcast(self, command):
+        for conn in self._conns:
+            conn.send(command)
+        return sum(conn.recv() for conn in self._conns)
+
+    def reset(self):
+        """Start every game on the next level of its rotation; returns the observation buffer."""
+        self._broadcast("reset")
+        return self.obs
+
+    def step(self, actions):
+        """Run one simulation step in every game with the given input masks (INPUT_* bits).
+
+        Returns (obs, rewards, dones), views into shared memory that the next call overwrites.
+        """
+        self.actions[:] = bytes(actions)
+        start = time.perf_counter()
+        self.total_steps += self._broadcast("step")
+        self.step_seconds += time.perf_counter() - start
+        return self.obs, self.rewards, self.dones
+
+    def observation(self, index):
+        """The OBS_SIZE values of one game, as a list."""
+        return self.obs[index * OBS_SIZE:(index + 1) * OBS_SIZE].tolist()
+
+    def steps_per_second(self):
+        """Aggregate environment steps per second of step() wall time."""
+        return self.total_steps / self.step_seconds if self.step_seconds else 0.0
+
+    def close(self):
+        """Stop the workers and free the shared memory; safe to call more than once."""
+        self.obs = self.rewards = self.dones = self.actions = None
+        self._finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
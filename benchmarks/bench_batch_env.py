@@ -0,0 +1,94 @@
+# Batched environment throughput for Ultramariov0 (batch_env.BatchEnv)
+# Steps the same set of games with 1, 2, 4, ... worker processes up to the core count and
+# reports aggregate environment steps per second. Every worker count must produce exactly the
+# same observations, rewards and done flags, since each game is deterministic. Also checks
+# that an environment left by an exception, dropped without close(), or closed while a numpy
+# array still wraps its observations, stops its workers and frees its shared memory.
+# Run from the repository root:  python benchmarks/bench_batch_env.py
+import os
+import gc
+import sys
+import zlib
+from multiprocessing import shared_memory
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_env import BatchEnv, OBS_SIZE, INPUT_LEFT, INPUT_RIGHT, INPUT_JUMP
+
+ENVS = 256
+STEPS = 600
+
+def policy(step, index):
+    # Mostly run right and jump now and then, each game slightly out of phase with the others
+    t = step + index * 7
+    mask = INPUT_LEFT if (t // 90) % 4 == 3 else INPUT_RIGHT
+    return mask | (INPUT_JUMP if t % 37 == 0 else 0)
+
+def run(workers):
+    with BatchEnv(ENVS, num_workers=workers) as env:
+        env.reset()
+        crc = 0
+        episodes = 0
+        for step in range(STEPS):
+            obs, rewards, dones = env.step([policy(step, i) for i in range(ENVS)])
+            crc = zlib.crc32(obs, crc)
+            crc = zlib.crc32(rewards, crc)
+            episodes += sum(dones)
+        return env.steps_per_second(), crc, episodes
+
+def released(names, workers):
+    """Whether every worker has exited and every shared memory block is gone."""
+    for name in names:
+        try:
+            shared_memory.SharedMemory(name=name).close()
+            return False
+        except FileNotFoundError:
+            pass
+    return not any(process.is_alive() for process in workers)
+
+def check_cleanup():
+    try:
+        with BatchEnv(4, num_workers=2) as env:
+            env.reset()
+            names = [block.name for block in env._blocks]
+            workers = list(env._workers)
+            raise KeyError("stop")
+    except KeyError:
+        pass
+    assert released(names, workers), "exception in a with block leaked workers or shared memory"
+    env = BatchEnv(4, num_workers=2)
+    env.reset()
+    names = [block.name for block in env._blocks]
+    workers = list(env._workers)
+    del env  # never closed
+    gc.collect()
+    assert released(names, workers), "dropped environment leaked workers or shared memory"
+    env = BatchEnv(4, num_workers=2)
+    obs = np.frombuffer(env.reset(), np.float32)  # as the batch_env header suggests
+    names = [block.name for block in env._blocks]
+    workers = list(env._workers)
+    env.close()
+    assert released(names, workers), "closing under a numpy view leaked shared memory"
+    assert len(obs) == 4 * OBS_SIZE and obs[0] > 0  # and the array stays readable
+    del obs
+    print("workers and shared memory released on exceptions, without close() and under numpy views")
+
+if __name__ == "__main__":
+    check_cleanup()
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    print(f"{ENVS} games x {STEPS} steps, {cores} cores")
+    print(f"{'workers':>7s} {'steps/s':>10s} {'speedup':>8s} {'episodes':>9s}")
+    base = reference = None
+    for workers in counts:
+        rate, crc, episodes = run(workers)
+        if base is None:
+            base, reference = rate, crc
+        assert crc == reference, f"results differ with {workers} workers"
+        print(f"{workers:7d} {rate:10.0f} {rate / base:7.2f}x {episodes:9d}")
@@ -0,0 +1,83 @@
+# Broadphase scaling benchmark for Ultramariov0
+# Times one frame of "move goombas, update the sweep-and-prune list, find goomba pairs and
+# the goombas touching the player" against a brute-force all-pairs check, for growing counts.
+# Also checks a pile-up where bumping pushes a goomba past its neighbour: the sweep order must
+# be sorted again afterwards, and the player's query must find every goomba it touches.
+# Run from the repository root:  python benchmarks/bench_broadphase.py
+import os
+import sys
+import time
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Ultramariov0 as game
+
+FRAMES = 60
+
+def make_goombas(n):
+    # Spread goombas over a level wide enough to hold them a few tiles apart
+    rng = random.Random(n)
+    width_px = max(n, 16) * 3 * game.TILE_SIZE
+    goombas = [game.Goomba(rng.randrange(width_px), 13 * game.TILE_SIZE) for _ in range(n)]
+    for g in goombas:
+        g.vx = rng.choice((-1, 1))
+    return goombas
+
+def brute_force(goombas, player):
+    pairs = 0
+    for i, a in enumerate(goombas):
+        ra = a.rect()
+        for b in goombas[i + 1:]:
+            if ra.colliderect(b.rect()):
+                pairs += 1
+    pr = player.rect()
+    hits = sum(1 for g in goombas if pr.colliderect(g.rect()))
+    return pairs, hits
+
+def sweep(broadphase, player):
+    broadphase.update()
+    pairs = sum(1 for _ in broadphase.pairs())
+    hits = sum(1 for _ in broadphase.query(player.x, player.x + player.width))
+    return pairs, hits
+
+def time_frames(goombas, step):
+    start = time.perf_counter()
+    for _ in range(FRAMES):
+        for g in goombas:
+            g.x += g.vx
+        step()
+    return (time.perf_counter() - start) / FRAMES * 1e6
+
+def check_pile_up():
+    # Five goombas walking into each other; bumping them apart swaps the first two
+    goombas = [game.Goomba(x, 13 * game.TILE_SIZE) for x in (2, 3, 4, 12, 17)]
+    broadphase = game.SweepAndPrune()
+    broadphase.reset(goombas)
+    game.bump_goombas(broadphase)
+    xs = [g.x for g in broadphase.order]
+    assert xs == sorted(xs), "sweep order out of date after bumping"
+    player = game.Player()
+    pr = player.rect()
+    for x in range(-20, 50):
+        player.x = x
+        pr.x = x
+        found = set(map(id, broadphase.query(player.x, player.x + player.width)))
+        assert found >= {id(g) for g in goombas if pr.colliderect(g.rect())}, "query missed a touching goomba"
+    print("pile-up: order re-sorted after bumping, queries find every touching goomba")
+
+if __name__ == "__main__":
+    check_pile_up()
+    player = game.Player()
+    player.x, player.y = 400, 13 * game.TILE_SIZE
+    print(f"{'goombas':>8s} {'brute us/frame':>15s} {'sweep us/frame':>15s}")
+    for n in (10, 100, 300, 1000):
+        goombas = make_goombas(n)
+        brute = time_frames(goombas, lambda: brute_force(goombas, player)) if n <= 300 else float("nan")
+        goombas = make_goombas(n)
+        broadphase = game.SweepAndPrune()
+        broadphase.reset(goombas)
+        swept = time_frames(goombas, lambda: sweep(broadphase, player))
+        print(f"{n:8d} {brute:15.1f} {swept:15.1f}")
@@ -0,0 +1,117 @@
+# Per-frame allocation benchmark for Ultramariov0 entities
+# Compares the original dict-based Player/Goomba (fresh Rect from every rect() call,
+# goomba list rebuilt on every level load) against the slotted, pooled entities. With the 80
+# goombas below, the legacy entities make about 77 allocations per frame and the pooled ones
+# none. (The figure of about 97 quoted when pooling was added came from the first version of
+# this benchmark: one row of 100 goombas, before the camera activation window.)
+# Run from the repository root:  python benchmarks/bench_entities.py
+import os
+import sys
+import time
+
+# Headless: no window or audio device needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import Ultramariov0 as game
+
+FRAMES = 600
+RESPAWN_EVERY = 120  # simulate a death / level load every 2 seconds of play
+
+# Count every Rect and entity constructed while the benchmark runs
+counts = {"Rect": 0, "entity": 0}
+_Rect = pygame.Rect
+
+class CountingRect(_Rect):
+    def __init__(self, *args):
+        counts["Rect"] += 1
+        super().__init__(*args)
+
+# Original entity classes, kept here as the baseline
+class LegacyPlayer:
+    def __init__(self):
+        counts["entity"] += 1
+        self.x = 0
+        self.y = 0
+        self.vx = 0
+        self.vy = 0
+        self.width = 16
+        self.height = 16
+        self.on_ground = False
+
+    def rect(self):
+        return pygame.Rect(int(self.x), int(self.y), self.width, self.height)
+
+class LegacyGoomba:
+    def __init__(self, x, y):
+        counts["entity"] += 1
+        self.x = x
+        self.y = y
+        self.vx = -1
+        self.vy = 0
+        self.width = 16
+        self.height = 16
+        self.on_ground = False
+        self.alive = True
+
+    def rect(self):
+        return pygame.Rect(int(self.x), int(self.y), self.width, self.height)
+
+def legacy_spawn(level_map, goombas):
+    goombas = []
+    for iy, row in enumerate(level_map):
+        for ix, ch in enumerate(row):
+            if ch == 'G':
+                goombas.append(LegacyGoomba(ix * game.TILE_SIZE, iy * game.TILE_SIZE))
+    return goombas
+
+spawner = game.EnemySpawner()
+broadphase = game.SweepAndPrune()
+
+def pooled_spawn(level_map, goombas):
+    # spawn_goombas strips 'G' from the map, so hand it a copy
+    game.spawn_goombas(list(level_map), goombas, spawner, broadphase)
+    return goombas
+
+def run(player, spawn, goomba_rows):
+    """Simulate FRAMES frames of goomba movement plus the player-vs-goomba rect checks."""
+    level_map = list(goomba_rows)
+    goombas = spawn(level_map, [])
+    for frame in range(FRAMES):
+        if frame % RESPAWN_EVERY == 0:
+            goombas = spawn(level_map, goombas)
+        player.x = frame % 200
+        player.y = 200
+        for goomba in goombas:
+            goomba.x += goomba.vx
+        player_rect = player.rect()
+        for goomba in goombas:
+            if not goomba.alive:
+                continue
+            if player_rect.colliderect(goomba.rect()):
+                goomba.alive = False
+
+def measure(name, make_player, spawn, goomba_rows):
+    counts["Rect"] = counts["entity"] = 0
+    pygame.Rect = CountingRect
+    try:
+        player = make_player()
+        start = time.perf_counter()
+        run(player, spawn, goomba_rows)
+        elapsed = time.perf_counter() - start
+    finally:
+        pygame.Rect = _Rect
+    allocs = counts["Rect"] + counts["entity"]
+    print(f"{name:8s} rects={counts['Rect']:7d} entities={counts['entity']:5d} "
+          f"allocs/frame={allocs / FRAMES:8.2f}  frame={elapsed / FRAMES * 1e6:7.1f} us")
+
+if __name__ == "__main__":
+    # 80 goombas inside the camera's activation window, on a plain level background
+    width = game.SCREEN_WIDTH_TILES
+    goomba_rows = ["." * width] * 3 + ["G." * (width // 2)] * 10 + ["." * width, "X" * width]
+    measure("legacy", LegacyPlayer, legacy_spawn, goomba_rows)
+    # Warm the pool once so the measured run only recycles
+    game.goomba_pool.release_all(pooled_spawn(goomba_rows, []))
+    measure("slotted", game.Player, pooled_spawn, goomba_rows)
@@ -0,0 +1,101 @@
+# Frame pacing benchmark for Ultramariov0
+# Plays headless gameplay frames (one simulation step and an off-screen render each) on top of
+# a large long-lived heap, with a little cyclic garbage and some objects that live for a few
+# frames, as checkpoints and HUD text do. Runs once with Python's automatic garbage collection
+# and once with a FramePacer, and reports the frame times, how many collections landed inside
+# a frame and how long those took, and the pacer's own counters. Frames over the allocation
+# budget must be reported as RuntimeWarnings, not printed.
+# Run from the repository root:  python benchmarks/bench_frame_pacing.py
+import os
+import sys
+import gc
+import time
+import warnings
+from collections import deque
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import Ultramariov0 as game
+
+FRAMES = 1200
+BALLAST = 300_000  # long-lived objects, like a big game's loaded assets and levels
+CYCLES = 50  # cyclic garbage per frame
+KEEP = 200  # objects made each frame that stay alive for a while, like particles
+KEEP_FRAMES = 30  # ... for this many frames
+
+class GCWatch:
+    """Times the collections that start while a frame is being worked on."""
+
+    def __init__(self):
+        self.in_frame = False
+        self.count = 0
+        self.seconds = 0.0
+        self.start = 0.0
+
+    def __call__(self, phase, info):
+        if not self.in_frame:
+            return
+        if phase == "start":
+            self.start = time.perf_counter()
+        else:
+            self.count += 1
+            self.seconds += time.perf_counter() - self.start
+
+def run(paced):
+    state = game.Game(fixed_point=True)
+    surface = pygame.Surface((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+    renderer = game.FrameRenderer(surface, threaded=False)
+    ballast = [{"id": i} for i in range(BALLAST)]
+    kept = deque(maxlen=KEEP_FRAMES)
+    watch = GCWatch()
+    gc.callbacks.append(watch)
+    pacer = game.FramePacer(60) if paced else None
+    gc.collect()
+    state.new_game(None, 1, 1, seed=1)
+    if pacer is not None:
+        pacer.start()
+    times = []
+    for frame in range(FRAMES):
+        if pacer is not None:
+            pacer.begin_frame()
+        watch.in_frame = True
+        start = time.perf_counter()
+        state.step(1, frame % 40 == 0)
+        for _ in range(CYCLES):
+            junk = []
+            junk.append(junk)
+        kept.append([state.take_snapshot()] + [[frame, i] for i in range(KEEP)])
+        snap = renderer.begin_frame()
+        snap.capture(state.level_map, state.goombas, state.player, 1.0, game.PAL_PLAYER1,
+                     f"FRAME {frame}", state.theme_bg_color, state.theme_ground_color, frame)
+        renderer.submit(snap)
+        times.append(time.perf_counter() - start)
+        watch.in_frame = False
+        if pacer is not None:
+            pacer.end_frame(state)
+    if pacer is not None:
+        pacer.stop()
+    gc.callbacks.remove(watch)
+    renderer.stop()
+    del ballast
+    times.sort()
+    print(f"{'frame pacing' if paced else 'automatic gc':13s} median {times[len(times) // 2] * 1e3:6.3f} ms"
+          f"  p99 {times[len(times) * 99 // 100] * 1e3:6.3f} ms  max {times[-1] * 1e3:6.3f} ms"
+          f"  {watch.count:4d} collections in frames ({watch.seconds * 1e3:.1f} ms)")
+    if pacer is not None:
+        print(" ", pacer.report())
+        assert watch.count == 0, "a collection ran inside a paced frame"
+    return pacer
+
+if __name__ == "__main__":
+    game.init_display()  # the HUD needs the font
+    run(False)
+    with warnings.catch_warnings(record=True) as warned:
+        warnings.simplefilter("always")
+        pacer = run(True)
+    assert all(w.category is RuntimeWarning for w in warned)
+    assert bool(warned) == bool(pacer.over_budget), "frames over budget not reported as warnings"
+    print(f"  {len(warned)} over-budget warnings")
@@ -0,0 +1,106 @@
+# Float vs fixed-point (1/16 pixel) physics for Ultramariov0
+# Checks that the integer path gives the same trajectory on repeated runs, and the same one as
+# the float path, then times both paths on a scripted run through every world/level. Goombas
+# that walk into each other are pushed apart by bump_goombas(), so a pile-up in a walled room
+# is checked to follow the same trajectory on both paths too.
+# Run from the repository root:  python benchmarks/bench_physics.py
+import os
+import sys
+import time
+import zlib
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Ultramariov0 as game
+
+STEPS = 600
+LEVELS = [(world, level) for world in range(1, 9) for level in range(1, 5)]
+
+def scripted_input(step):
+    # Mostly run right, back off now and then, jump regularly
+    move = -1 if (step // 90) % 4 == 3 else 1
+    return move, step % 37 == 0
+
+def run(level_map, fixed):
+    """Step a player and every goomba of the level; return the trajectory and its checksum."""
+    step_player = game.step_player_fixed if fixed else game.step_player
+    step_goomba = game.step_goomba_fixed if fixed else game.step_goomba
+    player = game.Player()
+    player.respawn()
+    goombas = []
+    for iy, row in enumerate(level_map):
+        for ix, ch in enumerate(row):
+            if ch == 'G':
+                goombas.append(game.Goomba(ix * game.TILE_SIZE, iy * game.TILE_SIZE))
+    trajectory = []
+    for step in range(STEPS):
+        move, jump = scripted_input(step)
+        if jump and player.on_ground:
+            player.vy = game.JUMP_VELOCITY
+            player.svy = game.JUMP_VELOCITY_SUB
+        if step_player(player, level_map, move):
+            player.respawn()
+        for g in goombas:
+            if g.alive:
+                step_goomba(g, level_map)
+        trajectory.append((player.x, player.y))
+        trajectory.extend((g.x, g.y) for g in goombas)
+    return trajectory, zlib.crc32(repr(trajectory).encode())
+
+# Goombas walking into each other in a walled room: (x, direction) pairs, x in pixels.
+# Splitting odd subpixel overlaps differently would show up here as 1/32 pixel differences
+PILE_UPS = (((21, 1), (359, -1), (374, -1), (385, -1), (444, -1)),
+            ((40, 1), (60, -1), (61, 1), (90, -1)),
+            ((100, 1), (117, 1), (134, -1), (300, -1), (301, -1)))
+
+def room():
+    height = game.SCREEN_HEIGHT_TILES
+    return ["X" + "." * 38 + "X"] * (height - 1) + ["X" * 40]
+
+def pile_up(goombas, fixed):
+    """Step a pile-up of goombas with bumping; return their trajectory."""
+    level_map = room()
+    step_goomba = game.step_goomba_fixed if fixed else game.step_goomba
+    ground = (len(level_map) - 2) * game.TILE_SIZE
+    entities = []
+    for x, direction in goombas:
+        g = game.Goomba(x, ground)
+        g.vx = direction * game.GOOMBA_SPEED
+        g.svx = g.vx * game.SUBPIXELS
+        entities.append(g)
+    broadphase = game.SweepAndPrune()
+    broadphase.reset(entities)
+    trajectory = []
+    for step in range(STEPS):
+        for g in entities:
+            step_goomba(g, level_map)
+        broadphase.update()
+        game.bump_goombas(broadphase, fixed)
+        trajectory.extend((g.x, g.y) for g in entities)
+    return trajectory
+
+def time_path(levels, fixed):
+    start = time.perf_counter()
+    for level_map in levels:
+        run(level_map, fixed)
+    return (time.perf_counter() - start) / (len(levels) * STEPS) * 1e6
+
+if __name__ == "__main__":
+    levels = [game.generate_level(world, level)[0] for world, level in LEVELS]
+    for (world, level), level_map in zip(LEVELS, levels):
+        fixed_a, crc_a = run(level_map, fixed=True)
+        fixed_b, crc_b = run(level_map, fixed=True)
+        floats, _ = run(level_map, fixed=False)
+        assert fixed_a == fixed_b and crc_a == crc_b, f"fixed-point run not reproducible in {world}-{level}"
+        assert fixed_a == floats, f"fixed-point and float trajectories differ in {world}-{level}"
+    print(f"trajectories identical across runs and paths for {len(LEVELS)} levels x {STEPS} steps")
+    for i, goombas in enumerate(PILE_UPS):
+        assert pile_up(goombas, fixed=True) == pile_up(goombas, fixed=False), \
+            f"fixed-point and float trajectories differ in goomba pile-up {i}"
+    print(f"and for {len(PILE_UPS)} goomba pile-ups")
+    float_us = time_path(levels, fixed=False)
+    fixed_us = time_path(levels, fixed=True)
+    print(f"float  {float_us:7.2f} us/step")
+    print(f"fixed  {fixed_us:7.2f} us/step")
@@ -0,0 +1,141 @@
+# Render benchmark for Ultramariov0: 32-bit vs 8-bit paletted game surface
+# Times the background fill, tile/entity drawing and present() (scale into the window) for
+# each mode, on a scrolling camera over an overworld and a castle level. The "+layer" modes
+# draw tiles through a TileLayer, which only redraws the tiles that changed. Tiles are blitted
+# from per-theme tile sheets built up front; the run checks that drawing never built another.
+# Last, it checks the pipelined FrameRenderer: the main thread gets the next buffer to fill
+# while the worker is still drawing the previous frame, frames are presented (flipped) on the
+# main thread only, and an exception while drawing on the worker is re-raised there.
+# Run from the repository root:  python benchmarks/bench_render.py
+import os
+import sys
+import time
+import threading
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import Ultramariov0 as game
+
+FRAMES = 300
+
+def bench_mode(surface, level, goombas, layer=None):
+    level_map, bg, ground = level
+    game.use_surface_colors(surface)
+    game.apply_theme(surface, bg, ground)
+    player = game.Player()
+    player.y = (game.SCREEN_HEIGHT_TILES - 2) * game.TILE_SIZE
+    fill = draw = present = 0.0
+    for frame in range(FRAMES):
+        player.x = (frame * 3) % (len(level_map[0]) * game.TILE_SIZE)
+        cam_x = game.camera_x(player.x, len(level_map[0]))
+        game.cycle_palette(surface, frame)
+        t0 = time.perf_counter()
+        surface.fill(game.draw_colors[game.PAL_BG])
+        t1 = time.perf_counter()
+        game.draw_world(surface, level_map, cam_x, goombas, int(player.x), int(player.y), game.PAL_PLAYER1,
+                        layer=layer)
+        t2 = time.perf_counter()
+        game.present(surface)
+        t3 = time.perf_counter()
+        fill += t1 - t0
+        draw += t2 - t1  # draw_world fills again; it is part of the drawing cost
+        present += t3 - t2
+    return fill / FRAMES * 1e6, draw / FRAMES * 1e6, present / FRAMES * 1e6
+
+def check_renderer():
+    state = game.Game()
+    state.new_game(None, 1, 1, seed=1)
+    renderer = game.FrameRenderer(game.game_surface, threaded=True)
+    flips = set()
+    flip = pygame.display.flip
+
+    def record_flip():
+        flips.add(threading.current_thread().name)
+        flip()
+
+    def capture(snap, frame):
+        state.step(1, False)
+        snap.capture(state.level_map, state.goombas, state.player, 1.0, game.PAL_PLAYER1, "", state.theme_bg_color,
+                     state.theme_ground_color, frame)
+
+    def submit(frame):
+        snap = renderer.begin_frame()
+        capture(snap, frame)
+        renderer.submit(snap)
+
+    pygame.display.flip = record_flip
+    draw = game.draw_snapshot
+    try:
+        # Hold the worker inside frame 0 and capture the next frame meanwhile
+        drawing = threading.Event()
+        go_on = threading.Event()
+
+        drawn = threading.Event()
+
+        def slow_draw(*args):
+            drawing.set()
+            go_on.wait(5)
+            draw(*args)
+            drawn.set()
+        game.draw_snapshot = slow_draw
+        submit(0)
+        drawing.wait(5)
+        snap = renderer.begin_frame()
+        capture(snap, 1)
+        overlapped = not drawn.is_set()
+        go_on.set()
+        game.draw_snapshot = draw
+        assert overlapped, "begin_frame() waited for the frame being drawn"
+        renderer.submit(snap)
+        for frame in range(2, 30):
+            submit(frame)
+        renderer.wait_idle()
+        assert flips == {threading.current_thread().name}, f"frames were presented from {flips}"
+
+        def fail(*args):
+            raise ValueError("drawing failed")
+        game.draw_snapshot = fail
+        errors = 0
+        for frame in range(5):
+            try:
+                submit(frame)
+            except RuntimeError as e:
+                assert isinstance(e.__cause__, ValueError)
+                errors += 1
+        game.draw_snapshot = draw
+        while True:  # the other buffer may still hold a frame that failed
+            try:
+                renderer.wait_idle()
+                break
+            except RuntimeError:
+                errors += 1
+        assert errors, "a drawing error on the render thread was not re-raised"
+    finally:
+        game.draw_snapshot = draw
+        pygame.display.flip = flip
+        renderer.stop()
+    print("pipelined renderer: overlaps capture with drawing, presents on the main thread, re-raises drawing errors")
+
+if __name__ == "__main__":
+    game.init_display()  # present() scales into the window
+    print(f"{'level':8s} {'mode':15s} {'fill us':>8s} {'draw us':>8s} {'present us':>11s} {'bytes/px':>8s}")
+    for name, (world, level) in (("1-1", (1, 1)), ("4-4", (4, 4))):
+        generated = game.generate_level(world, level)
+        spawner = game.EnemySpawner()
+        spawner.load(generated[0])
+        goombas = list(spawner.spawns)  # draw a goomba at every spawn point
+        for mode, surface in (("32-bit", pygame.Surface((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))),
+                              ("paletted", game.make_paletted_surface())):
+            game.prebake_tile_sheets(surface)
+            sheets = len(game.tile_sheets)
+            for layered in (False, True):
+                layer = game.TileLayer(surface) if layered else None
+                fill, draw, present = bench_mode(surface, generated, goombas, layer)
+                label = mode + ("+layer" if layered else "")
+                print(f"{name:8s} {label:15s} {fill:8.1f} {draw:8.1f} {present:11.1f} {surface.get_bytesize():8d}")
+            assert len(game.tile_sheets) == sheets, "a tile sheet was built while drawing"
+    print(f"{len(game.tile_sheets)} tile sheets, all built before drawing")
+    check_renderer()
@@ -0,0 +1,130 @@
+# Game-state snapshot benchmark for Ultramariov0
+# For each world's first level: serialized snapshot size, time to take and restore a snapshot,
+# and time to regenerate the level the old way (generate_level + respawn + goomba spawn).
+# Then checks quick-loads across level modes and seeds: an endless save loaded into a normal
+# game and the other way round, and an endless save from another seed, must come back as
+# saved, and a death right after the load must respawn into the saved level, not the session's.
+# Last, a coin taken in a streamed level must stay taken through a checkpoint restore and a
+# quick-load, also once its chunk has been spilled, and come back only on a respawn.
+# Run from the repository root:  python benchmarks/bench_snapshot.py
+import os
+import sys
+import time
+import tempfile
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Ultramariov0 as game
+
+REPEAT = 200
+
+def per_call_us(fn):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        fn()
+    return (time.perf_counter() - start) / REPEAT * 1e6
+
+def regenerate(state, world, level):
+    state.level_map, state.theme_bg_color, state.theme_ground_color = game.generate_level(world, level)
+    state.player.respawn()
+    game.spawn_goombas(state.level_map, state.goombas, state.spawner, state.broadphase)
+
+def quick_save_load(state, snap, path):
+    game.save_snapshot(snap, path)
+    state.restore_snapshot(game.load_snapshot(path))
+
+def start_rows(state):
+    """The first screens of the game's level, as row strings."""
+    if state.streaming:
+        return state.level_map.rows(0, 64)
+    return [row[:64] for row in state.level_map]
+
+def cross_load(path, saved_mode, loaded_mode):
+    """Quick-save a game in saved_mode (streaming, seed), load it into one in loaded_mode, then die."""
+    source = game.Game(streaming=saved_mode[0])
+    source.new_game(None, 2, 3, seed=saved_mode[1])
+    for step in range(90):
+        source.step(1, step % 30 == 0)
+    snap = source.take_snapshot()
+    game.save_snapshot(snap, path)
+    state = game.Game(streaming=loaded_mode[0])
+    state.new_game(None, 1, 1, seed=loaded_mode[1])
+    state.restore_snapshot(game.load_snapshot(path))
+    restored = state.take_snapshot()
+    assert all(getattr(restored, name) == getattr(snap, name) for name in game.GameSnapshot.__slots__), \
+        "quick-load did not restore the saved state"
+    # Die: the respawn must be at the start of the saved level, as a fresh game of that mode has it
+    state.players[state.active_player_index]["lives"] = 0
+    state.step(0, False)
+    assert "death" in state.events
+    fresh = game.Game(streaming=saved_mode[0])
+    fresh.new_game(None, 2, 3, seed=saved_mode[1])
+    assert (state.streaming, state.seed) == saved_mode, "level mode or seed not taken from the quicksave"
+    assert start_rows(state) == start_rows(fresh), "respawned into a different level than the one saved"
+    assert entity_states(state) == entity_states(fresh), "respawned at a different place than the level start"
+
+def take_first_coin(state):
+    """Walk the player onto the first coin of the level; returns the coin's tile."""
+    level_map = state.level_map
+    tx, ty = next((tx, ty) for tx in range(len(level_map[0])) for ty in range(len(level_map))
+                  if level_map[ty][tx] == 'C')
+    state.player.x = tx * game.TILE_SIZE
+    state.player.y = ty * game.TILE_SIZE
+    state.collect_coins()
+    assert level_map[ty][tx] == '.' and state.players[0]["coins"] == 1
+    return tx, ty
+
+def check_stream_edits(path):
+    state = game.Game(streaming=True)
+    state.new_game(None, 1, 1, seed=111)
+    tx, ty = take_first_coin(state)
+    for spill in (False, True):
+        if spill:
+            state.level_map.follow(200 * game.TILE_SIZE)  # scroll the coin's chunk out of memory
+            assert tx // game.CHUNK_COLUMNS in state.level_map.spilled
+        snap = state.take_snapshot()
+        state.restore_snapshot(snap)
+        assert state.level_map[ty][tx] == '.', "checkpoint restore brought a taken coin back"
+        game.save_snapshot(snap, path)
+        loaded = game.Game()
+        loaded.new_game(None, 1, 1)
+        loaded.restore_snapshot(game.load_snapshot(path))
+        assert loaded.level_map[ty][tx] == '.', "quick-load brought a taken coin back"
+        assert loaded.players[0]["coins"] == 1
+    # A respawn starts the level over, coin and all
+    state.players[state.active_player_index]["lives"] = 0
+    state.step(0, False)
+    assert "death" in state.events and state.level_map[ty][tx] == 'C'
+
+def entity_states(state):
+    return game.entity_state(state.player), [game.entity_state(g) for g in state.goombas if g.alive]
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "quicksave.json")
+    print(f"{'level':6s} {'bytes':>6s} {'take us':>8s} {'restore us':>11s} {'regenerate us':>14s} {'save+load us':>13s}")
+    for world in range(1, 9):
+        state = game.Game()
+        state.new_game(1, world, 1)
+        # Play a little so the snapshot holds moving goombas
+        for step in range(120):
+            state.step(1, False)
+        snap = state.take_snapshot()
+        game.save_snapshot(snap, path)
+        size = os.path.getsize(path)
+        take = per_call_us(state.take_snapshot)
+        restore = per_call_us(lambda: state.restore_level(snap))
+        regen = per_call_us(lambda: regenerate(state, world, 1))
+        disk = per_call_us(lambda: quick_save_load(state, snap, path))
+        # The quick-load must land in exactly the captured state
+        restored = state.take_snapshot()
+        assert all(getattr(restored, name) == getattr(snap, name) for name in game.GameSnapshot.__slots__)
+        print(f"{world}-1    {size:6d} {take:8.1f} {restore:11.1f} {regen:14.1f} {disk:13.1f}")
+    modes = {"normal": (False, 0), "endless seed 111": (True, 111), "endless seed 222": (True, 222)}
+    for saved, loaded in (("endless seed 111", "normal"), ("normal", "endless seed 222"),
+                          ("endless seed 111", "endless seed 222")):
+        cross_load(path, modes[saved], modes[loaded])
+        print(f"{saved} quicksave -> {loaded} game: restored; a death respawns into the saved level")
+    check_stream_edits(path)
+    print("coins taken in a streamed level stay taken through checkpoints, spills and quick-loads")
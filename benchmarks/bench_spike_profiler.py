@@ -0,0 +1,77 @@
+# Spike profiler benchmark for enginev0
+# Runs enginev0's frame loop headless (no input, an off-screen surface) with a slow code path
+# injected every SPIKE_EVERY frames, first without and then with the SpikeProfiler watchdog.
+# Reports the profiler's overhead on the average frame, and checks that every injected spike
+# was dumped with the slow path in its stacks, and that no other frame was.
+# Run from the repository root:  python benchmarks/bench_spike_profiler.py
+import os
+import sys
+import time
+import tempfile
+import collections
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import enginev0 as engine
+
+FRAMES = 600
+SPIKE_EVERY = 100
+SPIKE_SECONDS = 0.04
+BUDGET_MS = 25.0
+
+def slow_path():
+    # Stands in for the occasional expensive frame: busy, holding the GIL
+    end = time.perf_counter() + SPIKE_SECONDS
+    while time.perf_counter() < end:
+        pass
+
+def run(profiler):
+    engine.load_level(engine.LEVEL_MAP)
+    player = engine.Player(x=50, y=engine.SCREEN_HEIGHT - 2 * engine.TILE_SIZE)
+    screen = pygame.Surface((engine.SCREEN_WIDTH, engine.SCREEN_HEIGHT))
+    keys = collections.defaultdict(bool)
+    total = 0.0
+    for frame in range(1, FRAMES + 1):
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.begin_frame()
+        player.update(keys)
+        engine.update_enemies()
+        engine.update_items()
+        engine.player_collisions(player)
+        engine.draw_scene(screen, player, engine.camera_for(player))
+        if frame % SPIKE_EVERY == 0:
+            slow_path()
+        if profiler is not None:
+            profiler.end_frame()
+        if frame % SPIKE_EVERY:
+            total += time.perf_counter() - start
+        time.sleep(0.001)  # the wait in clock.tick(), where the sampler gets the GIL back
+    return total / (FRAMES - FRAMES // SPIKE_EVERY) * 1e6
+
+if __name__ == "__main__":
+    plain = run(None)
+    out = os.path.join(tempfile.mkdtemp(), "spikes.txt")
+    profiler = engine.SpikeProfiler(out, budget=BUDGET_MS)
+    profiler.start()
+    profiled = run(profiler)
+    profiler.stop()
+    print(f"average frame without spikes: {plain:.1f} us plain, {profiled:.1f} us sampled"
+          f" ({profiler.sampled} samples at {engine.DEFAULT_SAMPLE_RATE} Hz)")
+    print(profiler.report())
+    spikes = collections.defaultdict(int)
+    slow = set()
+    with open(out) as f:
+        for line in f:
+            stack, count = line.rsplit(" ", 1)
+            root = stack.split(";", 1)[0]
+            spikes[root] += int(count)
+            if "slow_path" in stack:
+                slow.add(root)
+    for root, count in sorted(spikes.items()):
+        print(f"  {root}: {count} samples")
+    assert profiler.spikes == FRAMES // SPIKE_EVERY, "a frame other than the injected spikes went over budget"
+    assert len(slow) == len(spikes), "a spike was dumped without the slow path in its stacks"
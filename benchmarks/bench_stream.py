@@ -0,0 +1,76 @@
+# Streaming level benchmark for Ultramariov0
+# Scrolls a camera across endless levels and reports chunk generation cost, how many chunks
+# stay resident and the traced memory as the distance grows (it should stay flat), plus the
+# cost of a get_tile() through the chunk window against a plain list-of-strings level.
+# Also checks that evicted chunks regenerate identically and that changed ones come back
+# from their spill file, and that a level narrower than a chunk is refused.
+# Run from the repository root:  python benchmarks/bench_stream.py
+import os
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Ultramariov0 as game
+
+COLUMNS = 100_000
+CHUNKS = 2000
+LOOKUPS = 200_000
+
+def scroll(level, spawner, columns):
+    """Follow a camera moving 4 px per call across `columns` tiles; print memory at checkpoints."""
+    tracemalloc.start()
+    for cam_x in range(0, columns * game.TILE_SIZE, 4):
+        level.follow(cam_x)
+        spawner.next = len(spawner.spawns)  # as if every goomba had been activated
+        if cam_x % (columns * game.TILE_SIZE // 4) == 0:
+            current, _ = tracemalloc.get_traced_memory()
+            print(f"  column {cam_x // game.TILE_SIZE:7d}: {len(level.chunks)} chunks resident, {current / 1024:6.1f} KiB traced")
+    tracemalloc.stop()
+
+def time_chunks(world, level):
+    start = time.perf_counter()
+    for index in range(CHUNKS):
+        game.generate_chunk(world, level, 1, index, game.ENDLESS_COLUMNS)
+    return (time.perf_counter() - start) / CHUNKS * 1e6
+
+def time_lookups(level_map, columns):
+    start = time.perf_counter()
+    for i in range(LOOKUPS):
+        game.get_tile(level_map, i % columns, 13)
+    return (time.perf_counter() - start) / LOOKUPS * 1e9
+
+if __name__ == "__main__":
+    for world, level in ((1, 1), (4, 2), (8, 4)):
+        streamed = game.StreamingLevel(world, level, seed=1)
+        spawner = game.EnemySpawner()
+        spawner.load(streamed)
+        first = {index: list(chunk) for index, chunk in streamed.chunks.items()}
+        print(f"{world}-{level} endless, {COLUMNS} columns")
+        scroll(streamed, spawner, COLUMNS)
+        print(f"  {streamed.generated + 1} chunks generated, {time_chunks(world, level):.1f} us per chunk")
+        # Scrolling back must regenerate exactly the same tiles
+        streamed.follow(0)
+        assert all(streamed.chunks[index] == rows for index, rows in first.items()), "chunk regenerated differently"
+        # A changed chunk must survive eviction through its spill file
+        streamed.set_tile(3, 5, 'C')
+        streamed.follow(COLUMNS * game.TILE_SIZE // 2)
+        assert 0 in streamed.spilled
+        streamed.follow(0)
+        assert streamed[5][3] == 'C', "spilled chunk lost its change"
+    for width in (0, -1, game.CHUNK_COLUMNS - 1):
+        try:
+            game.StreamingLevel(1, 1, seed=1, width=width)
+        except ValueError:
+            continue
+        raise AssertionError(f"a {width} tile wide level was accepted")
+
+    # Lookup cost inside the window: plain rows vs chunk window
+    level_map = game.generate_level(1, 1)[0]
+    streamed = game.StreamingLevel(1, 1, seed=1)
+    streamed.follow(0)
+    columns = game.SCREEN_WIDTH_TILES
+    print(f"get_tile  list {time_lookups(level_map, columns):6.1f} ns   streamed {time_lookups(streamed, columns):6.1f} ns")
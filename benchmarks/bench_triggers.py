@@ -0,0 +1,75 @@
+# Special-tile trigger benchmark for Ultramariov0
+# Times one step's coin/flag check for a player sweeping across a level: a scan over every
+# coin and flag tile of the level against the TileIndex bucket lookup, for growing level
+# widths (streamed levels of the given width, fully loaded). Then plays scripted runs and
+# checks that every collected coin left the tile grid and the index, and matches the counter.
+# Run from the repository root:  python benchmarks/bench_triggers.py
+import os
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Ultramariov0 as game
+
+STEPS = 2000
+
+def full_rows(width):
+    level = game.StreamingLevel(1, 1, seed=1, width=width)
+    return level.rows(0, width)
+
+def scan(specials, x, y):
+    # Baseline: test the player's box against every special tile in the level
+    hits = 0
+    for tx, ty in specials:
+        if tx * game.TILE_SIZE < x + 16 and x < tx * game.TILE_SIZE + 16 and \
+                ty * game.TILE_SIZE < y + 16 and y < ty * game.TILE_SIZE + 16:
+            hits += 1
+    return hits
+
+def indexed(index, x, y):
+    hits = 0
+    c0, c1 = x // game.TILE_SIZE, (x + 15) // game.TILE_SIZE
+    r0, r1 = y // game.TILE_SIZE, (y + 15) // game.TILE_SIZE
+    for bucket in range(c0 >> game.TILE_BUCKET_SHIFT, (c1 >> game.TILE_BUCKET_SHIFT) + 1):
+        for tx, ty, kind in index.buckets.get(bucket, ()):
+            if c0 <= tx <= c1 and r0 <= ty <= r1:
+                hits += 1
+    return hits
+
+def time_check(check, data, width):
+    start = time.perf_counter()
+    for step in range(STEPS):
+        check(data, (step * 37) % (width * game.TILE_SIZE), 9 * game.TILE_SIZE)
+    return (time.perf_counter() - start) / STEPS * 1e6
+
+def play(world, level):
+    """Run right and jump until the first death or level clear; return (collected, coins at start, left)."""
+    state = game.Game()
+    state.new_game(1, world, level, seed=1)
+    start_coins = sum(row.count('C') for row in state.level_map)
+    for step in range(600):
+        state.step(1, step % 20 == 0)
+        if "death" in state.events or (state.world, state.level) != (world, level):
+            break
+        left = sum(row.count('C') for row in state.level_map)
+        assert left == len(state.specials.kinds['C']), "coin index out of step with the tile grid"
+    coins = state.players[0]["coins"]
+    assert coins == start_coins - left, "coin counter out of step with the tile grid"
+    return coins, start_coins, left
+
+if __name__ == "__main__":
+    print(f"{'columns':>8s} {'specials':>9s} {'scan us':>8s} {'index us':>9s}")
+    for width in (100, 1000, 10000):
+        rows = full_rows(width)
+        index = game.TileIndex()
+        index.add_rows(rows)
+        specials = [pos for kind in "CF" for pos in index.kinds[kind]]
+        scanned = time_check(scan, specials, width)
+        looked_up = time_check(indexed, index, width)
+        print(f"{width:8d} {len(specials):9d} {scanned:8.2f} {looked_up:9.2f}")
+    for world, level in ((1, 1), (2, 1), (3, 3)):
+        coins, start_coins, left = play(world, level)
+        print(f"{world}-{level}: collected {coins} of {start_coins} coins; counter, grid and index agree")
@@ -0,0 +1,52 @@
+# Sound-effect voice pool under load for Ultramariov0
+# Plays the music on its channel, then for a couple of seconds of 60 Hz frames fires bursts of
+# overlapping stomps, jumps, coins and deaths at the voice pool. Reports the per-trigger cost,
+# the played/dropped/stolen/merged counters and the blocks allocated by triggers, and checks
+# that the music was never interrupted.
+# Run from the repository root:  python benchmarks/bench_voices.py
+import os
+import sys
+import time
+import random
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import Ultramariov0 as game
+
+FRAMES = 120
+BURST = ["stomp"] * 12 + ["jump"] * 4 + ["coin"] * 2
+
+if __name__ == "__main__":
+    game.init_audio()
+    music = pygame.mixer.Channel(game.MUSIC_CHANNEL)
+    music.play(game.background_music, loops=-1)
+    voices = game.voices
+    rng = random.Random(1)
+    names = list(BURST)
+    triggers = 0
+    trigger_time = 0.0
+    allocated = 0
+    for frame in range(FRAMES):
+        voices.begin_frame()
+        rng.shuffle(names)
+        if frame % 30 == 0:
+            names.append("death")
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        for name in names:
+            voices.play(name)
+        trigger_time += time.perf_counter() - start
+        if frame:  # the first frame warms up the pool
+            allocated += sys.getallocatedblocks() - blocks
+        triggers += len(names)
+        if names[-1] == "death":
+            names.pop()
+        assert music.get_sound() is game.background_music, "music channel was taken by an effect"
+        time.sleep(1 / 60)
+    print(f"{triggers} triggers over {FRAMES} frames, {trigger_time / triggers * 1e6:.2f} us per trigger")
+    print(f"played {voices.played}  dropped {voices.dropped}  stolen {voices.stolen}  merged {voices.limited}")
+    print(f"blocks allocated by triggers after warm-up: {allocated}")
+    print("music uninterrupted")
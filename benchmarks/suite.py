@@ -0,0 +1,321 @@
+# Benchmark suite for Ultramariov0 and enginev0
+# Times the games' subsystems headless (SDL dummy drivers, no window or mixer is ever opened):
+# level generation for every world/level, in numpy batches (if numpy is installed), and for
+# streamed levels from 60 to 100k tiles wide, a Game.step() for every world/level, the
+# level_check solvability search, goomba physics and broadphase for 1 to 10k goombas, the
+# tile draw loops, audio synthesis, and enginev0's level loading, enemy updates and drawing
+# at the same scales. Each workload reports its best time per call over a few repeats.
+#
+#   python benchmarks/suite.py run --save baseline.json      # run everything, keep the results
+#   python benchmarks/suite.py run --filter goombas           # only workloads matching a substring
+#   python benchmarks/suite.py compare baseline.json          # run again and flag regressions
+#   python benchmarks/suite.py compare baseline.json new.json # compare two saved runs
+#
+# compare exits with status 1 when any workload got slower than the baseline by more than
+# --threshold (a fraction, default 0.15), so it can gate a change.
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import physics
+import level_check
+import Ultramariov0 as game
+import enginev0 as engine
+try:
+    import level_batch  # needs numpy
+except ImportError:
+    level_batch = None
+
+LEVELS = [(world, level) for world in range(1, 9) for level in range(1, 5)]
+LEVEL_WIDTHS = (60, 1000, 10_000, 100_000)
+GOOMBA_COUNTS = (1, 10, 100, 1000, 10_000)
+DEFAULT_THRESHOLD = 0.15
+WORKLOADS = []  # (name, unit, setup) -- setup() returns the function to time
+
+def workload(name, unit):
+    def register(setup):
+        WORKLOADS.append((name, unit, setup))
+        return setup
+    return register
+
+def time_call(fn, target, repeat):
+    """Best seconds per call of fn, over `repeat` batches of at least `target` seconds each."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= target:
+            break
+        number = max(number * 2, int(number * target * 1.2 / max(elapsed, 1e-9)))
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+# --- Ultramariov0 ---------------------------------------------------------------------------
+
+def wide_rows(width):
+    """The tile rows of a streamed 1-1 level of the given width, as a plain list of strings."""
+    return list(game.StreamingLevel(1, 1, seed=1, width=width).rows(0, width))
+
+def goomba_rows(width):
+    """Flat ground with a wall every 16 columns, so goombas keep walking and turning."""
+    rows = ['.' * width] * (game.SCREEN_HEIGHT_TILES - 2)
+    rows.append("".join('X' if x % 16 == 0 else '.' for x in range(width)))
+    rows.append('X' * width)
+    return rows
+
+for world, level in LEVELS:
+    @workload(f"ultra.generate_level.{world}-{level}", "level")
+    def _generate(world=world, level=level):
+        return lambda: game.generate_level(world, level)
+
+if level_batch is not None:
+    @workload("ultra.generate_levels.batch=1000", "1000 levels")
+    def _generate_batch():
+        rng = random.Random(1)
+        worlds = [rng.randint(1, 8) for _ in range(1000)]
+        levels = [rng.randint(1, 4) for _ in range(1000)]
+        return lambda: level_batch.generate_levels(worlds, levels)
+
+for width in LEVEL_WIDTHS:
+    @workload(f"ultra.stream_level.width={width}", "level")
+    def _stream(width=width):
+        return lambda: game.StreamingLevel(1, 1, seed=1, width=width).rows(0, width)
+
+for world, level in ((1, 1), (8, 4)):
+    @workload(f"ultra.level_check.{world}-{level}", "level")
+    def _level_check(world=world, level=level):
+        state = game.Game(fixed_point=True)
+        state.new_game(None, world, level, seed=1)
+        rows = state.level_map
+        return lambda: level_check.search(game, rows)
+
+for world, level in LEVELS:
+    @workload(f"ultra.game_step.{world}-{level}", "60 steps")
+    def _game_step(world=world, level=level):
+        state = game.Game(fixed_point=True)
+        state.new_game(None, world, level, seed=1)
+        steps = [0]
+
+        def run():
+            for _ in range(60):
+                if not state.playing or (state.world, state.level) != (world, level):
+                    state.new_game(None, world, level, seed=1)
+                n = steps[0] = steps[0] + 1
+                state.step(-1 if (n // 90) % 4 == 3 else 1, n % 37 == 0)
+        return run
+
+for count in GOOMBA_COUNTS:
+    for fixed in (False, True):
+        @workload(f"ultra.goombas.{'fixed' if fixed else 'float'}.n={count}", "frame")
+        def _goombas(count=count, fixed=fixed):
+            width = max(game.SCREEN_WIDTH_TILES, count * 2, 32)
+            rows = goomba_rows(width)
+            rng = random.Random(count)
+            goombas = []
+            for _ in range(count):
+                column = rng.randrange(width // 16) * 16 + rng.randrange(1, 16)  # between two walls
+                g = game.Goomba(column * game.TILE_SIZE, (game.SCREEN_HEIGHT_TILES - 2) * game.TILE_SIZE)
+                g.vx = rng.choice((-1, 1)) * game.GOOMBA_SPEED
+                g.svx = g.vx * game.SUBPIXELS
+                goombas.append(g)
+            broadphase = game.SweepAndPrune()
+            broadphase.reset(goombas)
+            step = game.step_goomba_fixed if fixed else game.step_goomba
+
+            def run():
+                for g in goombas:
+                    step(g, rows)
+                broadphase.update()
+                game.bump_goombas(broadphase, fixed)
+            return run
+
+for width in LEVEL_WIDTHS:
+    for layered in (False, True):
+        @workload(f"ultra.draw_world.{'layer' if layered else 'direct'}.width={width}", "frame")
+        def _draw(width=width, layered=layered):
+            rows = wide_rows(width)
+            surface = pygame.Surface((game.SCREEN_WIDTH, game.SCREEN_HEIGHT))
+            game.use_surface_colors(surface)
+            layer = game.TileLayer(surface) if layered else None
+            frame = [0]
+            y = (game.SCREEN_HEIGHT_TILES - 2) * game.TILE_SIZE
+
+            def run():
+                # Scroll right 3 px a frame, wrapping after the first 2000 columns
+                x = (frame[0] * 3) % (min(width, 2000) * game.TILE_SIZE)
+                frame[0] += 1
+                game.draw_world(surface, rows, game.camera_x(x, width), (), x, y, game.PAL_PLAYER1, layer=layer)
+            return run
+
+for waveform in ("square", "triangle", "noise"):
+    @workload(f"audio.synth_wave.{waveform}", "0.1 s of samples")
+    def _synth(waveform=waveform):
+        return lambda: game.synth_wave(440, 0.1, waveform)
+
+@workload("audio.synth_music", "music loop")
+def _music():
+    return game.synth_music
+
+# --- physics core ---------------------------------------------------------------------------
+
+for fixed in (False, True):
+    @workload(f"physics.step_body.{'fixed' if fixed else 'float'}", "100 bodies")
+    def _core(fixed=fixed):
+        rows = goomba_rows(400)
+        motion = game.GOOMBA_MOTION_SUB if fixed else game.GOOMBA_MOTION
+        step = physics.step_body_fixed if fixed else physics.step_body
+        bodies = [game.Goomba(x * 4 * game.TILE_SIZE, (game.SCREEN_HEIGHT_TILES - 3) * game.TILE_SIZE) for x in range(100)]
+
+        def run():
+            for body in bodies:
+                step(body, rows, game.TILES, motion)
+        return run
+
+# --- enginev0 -------------------------------------------------------------------------------
+
+def engine_level(width, goombas=0):
+    """enginev0's level repeated out to `width` columns, with goombas spread along the ground."""
+    period = max(len(row) for row in engine.LEVEL_MAP)
+    rows = [(row.ljust(period).replace('G', ' ') * (width // period + 1))[:width] for row in engine.LEVEL_MAP]
+    if goombas:
+        walk = list(rows[4])
+        for i in range(goombas):
+            walk[i * width // goombas] = 'G'
+        rows[4] = "".join(walk)
+    return rows
+
+for width in LEVEL_WIDTHS:
+    @workload(f"engine.load_level.width={width}", "level")
+    def _engine_load(width=width):
+        rows = engine_level(width)
+        return lambda: engine.load_level(rows)
+
+for count in GOOMBA_COUNTS:
+    @workload(f"engine.update_enemies.n={count}", "frame")
+    def _engine_enemies(count=count):
+        engine.load_level(engine_level(max(48, count * 2), count))
+        enemies = engine.enemies.sprites()
+
+        def run():
+            engine.update_enemies()
+            for enemy in enemies:
+                # Keep the goombas that walked off a ledge in play
+                if enemy.y > engine.SCREEN_HEIGHT:
+                    enemy.y, enemy.vy = 4 * engine.TILE_SIZE, 0
+        return run
+
+for width in LEVEL_WIDTHS:
+    @workload(f"engine.draw_scene.width={width}", "frame")
+    def _engine_draw(width=width):
+        engine.load_level(engine_level(width))
+        screen = pygame.Surface((engine.SCREEN_WIDTH, engine.SCREEN_HEIGHT))
+        player = engine.Player(50, 4 * engine.TILE_SIZE)
+        return lambda: engine.draw_scene(screen, player, engine.camera_for(player))
+
+# --- running and comparing ------------------------------------------------------------------
+
+def run_suite(name_filter=None, quick=False):
+    target, repeat = (0.01, 2) if quick else (0.05, 5)
+    results = {}
+    print(f"{'workload':44s} {'us/call':>12s}  per")
+    for name, unit, setup in WORKLOADS:
+        if name_filter and name_filter not in name:
+            continue
+        seconds = time_call(setup(), target, repeat)
+        results[name] = {"us": seconds * 1e6, "unit": unit}
+        print(f"{name:44s} {seconds * 1e6:12.2f}  {unit}")
+    return {
+        "meta": {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+def compare(baseline, current, threshold):
+    """Print each shared workload's change; returns the names that regressed past threshold."""
+    base = baseline["results"]
+    now = current["results"]
+    regressions = []
+    print(f"{'workload':44s} {'baseline us':>12s} {'now us':>12s} {'change':>8s}")
+    for name in now:
+        if name not in base:
+            continue
+        ratio = now[name]["us"] / base[name]["us"] if base[name]["us"] else 1.0
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + threshold):
+            mark = "  faster"
+        print(f"{name:44s} {base[name]['us']:12.2f} {now[name]['us']:12.2f} {ratio - 1:+8.1%}{mark}")
+    added = [name for name in now if name not in base]
+    missing = [name for name in base if name not in now]
+    if added:
+        print(f"not in the baseline: {', '.join(added)}")
+    if missing and len(missing) < len(base):
+        print(f"not run this time: {len(missing)} workloads")
+    print(f"{len(regressions)} regressions (threshold {threshold:.0%})")
+    return regressions
+
+def load(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    print(f"results saved to {path}")
+
+if __name__ == "__main__":
+    # Importing the games must not have opened a window or the mixer
+    assert not pygame.display.get_init() and pygame.mixer.get_init() is None, "importing a game had side effects"
+    parser = argparse.ArgumentParser(description="Headless benchmark suite for Ultramariov0 and enginev0")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run_parser = commands.add_parser("run", help="run the workloads")
+    run_parser.add_argument("--save", metavar="FILE", help="write the results as JSON")
+    run_parser.add_argument("--filter", metavar="TEXT", help="only workloads whose name contains TEXT")
+    run_parser.add_argument("--quick", action="store_true", help="shorter, noisier timings")
+    compare_parser = commands.add_parser("compare", help="flag regressions against a saved baseline")
+    compare_parser.add_argument("baseline", help="results file to compare against")
+    compare_parser.add_argument("current", nargs="?", help="results file to check (default: run the suite now)")
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="slowdown counted as a regression, as a fraction (default 0.15)")
+    compare_parser.add_argument("--filter", metavar="TEXT", help="when running now: only workloads containing TEXT")
+    compare_parser.add_argument("--quick", action="store_true", help="when running now: shorter, noisier timings")
+    compare_parser.add_argument("--save", metavar="FILE", help="when running now: also write the new results")
+    args = parser.parse_args()
+    if args.command == "run":
+        data = run_suite(args.filter, args.quick)
+        if args.save:
+            save(data, args.save)
+    else:
+        baseline = load(args.baseline)
+        if args.current:
+            current = load(args.current)
+        else:
+            current = run_suite(args.filter, args.quick)
+            if args.save:
+                save(current, args.save)
+            print()
+        sys.exit(1 if compare(baseline, current, args.threshold) else 0)
@@ -1,8 +1,14 @@
 import pygame, sys
+import os
+import time
+import argparse
+import threading
+import collections
+import physics
 
-# Initialize pygame and mixer
-pygame.init()
-pygame.mixer.init()
+# Importing this module has no side effects: pygame, the sounds and the window are set up in
+# main(), and a level is only parsed by load_level(), so the level, physics and drawing code
+# can be driven headless (see benchmarks/suite.py).
 
 # Screen and game constants
 SCREEN_WIDTH = 800
@@ -33,20 +39,24 @@ mushroom_img     = pygame.Surface((TILE_SIZE, TILE_SIZE));       mushroom_img.fi
 
 # (In a real game, you would load images from files and use convert()/convert_alpha() for performance&#8203;:contentReference[oaicite:21]{index=21})
 
-# Load sounds
-try:
-    jump_sound    = pygame.mixer.Sound("jump.wav")
-    coin_sound    = pygame.mixer.Sound("coin.wav")
-    stomp_sound   = pygame.mixer.Sound("stomp.wav")
-    powerup_sound = pygame.mixer.Sound("powerup.wav")
-    bump_sound    = pygame.mixer.Sound("bump.wav")
-    die_sound     = pygame.mixer.Sound("die.wav")
-except Exception as e:
-    # If files not found or mixer error, use None as fallback to avoid crashes
-    jump_sound = coin_sound = stomp_sound = powerup_sound = bump_sound = die_sound = None
+# Sounds, loaded by load_sounds(); None plays nothing
+jump_sound = coin_sound = stomp_sound = powerup_sound = bump_sound = die_sound = None
+
+def load_sounds():
+    global jump_sound, coin_sound, stomp_sound, powerup_sound, bump_sound, die_sound
+    try:
+        jump_sound    = pygame.mixer.Sound("jump.wav")
+        coin_sound    = pygame.mixer.Sound("coin.wav")
+        stomp_sound   = pygame.mixer.Sound("stomp.wav")
+        powerup_sound = pygame.mixer.Sound("powerup.wav")
+        bump_sound    = pygame.mixer.Sound("bump.wav")
+        die_sound     = pygame.mixer.Sound("die.wav")
+    except Exception as e:
+        # If files not found or mixer error, use None as fallback to avoid crashes
+        jump_sound = coin_sound = stomp_sound = powerup_sound = bump_sound = die_sound = None
 
 # Level layout (string map for simplicity; would likely come from a file or generator)
-level_map = [
+LEVEL_MAP = [
     "                                                ",
     "                                                ",
     "   ?                                            ",
@@ -57,33 +67,57 @@ level_map = [
 ]
 # Legend: '=' = ground, '?' = question block (with a mushroom), 'G' = Goomba enemy
 
-# Create data structures for level
+# Collision goes through the shared physics core, straight against the tile grid above: ground
+# and question blocks are solid. Bodies probe every pixel row and column their box covers.
+TILES = physics.TileGrid(TILE_SIZE, solid="=?")
+PLAYER_MOTION = physics.Motion(0.5, 12, wall_insets=(0, 1), foot_insets=(0, 1))
+WALKER_MOTION = physics.Motion(0.5, 10, wall_insets=(0, 1), foot_insets=(0, 1), bounce=True)  # goombas and mushrooms
+
+def add_body(sprite, x, y, vx):
+    """Give a sprite the position, size and velocity fields the physics core moves."""
+    sprite.x, sprite.y = x, y
+    sprite.width, sprite.height = sprite.rect.size
+    sprite.vx = vx
+    sprite.vy = 0
+    sprite.on_ground = False
+
+def sync_rect(sprite):
+    sprite.rect.topleft = (int(sprite.x), int(sprite.y))
+
+# Create data structures for level (filled by load_level)
+level_map = []           # the loaded level's rows, padded to one width so they index as a grid
 solid_tiles = []         # list of Rects for all solid blocks (ground, pipes, blocks)
 question_blocks = {}     # map from (x,y) to block info for question blocks
 enemies = pygame.sprite.Group()
 items = pygame.sprite.Group()
 
-# Parse the level map to initialize tiles and spawn objects
-for row_idx, row in enumerate(level_map):
-    for col_idx, cell in enumerate(row):
-        x = col_idx * TILE_SIZE
-        y = row_idx * TILE_SIZE
-        if cell == '=':  # solid ground block
-            solid_tiles.append(pygame.Rect(x, y, TILE_SIZE, TILE_SIZE))
-        elif cell == '?':  # question block with a power-up inside
-            rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
-            solid_tiles.append(rect)  # treat as solid
-            question_blocks[(x, y)] = {"rect": rect, "used": False, "contains": "mushroom"}
-        elif cell == 'G':  # Goomba enemy
-            enemy = pygame.sprite.Sprite()
-            enemy.image = goomba_frame1
-            enemy.rect = enemy.image.get_rect(topleft=(x, y))
-            enemy.vx = -1  # move left by default
-            enemy.vy = 0
-            enemy.on_ground = False
-            enemy.frame_counter = 0
-            enemies.add(enemy)
-        # (Other entities like pipes or coins can be added similarly)
+def load_level(rows):
+    """Parse a level map to initialize tiles and spawn objects, replacing the current level."""
+    global level_map
+    width = max(len(row) for row in rows)
+    level_map = [row.ljust(width) for row in rows]
+    solid_tiles.clear()
+    question_blocks.clear()
+    enemies.empty()
+    items.empty()
+    for row_idx, row in enumerate(level_map):
+        for col_idx, cell in enumerate(row):
+            x = col_idx * TILE_SIZE
+            y = row_idx * TILE_SIZE
+            if cell == '=':  # solid ground block
+                solid_tiles.append(pygame.Rect(x, y, TILE_SIZE, TILE_SIZE))
+            elif cell == '?':  # question block with a power-up inside
+                rect = pygame.Rect(x, y, TILE_SIZE, TILE_SIZE)
+                solid_tiles.append(rect)  # treat as solid
+                question_blocks[(x, y)] = {"rect": rect, "used": False, "contains": "mushroom"}
+            elif cell == 'G':  # Goomba enemy
+                enemy = pygame.sprite.Sprite()
+                enemy.image = goomba_frame1
+                enemy.rect = enemy.image.get_rect(topleft=(x, y))
+                add_body(enemy, x, y, -1)  # move left by default
+                enemy.frame_counter = 0
+                enemies.add(enemy)
+            # (Other entities like pipes or coins can be added similarly)
 
 # Define the Player class with movement, jump, collision, etc.
 class Player(pygame.sprite.Sprite):
@@ -91,11 +125,9 @@ class Player(pygame.sprite.Sprite):
         super().__init__()
         self.image = player_small_img
         self.rect = self.image.get_rect(topleft=(x, y))
-        self.vx = 0
-        self.vy = 0
+        add_body(self, x, y, 0)
         self.speed = 3         # horizontal speed
         self.jump_power = 10   # jump velocity
-        self.on_ground = False
         self.is_big = False
         self.invulnerable_timer = 0
         self.direction = 1     # 1 = facing right, -1 = facing left
@@ -124,63 +156,46 @@ class Player(pygame.sprite.Sprite):
             self.on_ground = False
             if jump_sound: jump_sound.play()
 
-        # Gravity
-        self.vy += 0.5  # gravity acceleration
-        if self.vy > 12:   # terminal velocity cap
-            self.vy = 12
-
-        # Horizontal movement and collision
-        self.rect.x += int(self.vx)
-        for tile in solid_tiles:
-            if self.rect.colliderect(tile):
-                if self.vx > 0:   # moving right, hit a wall
-                    self.rect.right = tile.left
-                elif self.vx < 0: # moving left, hit a wall
-                    self.rect.left = tile.right
-                self.vx = 0  # stop horizontal movement on collision
-
-        # Vertical movement and collision
-        self.rect.y += int(self.vy)
-        self.on_ground = False  # will be set True if landing on something
-        for tile in solid_tiles:
-            if self.rect.colliderect(tile):
-                if self.vy > 0:  # falling down and hit ground
-                    self.rect.bottom = tile.top
-                    self.on_ground = True
-                elif self.vy < 0:  # moving up and hit a ceiling/block
-                    self.rect.top = tile.bottom
-                    # Trigger question block if applicable
-                    if (tile.x, tile.y) in question_blocks and not question_blocks[(tile.x, tile.y)]["used"]:
-                        # Hit a question block from below
-                        qb = question_blocks[(tile.x, tile.y)]
-                        qb["used"] = True
-                        if qb["contains"] == "mushroom":
-                            # Spawn mushroom above the block
-                            item = pygame.sprite.Sprite()
-                            item.image = mushroom_img
-                            item.rect = item.image.get_rect(midbottom=tile.midtop)
-                            item.vx = 1  # mushroom moves to the right initially
-                            item.vy = 0
-                            items.add(item)
-                        if bump_sound: bump_sound.play()
-                self.vy = 0  # stop vertical movement
+        # Gravity, then horizontal and vertical movement against the tiles
+        hit = physics.step_body(self, level_map, TILES, PLAYER_MOTION)
+        if hit & physics.HIT_CEILING:
+            # Trigger the question block(s) the player's head hit
+            above = (int(self.y) // TILE_SIZE - 1) * TILE_SIZE
+            for col in range(int(self.x) // TILE_SIZE, int(self.x + self.width - 1) // TILE_SIZE + 1):
+                qb = question_blocks.get((col * TILE_SIZE, above))
+                if qb is not None and not qb["used"]:
+                    # Hit a question block from below
+                    qb["used"] = True
+                    if qb["contains"] == "mushroom":
+                        # Spawn mushroom above the block
+                        item = pygame.sprite.Sprite()
+                        item.image = mushroom_img
+                        item.rect = item.image.get_rect(midbottom=qb["rect"].midtop)
+                        add_body(item, item.rect.x, item.rect.y, 1)  # mushroom moves to the right initially
+                        items.add(item)
+                    if bump_sound: bump_sound.play()
+        sync_rect(self)
 
         # Handle power-up state (resize Mario if needed)
         if self.is_big:
             if self.image is player_small_img:  # Mario just became big
-                bottom = self.rect.bottom
-                self.image = player_big_img
-                self.rect = self.image.get_rect(midbottom=(self.rect.centerx, bottom))
+                self.resize(player_big_img)
         else:
             if self.image is player_big_img:    # Mario just shrank to small
-                bottom = self.rect.bottom
-                self.image = player_small_img
-                self.rect = self.image.get_rect(midbottom=(self.rect.centerx, bottom))
+                self.resize(player_small_img)
 
         # Invulnerability timer decrement
         if self.invulnerable_timer > 0:
             self.invulnerable_timer -= 1
 
+    def resize(self, image):
+        # Keep the feet where they are
+        self.y += self.height - image.get_height()
+        self.image = image
+        self.width, self.height = image.get_size()
+        self.rect = image.get_rect()
+        sync_rect(self)
+
     def get_hit(self):
         """Handle player getting hit by an enemy."""
         if self.invulnerable_timer > 0:
@@ -197,93 +212,29 @@ class Player(pygame.sprite.Sprite):
             pygame.quit()
             sys.exit()
 
-# Initialize player
-player = Player(x=50, y=SCREEN_HEIGHT - 2*TILE_SIZE)  # start near the bottom left
-player_group = pygame.sprite.GroupSingle(player)
-
-# Set up display
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("NES-style Mario")
-
-clock = pygame.time.Clock()
-camera_x = 0  # camera offset for scrolling
-
-# Main game loop
-running = True
-while running:
-    clock.tick(FPS)  # cap frame rate
-    
-    # Event handling
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:   # handle window close
-            running = False
-        # (If there are any other one-time events like shooting fireballs, handle KEYDOWN here)
-    
-    # Get key states
-    keys = pygame.key.get_pressed()
-    # Update player (movement & collisions)
-    player_group.update(keys)
-    
-    # Update enemies (movement, gravity, animation)
+def update_enemies():
+    """Update enemies (movement, gravity, animation)."""
     for enemy in enemies:
-        # Apply gravity to enemy
-        enemy.vy += 0.5
-        if enemy.vy > 10: 
-            enemy.vy = 10
-        # Horizontal movement and wall bounce
-        enemy.rect.x += int(enemy.vx)
-        for tile in solid_tiles:
-            if enemy.rect.colliderect(tile):
-                if enemy.vx > 0:
-                    enemy.rect.right = tile.left
-                elif enemy.vx < 0:
-                    enemy.rect.left = tile.right
-                enemy.vx *= -1  # reverse direction on hit wall
-        # Vertical movement and floor collision
-        enemy.rect.y += int(enemy.vy)
-        enemy.on_ground = False
-        for tile in solid_tiles:
-            if enemy.rect.colliderect(tile):
-                if enemy.vy > 0:
-                    enemy.rect.bottom = tile.top
-                    enemy.on_ground = True
-                elif enemy.vy < 0:
-                    enemy.rect.top = tile.bottom
-                enemy.vy = 0
+        # Gravity, walking and turning around at walls
+        physics.step_body(enemy, level_map, TILES, WALKER_MOTION)
+        sync_rect(enemy)
         # Animate Goomba by toggling frames
         enemy.frame_counter = (enemy.frame_counter + 1) % 30  # slow toggle
         if enemy.frame_counter == 0:  # switch frame periodically
             enemy.image = goomba_frame1 if enemy.image == goomba_frame2 else goomba_frame2
-    
-    # Update moving items (e.g., mushrooms)
-    for item in items:
-        if hasattr(item, 'vx'):
-            # Apply gravity
-            item.vy += 0.5
-            if item.vy > 10: 
-                item.vy = 10
-            # Horizontal move
-            item.rect.x += int(item.vx)
-            for tile in solid_tiles:
-                if item.rect.colliderect(tile):
-                    if item.vx > 0:
-                        item.rect.right = tile.left
-                    elif item.vx < 0:
-                        item.rect.left = tile.right
-                    item.vx *= -1  # bounce off walls
-            # Vertical move
-            item.rect.y += int(item.vy)
-            for tile in solid_tiles:
-                if item.rect.colliderect(tile):
-                    if item.vy > 0:
-                        item.rect.bottom = tile.top
-                    elif item.vy < 0:
-                        item.rect.top = tile.bottom
-                    item.vy = 0
+
+def update_items():
+    """Update moving items (e.g., mushrooms)."""
+    for item in items.sprites():
+        # Items bounce off walls like goombas
+        physics.step_body(item, level_map, TILES, WALKER_MOTION)
+        sync_rect(item)
         # Remove item if it falls off the bottom of the level (no need to keep it)
         if item.rect.top > SCREEN_HEIGHT:
             items.remove(item)
-    
+
+def player_collisions(player):
+    """Stomps, hits and power-ups between the player and the enemies and items it touches."""
     # Player collisions with enemies
     for enemy in pygame.sprite.spritecollide(player, enemies, False):
         if player.vy > 0 and player.rect.bottom <= enemy.rect.bottom + 5:
@@ -301,15 +252,16 @@ while running:
             # Enemy hit Mario from side or above -> Mario takes damage
             player.get_hit()
             # If Mario died in get_hit(), the game loop will exit
-    
+
     # Player collisions with items (power-ups, coins)
     for item in pygame.sprite.spritecollide(player, items, True):
         # Assume any item in this group is a mushroom for power-up (coins could be handled separately)
         player.is_big = True  # Mario grows
         player.invulnerable_timer = 60  # a brief grace period after powering up
         if powerup_sound: powerup_sound.play()
-    
-    # Camera scrolling logic (keep player near center, clamp at edges)&#8203;:contentReference[oaicite:22]{index=22}
+
+def camera_for(player):
+    """Camera scrolling logic (keep player near center, clamp at edges)"""
     level_width_px = len(level_map[0]) * TILE_SIZE
     # Center camera on player by default
     camera_x = -player.rect.centerx + SCREEN_WIDTH // 2
@@ -318,8 +270,10 @@ while running:
         camera_x = 0  # do not scroll left past start
     if camera_x < -(level_width_px - SCREEN_WIDTH):
         camera_x = -(level_width_px - SCREEN_WIDTH)  # do not scroll past end of level
-    
-    # Drawing everything
+    return camera_x
+
+def draw_scene(screen, player, camera_x):
+    """Drawing everything"""
     screen.fill((107, 140, 255))  # sky blue background
     # Draw tiles in view
     for (x, y), qb in question_blocks.items():
@@ -350,8 +304,153 @@ while running:
             screen.blit(flipped_image, player.rect.move(camera_x, 0))
         else:
             screen.blit(player.image, player.rect.move(camera_x, 0))
-    
-    pygame.display.flip()
 
-# Quit game loop
-pygame.quit()
+# Frame-time spike profiler. Averages hide the odd 40 ms frame and a full cProfile run slows
+# everything down too much to catch it, so a watchdog thread samples the main thread's stack a
+# few hundred times a second, tagging each sample with the frame it was taken in. When a frame
+# runs over budget its samples are appended to a file as collapsed stacks (one "a;b;c count"
+# line per distinct stack, the input of flamegraph.pl and speedscope), under a root frame
+# naming the frame, its time and the live enemy and item counts. Other frames' samples are
+# just dropped. Samples land when the main thread lets go of the GIL (in pygame's blits, flips
+# and waits) or at the interpreter's switch interval, whichever comes first.
+DEFAULT_SAMPLE_RATE = 500  # samples per second
+DEFAULT_FRAME_BUDGET = 1000 / FPS  # ms of work per frame, not counting the wait in clock.tick()
+
+class SpikeProfiler:
+    """Opt-in sampling watchdog for main()'s frames; begin_frame()/end_frame() bracket each frame.
+
+    out: path of the collapsed-stack file spikes are appended to.
+    rate: stack samples per second; budget: frame time in ms above which a frame is dumped.
+    """
+
+    def __init__(self, out, rate=DEFAULT_SAMPLE_RATE, budget=DEFAULT_FRAME_BUDGET):
+        self.out = out
+        self.interval = 1.0 / rate
+        self.budget = budget / 1000
+        self.thread_id = threading.get_ident()  # the thread whose frames are profiled
+        self.frame = 0
+        self.current = None  # number of the frame in progress, None between frames
+        self.frame_start = 0.0
+        self.samples = collections.deque(maxlen=max(rate, 1))  # (frame number, code objects from the root down)
+        self.spikes = 0
+        self.sampled = 0
+        self.stopped = threading.Event()
+        self.worker = threading.Thread(target=self._run, name="spike-profiler", daemon=True)
+
+    def start(self):
+        self.worker.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.worker.join()
+
+    def _run(self):
+        frames = sys._current_frames
+        interval = self.interval
+        while not self.stopped.wait(interval):
+            tag = self.current
+            if tag is None:
+                continue
+            frame = frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append((tag, tuple(stack)))
+            self.sampled += 1
+
+    def begin_frame(self):
+        self.frame += 1
+        self.frame_start = time.perf_counter()
+        self.current = self.frame
+
+    def end_frame(self):
+        """Dump the frame's samples if it ran over budget."""
+        elapsed = time.perf_counter() - self.frame_start
+        self.current = None
+        if elapsed <= self.budget:
+            return
+        self.spikes += 1
+        frame = self.frame
+        counts = collections.Counter(stack for tag, stack in list(self.samples) if tag == frame)
+        root = f"frame {frame} {elapsed * 1000:.1f}ms enemies={len(enemies)} items={len(items)}"
+        with open(self.out, "a") as f:
+            if not counts:
+                f.write(f"{root};(no samples) 1\n")
+            for stack, count in counts.items():
+                names = ";".join(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                                 for code in stack)
+                f.write(f"{root};{names} {count}\n")
+
+    def report(self):
+        return (f"spike profiler: {self.frame} frames, {self.spikes} over {self.budget * 1000:.1f} ms,"
+                f" {self.sampled} samples; spikes in {self.out}")
+
+def main(profile_spikes=None, sample_rate=DEFAULT_SAMPLE_RATE, frame_budget=DEFAULT_FRAME_BUDGET):
+    """Run the game until the window is closed.
+
+    profile_spikes: path of a file to append collapsed stacks of over-budget frames to (see
+    SpikeProfiler), sampled sample_rate times a second; frame_budget is in ms.
+    """
+    # Initialize pygame and mixer
+    pygame.init()
+    pygame.mixer.init()
+    load_sounds()
+    load_level(LEVEL_MAP)
+
+    # Initialize player
+    player = Player(x=50, y=SCREEN_HEIGHT - 2*TILE_SIZE)  # start near the bottom left
+    player_group = pygame.sprite.GroupSingle(player)
+
+    # Set up display
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("NES-style Mario")
+
+    clock = pygame.time.Clock()
+    profiler = None
+    if profile_spikes:
+        profiler = SpikeProfiler(profile_spikes, sample_rate, frame_budget)
+        profiler.start()
+
+    # Main game loop
+    running = True
+    while running:
+        clock.tick(FPS)  # cap frame rate
+        if profiler is not None:
+            profiler.begin_frame()
+
+        # Event handling
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:   # handle window close
+                running = False
+            # (If there are any other one-time events like shooting fireballs, handle KEYDOWN here)
+
+        # Get key states
+        keys = pygame.key.get_pressed()
+        # Update player (movement & collisions)
+        player_group.update(keys)
+        update_enemies()
+        update_items()
+        player_collisions(player)
+        draw_scene(screen, player, camera_for(player))
+        pygame.display.flip()
+        if profiler is not None:
+            profiler.end_frame()
+
+    # Quit game loop
+    if profiler is not None:
+        profiler.stop()
+        print(profiler.report())
+    pygame.quit()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="NES-style Mario")
+    parser.add_argument("--profile-spikes", metavar="FILE",
+                        help="sample the main thread and append collapsed stacks of over-budget frames to FILE")
+    parser.add_argument("--sample-rate", type=int, default=DEFAULT_SAMPLE_RATE, metavar="HZ",
+                        help=f"with --profile-spikes: stack samples per second (default {DEFAULT_SAMPLE_RATE})")
+    parser.add_argument("--frame-budget", type=float, default=DEFAULT_FRAME_BUDGET, metavar="MS",
+                        help=f"with --profile-spikes: frame time that counts as a spike (default {DEFAULT_FRAME_BUDGET:.1f})")
+    args = parser.parse_args()
+    main(args.profile_spikes, args.sample_rate, args.frame_budget)
@@ -0,0 +1,117 @@
+# Batched level generation for Ultramariov0, for sweeping many world/level variants at once
+# generate_levels() builds a whole batch of levels as one uint8 NumPy array of shape
+# (batch, rows, columns), holding the ASCII codes of the tile characters, and each level in it
+# is tile for tile what generate_level() returns. Instead of placing tiles one by one in Python
+# it works out every level's parameters (width, theme, pits, stairs, enemies) as arrays and
+# writes each feature into all levels with one masked or fancy-indexed assignment.
+#
+#   tiles, widths = generate_levels(worlds, levels)
+#   rows = level_rows(tiles, widths, 0)  # the list of strings generate_level(worlds[0], levels[0]) gives
+#
+# Levels are as wide as 60 + 5 * world columns; narrower levels in a batch are padded on the
+# right with '.' up to the widest one. A level only depends on its world and its theme (see
+# level_theme()), so each distinct pair is built once and copied to every level that has it.
+# Needs numpy, which the game itself doesn't.
+import numpy as np
+
+import Ultramariov0 as game
+
+EMPTY, SOLID, LAVA, COIN, FLAG, GOOMBA = (ord(tile) for tile in ".XLCFG")
+OVERWORLD, UNDERGROUND, CASTLE = range(3)
+
+def level_themes(levels):
+    """OVERWORLD, UNDERGROUND or CASTLE for each level number, as level_theme() picks them."""
+    levels = np.asarray(levels)
+    return np.where(levels == 2, UNDERGROUND, np.where(levels == 4, CASTLE, OVERWORLD))
+
+def generate_levels(worlds, levels):
+    """Generate worlds[i]-levels[i] for every i; returns (tiles, widths).
+
+    tiles is a (batch, SCREEN_HEIGHT_TILES, max width) uint8 array of tile character codes and
+    widths the width of each level in columns.
+    """
+    worlds = np.asarray(worlds, dtype=np.int64)
+    themes = level_themes(levels)
+    if worlds.shape != themes.shape or worlds.ndim != 1:
+        raise ValueError("worlds and levels must be 1-D sequences of the same length")
+    pairs, inverse = np.unique(np.stack([worlds, themes], axis=1), axis=0, return_inverse=True)
+    tiles = _build(pairs[:, 0], pairs[:, 1])
+    return tiles[inverse.reshape(-1)], 60 + 5 * worlds
+
+def _build(world, theme):
+    """The levels of each (world, theme) pair, in the order generate_level() lays them out."""
+    count = len(world)
+    height = game.SCREEN_HEIGHT_TILES
+    ground_y = height - 1
+    width = 60 + 5 * world
+    columns = int(width.max()) if count else 0
+    tiles = np.full((count, height, columns), EMPTY, dtype=np.uint8)
+    index = np.arange(count)
+    x = np.arange(columns)[None, :]
+    inside = x < width[:, None]
+    castle = theme == CASTLE
+    underground = theme == UNDERGROUND
+    overworld = theme == OVERWORLD
+
+    # Ground, and the ceiling of underground levels
+    tiles[:, ground_y] = np.where(inside, SOLID, EMPTY)
+    tiles[underground, 0] = tiles[underground, ground_y]
+
+    # Pits, one per segment of the level: lava pools in castles, gaps elsewhere
+    pit_count = np.where(overworld & (world >= 5), 3, np.where(underground, 1, 2))
+    segment = width // (pit_count + 1)
+    pit_len = np.minimum(2 + world % 3, 5)
+    pits = []  # (mask of levels that have pit i, start, end)
+    for i in range(1, int(pit_count.max(initial=0)) + 1):
+        has = i <= pit_count
+        start = np.maximum(segment * i - 3, 5)
+        end = start + pit_len - 1
+        late = end >= width - 2
+        end = np.where(late, width - 3, end)
+        start = np.where(late, end - pit_len + 1, start)
+        pits.append((has, start, end))
+        span = has[:, None] & (x >= start[:, None]) & (x <= end[:, None])
+        tiles[:, ground_y] = np.where(span, np.where(castle, LAVA, EMPTY)[:, None], tiles[:, ground_y])
+    # Solid ground at the start and under the flag
+    tiles[:, ground_y, :3] = SOLID
+    tiles[:, ground_y] = np.where((x >= width[:, None] - 3) & inside, SOLID, tiles[:, ground_y])
+
+    # Flagpole in the last column, four tiles tall down to the ground row
+    tiles[index[:, None], np.arange(ground_y - 3, ground_y + 1)[None, :], (width - 1)[:, None]] = FLAG
+
+    # Staircase up to the flag in overworld levels
+    stair_height = np.where(overworld, 3 + world // 3, 0)
+    base_x = width - 1 - stair_height - 1
+    for i in range(int(stair_height.max(initial=0))):
+        step = i < stair_height
+        tiles[index[step], ground_y - i - 1, base_x[step] + i] = SOLID
+
+    # A platform underground, a block cluster with a coin on top in the overworld
+    platform_x = width // 3
+    for i in range(8):
+        tiles[index[underground], ground_y - 4, platform_x[underground] + i] = SOLID
+    cluster_x = width // 2 - 2
+    for i in range(5):
+        tiles[index[overworld], ground_y - 5, cluster_x[overworld] + i] = SOLID
+    tiles[index[overworld], ground_y - 6, cluster_x[overworld] + 2] = COIN
+
+    # A line of coins over every pit
+    coin_y = max(ground_y - 4, 0)
+    for has, start, end in pits:
+        span = has[:, None] & (x >= start[:, None]) & (x <= end[:, None]) & inside
+        tiles[:, coin_y] = np.where(span, COIN, tiles[:, coin_y])
+
+    # Goombas at even fractions of the level, standing on solid ground, never in a pit or at the flag
+    enemy_count = np.minimum(2 + (world - 1) // 3, 5)
+    for i in range(1, int(enemy_count.max(initial=0)) + 1):
+        ex = np.clip((i / (enemy_count + 1) * width).astype(np.int64), 1, width - 2)
+        place = (i <= enemy_count) & (ex < width - 3)
+        for has, start, end in pits:
+            place &= ~(has & (start <= ex) & (ex <= end))
+        place &= tiles[index, ground_y, ex] == SOLID
+        tiles[index[place], ground_y - 1, ex[place]] = GOOMBA
+    return tiles
+
+def level_rows(tiles, widths, i):
+    """Level i of a batch as the list of row strings generate_level() returns."""
+    return [row.tobytes().decode("ascii") for row in tiles[i, :, :widths[i]]]
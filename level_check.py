@@ -0,0 +1,190 @@
+# Solvability checker for generated Ultramariov0 levels
+# For every world-level it searches for inputs that take the player from the start to the
+# flag, using the game's own fixed-point player physics (step_player_fixed), so a level that
+# passes here can be beaten in the game. Levels are checked in parallel across a pool of
+# worker processes; each result says whether the flag was reached, after how many steps,
+# how many search states that took and how long the check ran.
+#
+#   python level_check.py                        # every world-level of generate_level
+#   python level_check.py --levels 3-2 8-4       # just these
+#   python level_check.py --width 2000 --seed 7  # streamed levels 2000 tiles wide
+#
+# The search is A* over short held inputs (MACRO_STEPS steps of left/none/right, jumping
+# at the start of the first step when on the ground), with the remaining distance to the
+# flag as the estimate. Player states are hashed on a coarse grid -- position in CELL px
+# cells, vertical speed in whole pixels per step, on the ground or not -- into a
+# transposition table, so the many input orders that end up in about the same place are
+# only expanded once. That keeps a level to a few thousand states, at the cost of maybe
+# missing a pixel-perfect path; --cell 1 searches finer when a level is reported stuck.
+#
+# Goombas are left out of the search (they walk, and can be stomped or jumped over), but
+# the path found is played back through a full Game with goombas to say whether it also
+# survives them. The exit status is 1 when any level can't be finished, so this can gate a
+# change to the level generator.
+import os
+import sys
+import time
+import heapq
+import argparse
+import multiprocessing
+
+MACRO_STEPS = 4  # simulation steps an input is held for, per search edge
+MOVES = (1, 0, -1)
+CELL = 4  # transposition-table cell size in pixels
+DEFAULT_MAX_STATES = 200_000  # give up on a level after expanding this many states
+ALL_LEVELS = [(world, level) for world in range(1, 9) for level in range(1, 5)]
+
+def search(game, rows, max_states=DEFAULT_MAX_STATES, cell=CELL):
+    """A* from the level start to a flag tile of rows.
+
+    Returns (inputs, states): the per-step (move, jump) inputs of a path to the flag, or None
+    if there is none on the search grid, and the number of states expanded.
+    """
+    player = game.Player()
+    player.respawn()
+    tile = game.TILE_SIZE
+    sub = game.SUBPIXEL_SHIFT
+    flags = set()
+    for ty, row in enumerate(rows):
+        tx = row.find('F')
+        while tx != -1:
+            flags.add((tx, ty))
+            tx = row.find('F', tx + 1)
+    if not flags:
+        return None, 0
+    goal_x = min(tx for tx, ty in flags) * tile  # the player's centre has to get this far
+    half_w = player.width // 2
+    half_h = player.height // 2
+    speed = game.PLAYER_SPEED * MACRO_STEPS
+    cell_shift = sub + cell.bit_length() - 1
+    step = game.step_player_fixed
+
+    def estimate(sx):
+        # Edges left to the flag at full speed: never more than it takes (admissible). The search
+        # is still incomplete, as the coarse table merges states; --cell 1 makes it finer
+        return max(0, goal_x - (sx >> sub) - half_w) // speed
+
+    start = (player.sx, player.sy, player.svy, player.on_ground)
+    parents = {}  # table key -> (parent key, (move, jump)), for rebuilding the path
+    key = (start[0] >> cell_shift, start[1] >> cell_shift, start[2] >> sub, start[3])
+    parents[key] = None
+    heap = [(estimate(start[0]), 0, 0, key, start)]
+    pushed = 1
+    expanded = 0
+    while heap and expanded < max_states:
+        f, cost, _, key, state = heapq.heappop(heap)
+        expanded += 1
+        sx, sy, svy, on_ground = state
+        for jump in ((True, False) if on_ground else (False,)):
+            for move in MOVES:
+                player.sx, player.sy, player.svy, player.on_ground = sx, sy, svy, on_ground
+                if jump:
+                    player.svy = game.JUMP_VELOCITY_SUB
+                    player.on_ground = False
+                for _ in range(MACRO_STEPS):
+                    if step(player, rows, move):
+                        break
+                    px = (player.sx >> sub) + half_w
+                    py = (player.sy >> sub) + half_h
+                    if (px // tile, py // tile) in flags:
+                        parents[None] = (key, (move, jump))
+                        return _inputs(parents), expanded
+                else:
+                    child = (player.sx, player.sy, player.svy, player.on_ground)
+                    child_key = (child[0] >> cell_shift, child[1] >> cell_shift, child[2] >> sub, child[3])
+                    if child_key not in parents:
+                        parents[child_key] = (key, (move, jump))
+                        pushed += 1
+                        heapq.heappush(heap, (cost + 1 + estimate(child[0]), cost + 1, pushed, child_key, child))
+    return None, expanded
+
+def _inputs(parents):
+    """Per-step (move, jump) inputs along the parent links from the goal back to the start."""
+    edges = []
+    link = parents[None]
+    while link is not None:
+        key, edge = link
+        edges.append(edge)
+        link = parents[key]
+    inputs = []
+    for move, jump in reversed(edges):
+        inputs.append((move, jump))
+        inputs.extend([(move, False)] * (MACRO_STEPS - 1))
+    return inputs
+
+def play_back(state, inputs, world, level):
+    """Feed inputs to a Game started at world-level; True if it clears the level without a death."""
+    for move, jump in inputs:
+        state.step(move, jump)
+        if "death" in state.events:
+            return False
+        if (state.world, state.level) != (world, level) or state.win:
+            return True
+    return False
+
+def check_level(world, level, seed=0, width=None, max_states=DEFAULT_MAX_STATES, cell=CELL):
+    """Check one level; returns a result dict (see report())."""
+    import Ultramariov0 as game
+
+    began = time.perf_counter()
+    state = game.Game(fixed_point=True, streaming=width is not None, stream_width=width)
+    state.new_game(None, world, level, seed)
+    rows = state.level_map.rows(0, width) if width is not None else state.level_map
+    inputs, states = search(game, rows, max_states, cell)
+    goombas = None
+    if inputs is not None:
+        state.new_game(None, world, level, seed)  # the same level again, goombas and all
+        goombas = play_back(state, inputs, world, level)
+    return {"world": world, "level": level, "reachable": inputs is not None,
+            "steps": len(inputs) if inputs is not None else None, "states": states,
+            "goombas": goombas, "seconds": time.perf_counter() - began}
+
+def _check(job):
+    # Worker entry point: no window or sound device, set before pygame is imported
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    return check_level(*job)
+
+def check_levels(levels, seed=0, width=None, workers=None, max_states=DEFAULT_MAX_STATES, cell=CELL):
+    """Check (world, level) pairs across a process pool; returns results in the order given."""
+    jobs = [(world, level, seed, width, max_states, cell) for world, level in levels]
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1:
+        return [_check(job) for job in jobs]
+    context = multiprocessing.get_context("spawn")  # clean workers: no pygame state inherited
+    with context.Pool(workers) as pool:
+        return pool.map(_check, jobs, chunksize=1)
+
+def report(results, wall):
+    print(f"{'level':>6s} {'reachable':>10s} {'steps':>6s} {'states':>7s} {'goombas':>8s} {'seconds':>8s}")
+    for r in results:
+        goombas = "-" if r["goombas"] is None else ("clear" if r["goombas"] else "blocked")
+        steps = "-" if r["steps"] is None else str(r["steps"])
+        print(f"{r['world']:>4d}-{r['level']:<1d} {'yes' if r['reachable'] else 'NO':>10s} {steps:>6s} "
+              f"{r['states']:7d} {goombas:>8s} {r['seconds']:8.3f}")
+    stuck = [r for r in results if not r["reachable"]]
+    cpu = sum(r["seconds"] for r in results)
+    print(f"{len(results) - len(stuck)} of {len(results)} levels reachable; "
+          f"{cpu:.2f} s of checks in {wall:.2f} s wall time")
+    return not stuck
+
+def parse_level(text):
+    world, _, level = text.partition("-")
+    return int(world), int(level or 1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that generated Ultramariov0 levels can be finished.")
+    parser.add_argument("--levels", nargs="+", type=parse_level, metavar="W-L",
+                        help="world-levels to check (default: all 32)")
+    parser.add_argument("--width", type=int, help="check streamed levels of this width instead")
+    parser.add_argument("--seed", type=int, default=0, help="level seed (default 0)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--max-states", type=int, default=DEFAULT_MAX_STATES,
+                        help=f"states to expand before giving up on a level (default {DEFAULT_MAX_STATES})")
+    parser.add_argument("--cell", type=int, default=CELL, choices=(1, 2, 4, 8, 16),
+                        help=f"transposition-table cell size in pixels (default {CELL})")
+    args = parser.parse_args()
+    began = time.perf_counter()
+    results = check_levels(args.levels or ALL_LEVELS, args.seed, args.width, args.workers,
+                           args.max_states, args.cell)
+    sys.exit(0 if report(results, time.perf_counter() - began) else 1)
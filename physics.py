@@ -0,0 +1,231 @@
+# Shared platformer physics for enginev0 and Ultramariov0
+# Bodies are anything with x, y, vx, vy, width, height and on_ground attributes, in pixels
+# (floats or ints, y grows downwards). Levels are tile rows indexed rows[ty][tx]: a list of
+# strings, or anything indexed the same way such as Ultramariov0's StreamingLevel. A TileGrid
+# says how big a tile is and which tile characters are solid or hazards; a Motion says how a
+# kind of body falls and which points of its box probe the grid.
+#
+# step_body() moves a body one step: gravity and terminal velocity, then the horizontal move
+# against walls (stop or bounce), then the vertical move against floors and ceilings. Only the
+# rows and columns the box spans are looked at, so the cost doesn't grow with the level. It
+# returns HIT_* flags and leaves it to the game what a wall, a hazard or a fall means.
+# step_body_fixed() is the same step in integer subpixel units (sx, sy, svx, svy), where every
+# tile lookup is a shift, for bit-reproducible simulations.
+#
+# Needs nothing but the standard library, so it can be imported and benchmarked on its own.
+
+HIT_WALL = 1  # the horizontal move was stopped (or turned around) by a solid tile
+HIT_FLOOR = 2  # landed on, or is standing on, a solid or hazard tile
+HIT_CEILING = 4  # bumped its head on a solid tile
+HIT_HAZARD = 8  # the floor under it is a hazard tile
+FELL_OUT = 16  # dropped below the bottom row of the level
+
+class TileGrid:
+    """Collision rules of a tile grid: tile_size in pixels (a power of two), solid tile
+    characters (walls, floors and ceilings) and hazard characters (floors that hurt)."""
+    __slots__ = ("tile_size", "tile_shift", "solid", "hazard", "floor")
+
+    def __init__(self, tile_size, solid, hazard=""):
+        if tile_size <= 0 or tile_size & (tile_size - 1):
+            raise ValueError(f"tile_size must be a power of two, not {tile_size}")
+        self.tile_size = tile_size
+        self.tile_shift = tile_size.bit_length() - 1
+        self.solid = frozenset(solid)
+        self.hazard = frozenset(hazard)
+        self.floor = self.solid | self.hazard
+
+class Motion:
+    """How one kind of body moves.
+
+    gravity and max_fall are added to / cap vy every step. wall_insets (top, bottom) and
+    foot_insets (left, right) pull the probe points in from the edges of the box: walls are
+    looked for between y + top and y + height - bottom, floors and ceilings between x + left
+    and x + width - right. bounce turns the body around at walls instead of stopping it.
+    """
+    __slots__ = ("gravity", "max_fall", "wall_top", "wall_bottom", "foot_left", "foot_right",
+                 "bounce", "subpixel_shift")
+
+    def __init__(self, gravity, max_fall, wall_insets=(1, 1), foot_insets=(2, 2), bounce=False):
+        self.gravity = gravity
+        self.max_fall = max_fall
+        self.wall_top, self.wall_bottom = wall_insets
+        self.foot_left, self.foot_right = foot_insets
+        self.bounce = bounce
+        self.subpixel_shift = 0
+
+    def fixed(self, subpixel_shift):
+        """The same motion in 1 << subpixel_shift units per pixel, for step_body_fixed()."""
+        scale = 1 << subpixel_shift
+        motion = Motion(int(self.gravity * scale), int(self.max_fall * scale),
+                        (self.wall_top * scale, self.wall_bottom * scale),
+                        (self.foot_left * scale, self.foot_right * scale), self.bounce)
+        motion.subpixel_shift = subpixel_shift
+        return motion
+
+def tile_at(rows, tx, ty):
+    """The tile character at (tx, ty), or None outside the level."""
+    if tx < 0 or ty < 0 or ty >= len(rows) or tx >= len(rows[0]):
+        return None
+    return rows[ty][tx]
+
+def _spans(row, first, last, kinds):
+    """Whether any of row[first..last] is one of kinds (for bodies wider than two tiles)."""
+    for tx in range(first, last + 1):
+        if row[tx] in kinds:
+            return True
+    return False
+
+def _spans_column(rows, tx, first, last, kinds):
+    """Whether any of rows[first..last][tx] is one of kinds (for bodies taller than two tiles)."""
+    for ty in range(first, last + 1):
+        if rows[ty][tx] in kinds:
+            return True
+    return False
+
+def step_body(body, rows, grid, motion):
+    """Move body one step through rows; returns the HIT_* flags of what it ran into."""
+    tile = grid.tile_size
+    solid = grid.solid
+    height = len(rows)
+    width = len(rows[0])
+    flags = 0
+
+    # Gravity, capped at terminal velocity
+    vy = body.vy + motion.gravity
+    if vy > motion.max_fall:
+        vy = motion.max_fall
+    body.vy = vy
+
+    # Horizontal move: look down the tile column at the leading edge. Most boxes span one or
+    # two rows, which are tested directly; only taller ones go through the rows in between.
+    vx = body.vx
+    x = body.x + vx
+    if vx != 0:
+        front = int((x + body.width if vx > 0 else x) // tile)
+        if 0 <= front < width:
+            y = body.y
+            first = int((y + motion.wall_top) // tile)
+            last = int((y + body.height - motion.wall_bottom) // tile)
+            if first < 0:
+                first = 0
+            if last >= height:
+                last = height - 1
+            if first <= last and (rows[first][front] in solid or rows[last][front] in solid or
+                                  (last - first > 1 and _spans_column(rows, front, first + 1, last - 1, solid))):
+                x = front * tile - body.width if vx > 0 else (front + 1) * tile
+                body.vx = -vx if motion.bounce else 0
+                flags = HIT_WALL
+    body.x = x
+
+    # Vertical move: look along the tile row under the feet (falling) or above the head (rising)
+    y = body.y + vy
+    body.on_ground = False
+    first = int((x + motion.foot_left) // tile)
+    last = int((x + body.width - motion.foot_right) // tile)
+    if first < 0:
+        first = 0
+    if last >= width:
+        last = width - 1
+    if vy >= 0:
+        bottom = int((y + body.height) // tile)
+        if 0 <= bottom < height and first <= last:
+            row = rows[bottom]
+            left = row[first]
+            right = row[last]
+            floor = grid.floor
+            if left in floor or right in floor or (last - first > 1 and _spans(row, first + 1, last - 1, floor)):
+                # Standing on a hazard stops the fall too; the caller decides what it does
+                y = bottom * tile - body.height
+                body.vy = 0
+                body.on_ground = True
+                flags |= HIT_FLOOR
+                hazard = grid.hazard
+                if left in hazard or right in hazard or (last - first > 1 and _spans(row, first + 1, last - 1, hazard)):
+                    flags |= HIT_HAZARD
+        if y > height * tile:
+            flags |= FELL_OUT
+    else:
+        top = int(y // tile)
+        if 0 <= top < height and first <= last:
+            row = rows[top]
+            if row[first] in solid or row[last] in solid or (last - first > 1 and _spans(row, first + 1, last - 1, solid)):
+                y = (top + 1) * tile
+                body.vy = 0
+                flags |= HIT_CEILING
+    body.y = y
+    return flags
+
+def step_body_fixed(body, rows, grid, motion):
+    """step_body() on the integer subpixel state sx, sy, svx, svy, with a Motion from fixed().
+
+    width, height and on_ground are shared with the pixel state; copying sx, sy, svx and svy
+    back into x, y, vx and vy is left to the caller.
+    """
+    sub = motion.subpixel_shift
+    shift = grid.tile_shift + sub
+    solid = grid.solid
+    height = len(rows)
+    width = len(rows[0])
+    w = body.width << sub
+    h = body.height << sub
+    flags = 0
+
+    svy = body.svy + motion.gravity
+    if svy > motion.max_fall:
+        svy = motion.max_fall
+    body.svy = svy
+
+    svx = body.svx
+    sx = body.sx + svx
+    if svx != 0:
+        front = (sx + w if svx > 0 else sx) >> shift
+        if 0 <= front < width:
+            sy = body.sy
+            first = (sy + motion.wall_top) >> shift
+            last = (sy + h - motion.wall_bottom) >> shift
+            if first < 0:
+                first = 0
+            if last >= height:
+                last = height - 1
+            if first <= last and (rows[first][front] in solid or rows[last][front] in solid or
+                                  (last - first > 1 and _spans_column(rows, front, first + 1, last - 1, solid))):
+                sx = (front << shift) - w if svx > 0 else (front + 1) << shift
+                body.svx = -svx if motion.bounce else 0
+                flags = HIT_WALL
+    body.sx = sx
+
+    sy = body.sy + svy
+    body.on_ground = False
+    first = (sx + motion.foot_left) >> shift
+    last = (sx + w - motion.foot_right) >> shift
+    if first < 0:
+        first = 0
+    if last >= width:
+        last = width - 1
+    if svy >= 0:
+        bottom = (sy + h) >> shift
+        if 0 <= bottom < height and first <= last:
+            row = rows[bottom]
+            left = row[first]
+            right = row[last]
+            floor = grid.floor
+            if left in floor or right in floor or (last - first > 1 and _spans(row, first + 1, last - 1, floor)):
+                sy = (bottom << shift) - h
+                body.svy = 0
+                body.on_ground = True
+                flags |= HIT_FLOOR
+                hazard = grid.hazard
+                if left in hazard or right in hazard or (last - first > 1 and _spans(row, first + 1, last - 1, hazard)):
+                    flags |= HIT_HAZARD
+        if sy > height << shift:
+            flags |= FELL_OUT
+    else:
+        top = sy >> shift
+        if 0 <= top < height and first <= last:
+            row = rows[top]
+            if row[first] in solid or row[last] in solid or (last - first > 1 and _spans(row, first + 1, last - 1, solid)):
+                sy = (top + 1) << shift
+                body.svy = 0
+                flags |= HIT_CEILING
+    body.sy = sy
+    return flags